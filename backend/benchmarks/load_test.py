@@ -0,0 +1,284 @@
+"""
+Load-test harness for the API.
+
+Starts the app under uvicorn in this process (or targets --url), prepares a
+few projects from synthetic bare repositories, then drives mixed traffic at
+each --concurrency level for --duration seconds:
+
+    ingest        POST /api/ingest from a local bare repo (file:// URL)
+    parse         POST /api/project/{id}/parse
+    file          GET  /api/project/{id}/file          (file-tree click)
+    metadata      GET  /api/project/{id}/metadata      (file-tree click)
+    dependencies  GET  /api/project/{id}/dependencies?node_id=...
+    graph         GET  /api/project/{id}/dependencies  (full graph)
+
+Per endpoint it reports requests, throughput, p50/p95/p99 latency and error
+rate, as a table and as JSON (--output). Requests are issued by plain
+threads with one HTTP session each, like independent browser tabs.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_test --concurrency 1,4,16,64 --duration 20
+"""
+import argparse
+import json
+import random
+import shutil
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+import uvicorn
+
+from benchmarks.synthetic import RepoSpec, generate_repo
+
+DEFAULT_WORK_DIR = Path(__file__).resolve().parent / ".work"
+DEFAULT_MIX = "file=35,metadata=30,dependencies=20,graph=5,parse=5,ingest=5"
+REQUEST_TIMEOUT = 300
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+def _parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = int(weight)
+    return weights
+
+def _files(tree: List[Dict], root: str) -> List[str]:
+    """Project-relative paths of the .py files in a scan_directory tree."""
+    paths = []
+    for node in tree:
+        if node["type"] == "folder":
+            paths.extend(_files(node["children"], root))
+        elif node["name"].endswith(".py"):
+            paths.append(Path(node["path"]).relative_to(root).as_posix())
+    return paths
+
+class Server:
+    """uvicorn serving main:app on a free local port, in a background thread."""
+
+    def __init__(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        config = uvicorn.Config("main:app", host="127.0.0.1", port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+class Target:
+    """A prepared project: its clone root, Python files and function node ids."""
+
+    def __init__(self, project_id: str, root: str, files: List[str], nodes: List[str]):
+        self.project_id = project_id
+        self.root = root
+        self.files = files
+        self.nodes = nodes
+
+def prepare(base_url: str, repo_urls: List[str]) -> List[Target]:
+    """Ingests, parses and builds the graph of one project per repo, outside the timed runs."""
+    targets = []
+    with requests.Session() as session:
+        for repo_url in repo_urls:
+            ingest = session.post(f"{base_url}/api/ingest", json={"url": repo_url}, timeout=REQUEST_TIMEOUT)
+            ingest.raise_for_status()
+            project_id = ingest.json()["project_id"]
+            tree = ingest.json()["file_tree"]
+            root = str(Path(tree[0]["path"]).parent) if tree else ""
+            session.post(f"{base_url}/api/project/{project_id}/parse", timeout=REQUEST_TIMEOUT).raise_for_status()
+            graph = session.get(f"{base_url}/api/project/{project_id}/dependencies", timeout=REQUEST_TIMEOUT)
+            graph.raise_for_status()
+            nodes = [n["id"] for n in graph.json()["nodes"] if n.get("type") == "function"]
+            targets.append(Target(project_id, root, _files(tree, root), nodes))
+    return targets
+
+def _can_target(op: str, target: Target) -> bool:
+    """Whether `op` has something to request in target (an empty graph has no nodes to query)."""
+    if op in ("file", "metadata"):
+        return bool(target.files)
+    if op == "dependencies":
+        return bool(target.nodes)
+    return True
+
+class LoadRun:
+    def __init__(self, base_url: str, targets: List[Target], repo_urls: List[str], weights: Dict[str, int],
+                 concurrency: int, duration: float, seed: int):
+        self.base_url = base_url
+        self.repo_urls = repo_urls
+        # Targets each operation can pick from
+        self.targets = {op: [t for t in targets if _can_target(op, t)] for op in weights}
+        skipped = [op for op in weights if op != "ingest" and not self.targets[op]]
+        if skipped:
+            print(f"Skipping {', '.join(skipped)}: no prepared project has anything to query", file=sys.stderr)
+        self.ops = [op for op in weights if op not in skipped]
+        if not self.ops:
+            raise ValueError("No operation in the mix can run against the prepared projects")
+        self.weights = [weights[op] for op in self.ops]
+        self.concurrency = concurrency
+        self.duration = duration
+        self.seed = seed
+        self.latencies: Dict[str, List[float]] = {op: [] for op in self.ops}
+        self.errors: Dict[str, int] = {op: 0 for op in self.ops}
+        self.ingested: List[str] = []
+        self._lock = threading.Lock()
+
+    def _request(self, session: requests.Session, op: str, rng: random.Random) -> requests.Response:
+        if op == "ingest":
+            return session.post(f"{self.base_url}/api/ingest", json={"url": rng.choice(self.repo_urls)},
+                                timeout=REQUEST_TIMEOUT)
+        target = rng.choice(self.targets[op])
+        project = f"{self.base_url}/api/project/{target.project_id}"
+        if op == "parse":
+            return session.post(f"{project}/parse", timeout=REQUEST_TIMEOUT)
+        if op == "file":
+            path = f"{target.root}/{rng.choice(target.files)}"
+            return session.get(f"{project}/file", params={"path": path}, timeout=REQUEST_TIMEOUT)
+        if op == "metadata":
+            return session.get(f"{project}/metadata", params={"path": rng.choice(target.files)},
+                               timeout=REQUEST_TIMEOUT)
+        if op == "dependencies":
+            return session.get(f"{project}/dependencies", params={"node_id": rng.choice(target.nodes)},
+                               timeout=REQUEST_TIMEOUT)
+        if op == "graph":
+            return session.get(f"{project}/dependencies", timeout=REQUEST_TIMEOUT)
+        raise ValueError(f"Unknown operation: {op}")
+
+    def _worker(self, worker: int, deadline: float):
+        rng = random.Random(self.seed * 7919 + worker)
+        with requests.Session() as session:
+            while time.perf_counter() < deadline:
+                op = rng.choices(self.ops, self.weights)[0]
+                start = time.perf_counter()
+                project_id = None
+                try:
+                    response = self._request(session, op, rng)
+                    ok = response.status_code < 400
+                    if ok and op == "ingest":
+                        project_id = response.json()["project_id"]
+                except Exception:
+                    # Connection errors, bad bodies: count it and keep the worker going
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.latencies[op].append(elapsed)
+                    if not ok:
+                        self.errors[op] += 1
+                    elif project_id is not None:
+                        self.ingested.append(project_id)
+
+    def run(self) -> Dict:
+        started = time.perf_counter()
+        deadline = started + self.duration
+        workers = [threading.Thread(target=self._worker, args=(i, deadline)) for i in range(self.concurrency)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        wall = time.perf_counter() - started
+
+        endpoints = {}
+        for op in self.ops:
+            samples = self.latencies[op]
+            endpoints[op] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(samples) / wall, 3),
+                "p50_ms": round(_percentile(samples, 0.50) * 1000, 3),
+                "p95_ms": round(_percentile(samples, 0.95) * 1000, 3),
+                "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+                "error_rate": round(self.errors[op] / len(samples), 4) if samples else 0.0,
+            }
+        total = sum(len(samples) for samples in self.latencies.values())
+        return {
+            "concurrency": self.concurrency,
+            "wall_seconds": round(wall, 3),
+            "throughput_rps": round(total / wall, 3),
+            "errors": sum(self.errors.values()),
+            "endpoints": endpoints,
+        }
+
+def print_table(result: Dict):
+    print(f"\nconcurrency={result['concurrency']}  total={result['throughput_rps']} req/s  "
+          f"errors={result['errors']}", file=sys.stderr)
+    print(f"{'endpoint':>14} {'reqs':>7} {'req/s':>9} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'err%':>7}",
+          file=sys.stderr)
+    for op, stats in result["endpoints"].items():
+        print(f"{op:>14} {stats['requests']:>7} {stats['throughput_rps']:>9.2f} {stats['p50_ms']:>10.2f} "
+              f"{stats['p95_ms']:>10.2f} {stats['p99_ms']:>10.2f} {stats['error_rate']:>7.2%}", file=sys.stderr)
+
+def run(base_url: str, args) -> Dict:
+    specs = [RepoSpec(files=args.files, seed=args.seed + i) for i in range(args.repos)]
+    repo_urls = [generate_repo(spec, args.work_dir) for spec in specs]
+    targets = prepare(base_url, repo_urls)
+    weights = _parse_mix(args.mix)
+
+    levels = []
+    created = [t.project_id for t in targets]
+    try:
+        for concurrency in (int(c) for c in args.concurrency.split(",") if c):
+            load = LoadRun(base_url, targets, repo_urls, weights, concurrency, args.duration, args.seed)
+            result = load.run()
+            created.extend(load.ingested)
+            print_table(result)
+            levels.append(result)
+    finally:
+        if args.url is None and not args.keep:
+            from services.analysis import get_metadata_path
+            from services.ingestion import get_project_path
+            for project_id in created:
+                shutil.rmtree(get_project_path(project_id), ignore_errors=True)
+                shutil.rmtree(get_metadata_path(project_id), ignore_errors=True)
+
+    return {"target": base_url, "mix": weights, "duration": args.duration, "repo_files": args.files,
+            "levels": levels}
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="Base URL of a running server (default: start one in-process)")
+    ap.add_argument("--concurrency", default="1,4,16,64", help="Comma-separated worker counts")
+    ap.add_argument("--duration", type=float, default=20.0, help="Seconds per concurrency level")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="Operation weights, e.g. " + DEFAULT_MIX)
+    ap.add_argument("--repos", type=int, default=2, help="Synthetic repositories to serve")
+    ap.add_argument("--files", type=int, default=200, help="Files per synthetic repository")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--work-dir", type=Path, default=DEFAULT_WORK_DIR, help="Where generated repos are cached")
+    ap.add_argument("--keep", action="store_true", help="Keep the projects created during the run")
+    ap.add_argument("--output", help="Write the results JSON here (default: stdout)")
+    args = ap.parse_args(argv)
+
+    if args.url:
+        results = run(args.url.rstrip("/"), args)
+    else:
+        with Server() as server:
+            results = run(server.url, args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
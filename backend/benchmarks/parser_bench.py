@@ -0,0 +1,94 @@
+"""
+Micro-benchmarks for services.parser.
+
+Times parse_file on synthetic modules of increasing size and records the peak
+memory of a parse and what stays allocated after its result is dropped. Run
+from the backend directory:
+
+    python -m benchmarks.parser_bench --save parser_baseline.json
+    python -m benchmarks.parser_bench --compare parser_baseline.json
+"""
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+from services.parser import parse_file
+
+# (functions per module, calls per function)
+DEFAULT_CASES = [(10, 5), (100, 20), (500, 50)]
+
+def make_module(functions: int, calls_per_function: int) -> str:
+    """Builds a module with `functions` functions, each making `calls_per_function` calls."""
+    lines = ["import os", "from pathlib import Path", ""]
+    for i in range(functions):
+        lines.append(f"def func_{i}(a, b, c):")
+        for j in range(calls_per_function):
+            lines.append(f"    helper_{j % 7}.call_{j}(a, b, func_{(i + j) % functions}(c))")
+        lines.append("    return a")
+        lines.append("")
+    return "\n".join(lines)
+
+def bench_case(functions: int, calls_per_function: int, repeat: int) -> Dict:
+    source = make_module(functions, calls_per_function)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse_file("bench.py", source)
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    result = parse_file("bench.py", source)
+    _, peak = tracemalloc.get_traced_memory()
+    # Whatever is still allocated once the result is gone stayed behind
+    del result
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "case": f"{functions}x{calls_per_function}",
+        "source_bytes": len(source.encode("utf-8")),
+        "calls": functions * calls_per_function * 2,
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "peak_kb": round(peak / 1024, 1),
+        "retained_kb": round(retained / 1024, 1),
+    }
+
+def compare(results: List[Dict], baseline: List[Dict]):
+    by_case = {r["case"]: r for r in baseline}
+    print(f"{'case':>10} {'ms':>10} {'Δms':>8} {'peak kB':>10} {'Δpeak':>8} {'retained kB':>12} {'Δret':>8}")
+    for r in results:
+        b = by_case.get(r["case"])
+        if not b:
+            continue
+        delta = lambda k: f"{(r[k] - b[k]) / b[k] * 100:+.1f}%" if b[k] else "n/a"
+        print(f"{r['case']:>10} {r['median_ms']:>10} {delta('median_ms'):>8} "
+              f"{r['peak_kb']:>10} {delta('peak_kb'):>8} {r['retained_kb']:>12} {delta('retained_kb'):>8}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--save", help="Write results as JSON to this path")
+    ap.add_argument("--compare", help="Baseline JSON (from --save) to diff against")
+    args = ap.parse_args(argv)
+
+    results = [bench_case(f, c, args.repeat) for f, c in DEFAULT_CASES]
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+End-to-end pipeline benchmarks on synthetic repositories.
+
+For each scale (number of files) this generates a repository (see
+benchmarks.synthetic), then times clone_repository_async, scan_directory,
+parse_project, build_graph and the dependency queries behind
+/dependencies. Results are printed as JSON; --save writes them as a
+baseline and --baseline compares a run against one, exiting non-zero when
+a stage is slower than the baseline by more than --tolerance.
+
+Run from the backend directory:
+
+    python -m benchmarks.pipeline_bench --scales 1000,10000 --save pipeline_baseline.json
+    python -m benchmarks.pipeline_bench --scales 1000,10000 --baseline pipeline_baseline.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.synthetic import RepoSpec, generate_repo
+from services.analysis import get_metadata_path, parse_project
+from services.graph import build_graph
+from services.ingestion import clone_repository_async, get_project_path
+from services.scanner import scan_directory
+
+DEFAULT_WORK_DIR = Path(__file__).resolve().parent / ".work"
+QUERY_SAMPLES = 200
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+def bench_queries(dg, samples: int, seed: int) -> Dict[str, float]:
+    """Times node lookups (callers + callees) on sampled function nodes and the full-graph dump."""
+    functions = [n for n, data in dg.graph.nodes(data=True) if data.get("type") == "function"]
+    rng = random.Random(seed)
+    timings = []
+    for node_id in rng.sample(functions, min(samples, len(functions))):
+        start = time.perf_counter()
+        dg.get_node(node_id)
+        dg.get_callers(node_id)
+        dg.get_callees(node_id)
+        timings.append(time.perf_counter() - start)
+
+    _, full_graph = _timed(dg.toJson)
+    return {
+        "query_node_p50": _percentile(timings, 0.50) if timings else 0.0,
+        "query_node_p99": _percentile(timings, 0.99) if timings else 0.0,
+        "query_full_graph": full_graph,
+    }
+
+def bench_scale(spec: RepoSpec, work_dir: Path, keep: bool) -> Dict:
+    url, generate = _timed(generate_repo, spec, work_dir)
+
+    project_id, clone = _timed(lambda: asyncio.run(clone_repository_async(url)))
+    try:
+        _, scan = _timed(scan_directory, get_project_path(project_id))
+        summary, parse = _timed(parse_project, project_id)
+        dg, graph_build = _timed(build_graph, project_id)
+        stages = {
+            "clone": clone,
+            "scan": scan,
+            "parse": parse,
+            "graph_build": graph_build,
+            **bench_queries(dg, QUERY_SAMPLES, spec.seed),
+        }
+        return {
+            "scale": spec.files,
+            "spec": spec.__dict__,
+            "generate_seconds": round(generate, 4),
+            "parsed_files": summary["parsed_files"],
+            "nodes": dg.graph.number_of_nodes(),
+            "edges": dg.graph.number_of_edges(),
+            "stages": {stage: round(seconds, 6) for stage, seconds in stages.items()},
+        }
+    finally:
+        if not keep:
+            shutil.rmtree(get_project_path(project_id), ignore_errors=True)
+            shutil.rmtree(get_metadata_path(project_id), ignore_errors=True)
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """Returns one message per stage that regressed beyond `tolerance` (0.2 = 20%)."""
+    by_scale = {run["scale"]: run for run in baseline["runs"]}
+    regressions = []
+    for run in results:
+        base = by_scale.get(run["scale"])
+        if base is None:
+            continue
+        for stage, seconds in run["stages"].items():
+            before = base["stages"].get(stage)
+            if not before:
+                continue
+            change = (seconds - before) / before
+            marker = "REGRESSION" if change > tolerance else "ok"
+            print(f"{run['scale']:>8} {stage:>18} {before:>12.6f} -> {seconds:>12.6f} {change:+8.1%}  {marker}")
+            if change > tolerance:
+                regressions.append(f"{stage}@{run['scale']}: {change:+.1%}")
+    return regressions
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scales", default="1000,10000,100000", help="Comma-separated file counts")
+    ap.add_argument("--functions-per-file", type=int, default=RepoSpec.functions_per_file)
+    ap.add_argument("--calls-per-function", type=int, default=RepoSpec.calls_per_function)
+    ap.add_argument("--import-fanout", type=int, default=RepoSpec.import_fanout)
+    ap.add_argument("--collision-rate", type=float, default=RepoSpec.collision_rate)
+    ap.add_argument("--seed", type=int, default=RepoSpec.seed)
+    ap.add_argument("--work-dir", type=Path, default=DEFAULT_WORK_DIR, help="Where generated repos are cached")
+    ap.add_argument("--keep", action="store_true", help="Keep the cloned projects and their metadata")
+    ap.add_argument("--save", help="Write results as a baseline JSON file")
+    ap.add_argument("--baseline", help="Baseline JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown per stage (0.2 = 20%%)")
+    args = ap.parse_args(argv)
+
+    runs = []
+    for scale in (int(s) for s in args.scales.split(",") if s):
+        spec = RepoSpec(
+            files=scale,
+            functions_per_file=args.functions_per_file,
+            calls_per_function=args.calls_per_function,
+            import_fanout=args.import_fanout,
+            collision_rate=args.collision_rate,
+            seed=args.seed,
+        )
+        runs.append(bench_scale(spec, args.work_dir, args.keep))
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": time.time(),
+        "runs": runs,
+    }
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(runs, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions: " + ", ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
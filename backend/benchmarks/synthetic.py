@@ -0,0 +1,116 @@
+"""
+Synthetic Python repository generator for the pipeline benchmarks.
+
+Generates `files` modules spread over packages of 100 modules each. Every
+module defines `functions_per_file` functions, imports `import_fanout` other
+modules and makes `calls_per_function` calls per function, aimed at local
+functions, imported modules' functions and (with probability
+`collision_rate`) names that many modules define, which exercises ambiguous
+call resolution. The result is committed and exposed as a bare repository,
+cloneable through a file:// URL.
+"""
+import random
+import shutil
+import subprocess
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List
+
+# Names defined in many modules, used to generate colliding calls
+COMMON_NAMES = ["run", "process", "handle", "load", "save", "validate", "setup", "close"]
+MODULES_PER_PACKAGE = 100
+
+@dataclass
+class RepoSpec:
+    files: int = 1000
+    functions_per_file: int = 10
+    calls_per_function: int = 5
+    import_fanout: int = 3
+    collision_rate: float = 0.1
+    seed: int = 0
+
+    @property
+    def key(self) -> str:
+        return "-".join(f"{value}" for value in asdict(self).values())
+
+def _module_name(index: int) -> str:
+    return f"pkg_{index // MODULES_PER_PACKAGE}.mod_{index}"
+
+def _function_names(spec: RepoSpec, index: int, rng: random.Random) -> List[str]:
+    names = []
+    for f in range(spec.functions_per_file):
+        if rng.random() < spec.collision_rate:
+            names.append(f"{COMMON_NAMES[f % len(COMMON_NAMES)]}_{f // len(COMMON_NAMES)}")
+        else:
+            names.append(f"func_{index}_{f}")
+    return names
+
+def _module_rng(spec: RepoSpec, index: int) -> random.Random:
+    return random.Random(spec.seed * 1_000_003 + index)
+
+def _exported_name(spec: RepoSpec, index: int) -> str:
+    """The function other modules import from module `index`: its first uniquely named one, if any."""
+    names = _function_names(spec, index, _module_rng(spec, index))
+    return next((name for name in names if name.startswith("func_")), names[0])
+
+def render_module(spec: RepoSpec, index: int) -> str:
+    rng = _module_rng(spec, index)
+    local_names = _function_names(spec, index, rng)
+    imported = sorted({rng.randrange(spec.files) for _ in range(spec.import_fanout)} - {index})
+    if not spec.functions_per_file:
+        imported = []
+    exported = {other: _exported_name(spec, other) for other in imported}
+
+    lines = [f'"""Synthetic module {index}."""', "import os"]
+    for other in imported:
+        lines.append(f"from {_module_name(other)} import {exported[other]}")
+    lines.append("")
+
+    for name in local_names:
+        lines.append(f"def {name}(value, *args):")
+        for c in range(spec.calls_per_function):
+            roll = rng.random()
+            if roll < spec.collision_rate:
+                target = f"{COMMON_NAMES[c % len(COMMON_NAMES)]}_0"
+            elif imported and roll < 0.5:
+                target = exported[rng.choice(imported)]
+            else:
+                target = rng.choice(local_names)
+            lines.append(f"    value = {target}(value)")
+        lines.append("    return os.path.basename(str(value))")
+        lines.append("")
+    return "\n".join(lines)
+
+def _git(*args, cwd: Path):
+    subprocess.run(
+        ["git", "-c", "user.name=bench", "-c", "user.email=bench@localhost", *args],
+        cwd=cwd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+def generate_repo(spec: RepoSpec, work_dir: Path) -> str:
+    """
+    Writes the repository described by `spec` under work_dir (reusing an earlier
+    run with the same spec) and returns the file:// URL of its bare remote.
+    """
+    root = (work_dir / spec.key).resolve()
+    remote = root / "remote.git"
+    if remote.exists():
+        return remote.resolve().as_uri()
+
+    source = root / "src"
+    if source.exists():
+        shutil.rmtree(source)
+    for package in range((spec.files + MODULES_PER_PACKAGE - 1) // MODULES_PER_PACKAGE):
+        package_dir = source / f"pkg_{package}"
+        package_dir.mkdir(parents=True)
+        (package_dir / "__init__.py").write_text("", encoding="utf-8")
+    for index in range(spec.files):
+        module_path = source / (_module_name(index).replace(".", "/") + ".py")
+        module_path.write_text(render_module(spec, index), encoding="utf-8")
+
+    _git("init", "-q", cwd=source)
+    _git("add", "-A", cwd=source)
+    _git("commit", "-q", "-m", "synthetic", cwd=source)
+    _git("clone", "-q", "--bare", str(source), str(remote), cwd=root)
+    shutil.rmtree(source)
+    return remote.resolve().as_uri()
@@ -1,14 +1,71 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import traceback
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from pathlib import Path
-from services.ingestion import clone_repository, get_project_path
-from services.scanner import scan_directory
-from services.analysis import parse_project, get_file_metadata
+from typing import Callable, List, Optional
+from services import catalog, centrality, jobs, reachability, search, storage, traversal
+from services.scheduler import Saturated, scheduler
+from services.ingestion import clone_repository_async, get_project_path, get_blob_sha, remote_head_async
+from services.scanner import scan_directory, get_language_from_ext
+from services.tokens import get_tokens
+from services.metrics import record_cache, render_prometheus, track
+from services.content import get_line_index, MAX_WINDOW_LINES
+from services.analysis import (
+    iter_parse_project, get_file_metadata, iter_metadata_batch,
+    get_parse_generation, get_project_symbols, invalidate_project, MAX_BATCH_FILES
+)
+from services.symbols import MAX_SEARCH_RESULTS
+from services.cycles import CYCLE_KINDS
 
 # ... imports ...
 
-app = FastAPI(title="Codebase Intelligence API", version="1.0.0")
+async def _storage_gc_loop():
+    while True:
+        await asyncio.sleep(storage.GC_INTERVAL_SECONDS)
+        try:
+            result = await run_in_threadpool(storage.collect)
+            if result["evicted"]:
+                print(f"Storage GC evicted {len(result['evicted'])} project(s)", flush=True)
+        except Exception:
+            traceback.print_exc()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(storage.sync_catalog)
+    gc_task = asyncio.create_task(_storage_gc_loop())
+    yield
+    gc_task.cancel()
+    jobs.shutdown()
+
+app = FastAPI(title="Codebase Intelligence API", version="1.0.0", lifespan=lifespan)
+
+@app.exception_handler(Saturated)
+async def saturated_handler(request: Request, exc: Saturated):
+    """Admission control: the priority class's queue is full (see services.scheduler)."""
+    return JSONResponse(
+        {"detail": str(exc), "priority": exc.priority},
+        status_code=429,
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(storage.ProjectUnavailable)
+async def project_unavailable_handler(request: Request, exc: storage.ProjectUnavailable):
+    return JSONResponse({"detail": str(exc)}, status_code=409)
+
+@app.middleware("http")
+async def track_project_access(request: Request, call_next):
+    """Records project accesses for storage LRU eviction."""
+    parts = request.url.path.split("/")
+    if len(parts) > 3 and parts[1] == "api" and parts[2] == "project":
+        storage.touch(parts[3])
+    return await call_next(request)
 
 # Enable CORS for frontend communication
 app.add_middleware(
@@ -21,40 +78,310 @@ app.add_middleware(
 
 class IngestRequest(BaseModel):
     url: str
+    # Clone even if the catalog already holds this URL at the remote's HEAD commit
+    force: bool = False
+
+class MetadataBatchRequest(BaseModel):
+    paths: List[str] = []
+    prefix: Optional[str] = None
+
+# --- Conditional GET helpers ---
+
+# Blob content never changes for a given project + path (clones are read-only)
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+# Derived data changes on re-parse/rebuild: cache, but always revalidate
+CACHE_REVALIDATE = "no-cache"
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def _conditional_json(request: Request, etag: str, cache_control: str, build):
+    """304 if the client already holds `etag`, else the JSON from build()."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(build(), headers=headers)
+
+class _HeldStream(StreamingResponse):
+    """
+    A streamed body that runs under something the handler acquired (a
+    scheduler ticket, a storage lease), so failing to get it is still a clean
+    429/409 rather than an error inside a 200. release() runs when the
+    response ends, even if the body never started (client gone, send error).
+    """
+
+    def __init__(self, content, release: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+def _project_lease(project_id: str):
+    """Route dependency: keeps storage GC off the project while the request reads its files."""
+    with storage.lease(project_id):
+        yield
+
+def _resolve_project_file(project_id: str, path: str) -> Path:
+    """Resolves an absolute or project-relative path to a file inside the clone."""
+    project_root = get_project_path(project_id).resolve()
+    
+    # Handle both absolute (from FileTree) and relative (from Graph) paths
+    target_path = Path(path)
+    if target_path.is_absolute():
+        target_file = target_path.resolve()
+    else:
+        target_file = (project_root / target_path).resolve()
+
+    # Security check: Ensure file is within project root
+    if not str(target_file).startswith(str(project_root)):
+        raise HTTPException(status_code=403, detail="Access denied: File outside project root")
+
+    if not target_file.exists():
+        raise HTTPException(status_code=404, detail="File not found")
+    return target_file
 
 @app.get("/")
 def health_check():
     return {"status": "ok", "message": "Backend is online"}
 
+@app.get("/metrics")
+def metrics():
+    """Pipeline stage latencies, file/byte counters and cache hit ratios in Prometheus text format."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+async def _parse_job(project_id: str, profile: bool):
+    try:
+        if profile:
+            # Profiled in the worker, which also stores the artifacts there
+            summary, profile_id = await jobs.run_cpu(profile_parse, project_id)
+            summary["profile_id"] = profile_id
+            return summary
+        # Per-file progress goes to the job, for /parse/stream viewers
+        complete = await jobs.run_cpu_iter(iter_parse_project, project_id, on_item=jobs.current().publish)
+        summary = dict(complete)
+        summary.pop("event", None)
+        return summary
+    finally:
+        # The worker wrote a new generation: drop our cached view of the old one
+        invalidate_project(project_id)
+
 @app.post("/api/project/{project_id}/parse")
-def trigger_parse(project_id: str):
+async def trigger_parse(project_id: str, profile: bool = False, wait: bool = True):
+    """
+    Parses the project in the worker process pool; a parse already running for
+    the project is joined rather than started twice.
+    With wait=false, responds 202 with the job to poll at /api/jobs/{job_id}.
+    With profile=true, also stores a profile (see /profiles); only a profiled
+    parse already running is joined then.
+    """
+    job = jobs.submit("parse", project_id, lambda: _parse_job(project_id, profile), priority="full_parse",
+                      profile=profile)
+    if not wait:
+        return JSONResponse(job.to_dict(), status_code=202)
     try:
-        result = parse_project(project_id)
-        return result
+        return await job.wait()
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/project/{project_id}/metadata")
-def get_metadata(project_id: str, path: str):
+def _sse(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+async def _parse_job_events(job: jobs.Job):
+    """A parse job's progress as Server-Sent Events, ending with its complete or error event."""
+    completed = False
+    async for event in job.progress():
+        completed = event["event"] == "complete"
+        yield _sse(event)
+    if job.status != "completed":
+        yield _sse({"event": "error", "detail": job.error or f"Parse {job.status}"})
+    elif not completed:
+        # Profiled parses publish no per-file progress, only their summary
+        yield _sse({"event": "complete", **job.summary})
+
+@app.get("/api/project/{project_id}/parse/stream")
+async def stream_parse(project_id: str):
+    """
+    Streams the progress of the project's parse as Server-Sent Events (start,
+    one event per file, complete or error). Watching starts nothing: start the
+    parse with POST /parse?wait=false, then any number of viewers can follow
+    it here. A parse that already finished replays its start and complete
+    events. A viewer gets the first and latest events on connect, and a slow
+    one skips events rather than buffering them (see jobs.MAX_PENDING_EVENTS).
+    """
+    if not get_project_path(project_id).exists():
+        raise HTTPException(status_code=404, detail="Project not found")
+    job = jobs.latest_job("parse", project_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No parse to follow; start one with POST /parse")
+    return StreamingResponse(
+        _parse_job_events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/project/{project_id}/metadata", dependencies=[Depends(_project_lease)])
+def get_metadata(project_id: str, path: str, request: Request):
     """
     Returns parsed metadata for a specific file.
     Path should be relative to project root.
+    The ETag is the parse generation, so it changes whenever the project is re-parsed.
+    """
+    def build():
+        data = get_file_metadata(project_id, path)
+        if data is None:
+            return {"classes": [], "functions": [], "imports": []}
+        return data
+
+    etag = f'"meta-{get_parse_generation(project_id) or "none"}"'
+    return _conditional_json(request, etag, CACHE_REVALIDATE, build)
+
+@app.post("/api/project/{project_id}/metadata/batch")
+def get_metadata_batch(project_id: str, request: MetadataBatchRequest):
+    """
+    Returns metadata for many files in one response:
+    {"files": {path: record | null}, "truncated": bool}.
+    Files come from `paths` and/or every parsed file under the directory `prefix`.
+    The body is streamed record by record straight from the metadata files.
+    """
+    if len(request.paths) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_FILES} paths per request")
+    try:
+        records = iter_metadata_batch(project_id, request.paths, request.prefix, limit=MAX_BATCH_FILES + 1)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # The records are read while the body streams: keep GC off the project until it ends
+    storage.acquire_lease(project_id)
+
+    def body():
+        yield '{"files": {'
+        count = 0
+        truncated = False
+        for path, raw in records:
+            if count == MAX_BATCH_FILES:
+                truncated = True
+                break
+            yield ("," if count else "") + json.dumps(path) + ":" + (raw or "null")
+            count += 1
+        yield '}, "truncated": ' + ("true" if truncated else "false") + '}'
+
+    return _HeldStream(body(), lambda: storage.release_lease(project_id), media_type="application/json")
+
+@app.get("/api/projects")
+def list_projects(url: str = None, commit: str = None, status: str = None, limit: int = 100, offset: int = 0):
+    """Cataloged projects (URL, commit, ingest time, parse status and counts), newest first."""
+    return {"projects": catalog.list_projects(url, commit, status, min(limit, 1000), offset)}
+
+@app.get("/api/project/{project_id}")
+def get_project(project_id: str):
+    project = catalog.get_project(project_id)
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+def _scan_project(project_id: str):
+    with storage.lease(project_id), track("scan", project_id):
+        return scan_directory(get_project_path(project_id))
+
+# The index's memory maps must be gone before its files are deleted
+storage.before_evict(search.invalidate_index)
+
+def _index_for_search(project_id: str):
+    """Builds the code-search trigram index as a background job (searches work meanwhile, unfiltered)."""
+    async def work():
+        summary = await jobs.run_cpu(search.build_index, project_id)
+        search.invalidate_index(project_id)
+        return summary
+    try:
+        jobs.submit("search_index", project_id, work, priority="incremental")
+    except Saturated:
+        pass
+
+@app.get("/api/project/{project_id}/search")
+async def search_code(project_id: str, q: str, regex: bool = False, case_sensitive: bool = True,
+                      include: List[str] = Query(default=[]), exclude: List[str] = Query(default=[]),
+                      context: int = 2, max_matches: int = 1000):
+    """
+    Literal or regex search over the clone's files, streamed as NDJSON: one
+    match per line (path, line, column, text, context lines), then a summary
+    line with "done": true. include/exclude are path globs ("*.py",
+    "src/*"). Files that cannot match are skipped with the trigram index built
+    at ingest; the rest are scanned in the worker process pool.
+    """
+    if not get_project_path(project_id).is_dir():
+        raise HTTPException(status_code=404, detail="Project not found")
+    try:
+        pattern = search.compile_query(q, regex, case_sensitive)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if search.get_index(project_id) is None:
+        _index_for_search(project_id)
+    context = min(max(context, 0), search.MAX_CONTEXT_LINES)
+    max_matches = min(max(max_matches, 1), search.MAX_SEARCH_MATCHES)
+    ticket = scheduler.admit("interactive", project_id)
+
+    async def body():
+        try:
+            with storage.lease(project_id):
+                async with ticket:
+                    async for item in search.iter_search(project_id, pattern, include, exclude, context,
+                                                         max_matches):
+                        yield json.dumps(item) + "\n"
+        except Exception as e:
+            yield json.dumps({"done": True, "error": str(e)}) + "\n"
+
+    return _HeldStream(body(), ticket.release, media_type="application/x-ndjson",
+                       headers={"X-Accel-Buffering": "no"})
+
+@app.get("/api/project/{project_id}/symbols")
+def search_symbols(project_id: str, q: str, kind: str = None, offset: int = 0, limit: int = 20):
     """
-    data = get_file_metadata(project_id, path)
-    if data is None:
-        return {"classes": [], "functions": [], "imports": []}
-    return data
+    Symbol search / autocomplete over functions, classes and files: exact,
+    prefix, substring and fuzzy matches, most-called first. Paged with
+    offset/limit; has_more tells whether another page exists.
+    """
+    index = get_project_symbols(project_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="Project has not been parsed")
+    results, has_more = index.search(q, kind, max(offset, 0), min(max(limit, 1), MAX_SEARCH_RESULTS))
+    return {"query": q, "results": results, "offset": offset, "has_more": has_more}
 
 @app.post("/api/ingest")
-def ingest_repository(request: IngestRequest):
+async def ingest_repository(request: IngestRequest):
+    # Dedup: reuse a clone of the same URL at the same commit
+    if not request.force:
+        commit_sha = await remote_head_async(request.url)
+        existing = commit_sha and await run_in_threadpool(catalog.find_project, request.url, commit_sha)
+        if existing and get_project_path(existing["project_id"]).is_dir():
+            return {
+                "project_id": existing["project_id"],
+                "file_tree": await run_in_threadpool(_scan_project, existing["project_id"]),
+                "message": "Repository already ingested at this commit",
+                "deduplicated": True,
+                "parse_status": existing["parse_status"]
+            }
+
+    # The clone is an awaited git subprocess, so it holds no threadpool thread
+    project_id = str(uuid.uuid4())
+    job = jobs.submit("clone", project_id, lambda: clone_repository_async(request.url, project_id),
+                      priority="full_clone")
     try:
-        project_id = clone_repository(request.url)
-        project_path = get_project_path(project_id)
+        await job.wait()
+        _index_for_search(project_id)
         
         # Auto-scan file tree
-        file_tree = scan_directory(project_path)
+        file_tree = await run_in_threadpool(_scan_project, project_id)
         
         # Auto-parse for Phase 2
         # (Optional: we can do this async or let frontend trigger it. 
@@ -69,83 +396,421 @@ def ingest_repository(request: IngestRequest):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/api/project/{project_id}/file")
-def get_file_content(project_id: str, path: str):
+@app.get("/api/project/{project_id}/file", dependencies=[Depends(_project_lease)])
+def get_file_content(project_id: str, path: str, request: Request):
     """
     Path param should be absolute path or relative? 
     Scanner returns absolute paths in 'path' field. 
     Ideally, we shouldn't expose absolute paths to frontend for security, but for a local tool it's acceptable.
     To be safer, we should verify the path is within the project directory.
+    The ETag is the file's git blob SHA, so unchanged content is never re-sent.
     """
-    project_root = get_project_path(project_id).resolve()
-    
-    # Handle both absolute (from FileTree) and relative (from Graph) paths
-    target_path = Path(path)
-    if target_path.is_absolute():
-        target_file = target_path.resolve()
-    else:
-        target_file = (project_root / target_path).resolve()
+    target_file = _resolve_project_file(project_id, path)
+    relative_path = target_file.relative_to(get_project_path(project_id).resolve()).as_posix()
 
-    # Security check: Ensure file is within project root
-    if not str(target_file).startswith(str(project_root)):
-        raise HTTPException(status_code=403, detail="Access denied: File outside project root")
+    try:
+        etag = f'"{get_blob_sha(project_id, relative_path)}"'
+        return _conditional_json(
+            request, etag, CACHE_IMMUTABLE,
+            lambda: {"content": target_file.read_text(encoding='utf-8', errors='replace')}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read file: {str(e)}")
+
+@app.get("/api/project/{project_id}/file/window", dependencies=[Depends(_project_lease)])
+def get_file_window(project_id: str, request: Request, path: str = None, start_line: int = 1,
+                    end_line: int = None, node_id: str = None):
+    """
+    Returns only lines start_line..end_line (1-based, inclusive) of a file.
+    With node_id ("path::Qualified.name" as in the graph), returns that function's lines.
+    Reads seek through a cached per-file line-offset index instead of loading the whole file.
+    """
+    if node_id:
+        path, _, func_name = node_id.partition("::")
+        metadata = get_file_metadata(project_id, path) or {}
+        func = next((f for f in metadata.get("functions", []) if f.get("full_name") == func_name), None)
+        if func is None:
+            raise HTTPException(status_code=404, detail=f"Node '{node_id}' not found")
+        start_line, end_line = func["lineno"], func.get("end_lineno") or func["lineno"]
+    if not path:
+        raise HTTPException(status_code=400, detail="Either path or node_id is required")
+    if end_line is None:
+        end_line = start_line + MAX_WINDOW_LINES - 1
+    if end_line - start_line + 1 > MAX_WINDOW_LINES:
+        raise HTTPException(status_code=400, detail=f"Window larger than {MAX_WINDOW_LINES} lines")
+
+    target_file = _resolve_project_file(project_id, path)
+    relative_path = target_file.relative_to(get_project_path(project_id).resolve()).as_posix()
 
-    if not target_file.exists():
-        raise HTTPException(status_code=404, detail="File not found")
-        
     try:
-        content = target_file.read_text(encoding='utf-8', errors='replace')
-        return {"content": content}
+        index = get_line_index(project_id, relative_path, target_file)
+        start_line, end_line = index.clamp(start_line, end_line)
+        etag = f'"{get_blob_sha(project_id, relative_path)}"'
+        return _conditional_json(request, etag, CACHE_IMMUTABLE, lambda: {
+            "path": relative_path,
+            "start_line": start_line,
+            "end_line": end_line,
+            "total_lines": index.line_count,
+            "content": index.read(start_line, end_line)
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to read file: {str(e)}")
 
+@app.get("/api/project/{project_id}/tokens", dependencies=[Depends(_project_lease)])
+def get_file_tokens(project_id: str, path: str, request: Request, start_line: int = 1, end_line: int = None):
+    """
+    Returns syntax-highlighting spans ([start_col, end_col, type] per line) for a
+    file or a line window. Tokenized server-side once per blob SHA and cached.
+    """
+    target_file = _resolve_project_file(project_id, path)
+    relative_path = target_file.relative_to(get_project_path(project_id).resolve()).as_posix()
+    language = get_language_from_ext(target_file.suffix.lower())
+
+    try:
+        blob_sha = get_blob_sha(project_id, relative_path)
+
+        def build():
+            lines = get_tokens(blob_sha, language, lambda: target_file.read_text(encoding='utf-8', errors='replace'))
+            start = max(1, start_line)
+            end = len(lines) if end_line is None else min(end_line, len(lines))
+            return {
+                "language": language,
+                "start_line": start,
+                "end_line": end,
+                "total_lines": len(lines),
+                "lines": lines[start - 1:end]
+            }
+
+        return _conditional_json(request, f'"tok-{blob_sha}"', CACHE_IMMUTABLE, build)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to tokenize file: {str(e)}")
+
 # --- Phase 3: Dependency Graph API ---
 
-from services.graph import build_graph
+from services.graph import build_graph, load_graph
 
 # Simple in-memory cache for graphs: project_id -> DependencyGraph
 # In production, use Redis or similar.
 GRAPH_CACHE = {}
+storage.on_evict(lambda project_id: GRAPH_CACHE.pop(project_id, None))
+
+async def _graph_job(project_id: str, profile: bool):
+    """Builds the graph into GRAPH_CACHE; returns (graph, profile_id or None)."""
+    if profile:
+        dg, profile_id = await jobs.run_cpu(profile_graph_build, project_id)
+    else:
+        dg, profile_id = await jobs.run_cpu(build_graph, project_id), None
+    GRAPH_CACHE[project_id] = dg
+    return dg, profile_id
+
+def _graph_summary(result) -> dict:
+    dg, profile_id = result
+    return {
+        "version": dg.version,
+        "nodes": dg.graph.number_of_nodes(),
+        "edges": dg.graph.number_of_edges(),
+        "profile_id": profile_id
+    }
+
+async def _get_graph(project_id: str):
+    """The project's current graph: cached, persisted, or built (one built from an older parse is stale)."""
+    cached = GRAPH_CACHE.get(project_id)
+    if cached is not None and cached.version != (get_parse_generation(project_id) or "empty"):
+        GRAPH_CACHE.pop(project_id, None)
+    record_cache("graph", project_id in GRAPH_CACHE)
+    if project_id not in GRAPH_CACHE:
+        # A graph persisted by an earlier build of the same parse is reused
+        dg = await run_in_threadpool(load_graph, project_id)
+        if dg is not None:
+            GRAPH_CACHE[project_id] = dg
+    if project_id not in GRAPH_CACHE:
+        # Check if project exists first?
+        # For now, just try to build it (in the worker pool, shared with any
+        # build already running for the project).
+        job = jobs.submit("graph_build", project_id, lambda: _graph_job(project_id, False), _graph_summary,
+                          priority="incremental")
+        try:
+            await job.wait()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to build graph: {str(e)}")
+    return GRAPH_CACHE[project_id]
 
 @app.get("/api/project/{project_id}/dependencies")
-def get_dependencies(project_id: str, node_id: str = None):
+async def get_dependencies(project_id: str, request: Request, node_id: str = None, profile: bool = False):
     """
     Returns dependency information for the graph or a specific node.
     If node_id is provided, returns callers/callees.
     If node_id is NOT provided, returns the full graph (for visualization).
+    The ETag is the graph version, so clients revalidate instead of re-downloading.
+    With profile=true the query is profiled and the X-Profile-Id header names the profile.
     """
     # 1. Get or Build Graph
-    if project_id not in GRAPH_CACHE:
-        # Check if project exists first?
-        # For now, just try to build it.
-        try:
-            GRAPH_CACHE[project_id] = build_graph(project_id)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to build graph: {str(e)}")
+    dg = await _get_graph(project_id)
+    etag = f'"graph-{dg.version}"'
     
-    dg = GRAPH_CACHE[project_id]
-    
-    # 2. Handle Node Query
-    if node_id:
-        node = dg.get_node(node_id)
-        if not node:
-            raise HTTPException(status_code=404, detail=f"Node '{node_id}' not found")
+    def query():
+        with track("query", project_id):
+            # 2. Handle Node Query
+            if node_id:
+                node = dg.get_node(node_id)
+                if not node:
+                    raise HTTPException(status_code=404, detail=f"Node '{node_id}' not found")
+                    
+                return _conditional_json(request, etag, CACHE_REVALIDATE, lambda: {
+                    "node": node,
+                    "callers": dg.get_callers(node_id),
+                    "callees": dg.get_callees(node_id)
+                })
             
+            # 3. Return Full Graph
+            return _conditional_json(request, etag, CACHE_REVALIDATE, dg.toJson)
+
+    # Node and graph queries are interactive: they take slots ahead of bulk work
+    async with scheduler.admit("interactive", project_id):
+        if not profile:
+            return await run_in_threadpool(query)
+        response, profile_id = await run_in_threadpool(run_profiled, "query", project_id, query)
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+async def _graph_query(project_id: str, query):
+    """Runs query(graph) in the threadpool under an interactive slot; QueryError becomes a 400 (or 404)."""
+    dg = await _get_graph(project_id)
+
+    def run():
+        with track("query", project_id):
+            return query(dg)
+
+    async with scheduler.admit("interactive", project_id):
+        try:
+            return await run_in_threadpool(run)
+        except traversal.QueryError as e:
+            raise HTTPException(status_code=404 if "not found" in str(e) else 400, detail=str(e))
+
+@app.get("/api/project/{project_id}/graph/neighborhood")
+async def get_neighborhood(project_id: str, node_id: str, direction: str = "downstream", depth: int = 2,
+                           edge_types: List[str] = Query(default=[]), max_nodes: int = 500,
+                           budget_seconds: float = traversal.QUERY_TIME_BUDGET_SECONDS):
+    """
+    Nodes within `depth` hops of node_id, following edges downstream (its
+    dependencies), upstream (its dependents) or both, optionally only edges of
+    the given types. Capped at max_nodes and a time budget; a capped result
+    has truncated=true.
+    """
+    max_nodes = min(max(max_nodes, 1), traversal.MAX_NEIGHBORHOOD_NODES)
+    return await _graph_query(project_id, lambda dg: traversal.neighborhood(
+        dg, node_id, direction, depth, edge_types, max_nodes, budget_seconds))
+
+@app.get("/api/project/{project_id}/graph/paths")
+async def get_paths(project_id: str, source: str, target: str, mode: str = "shortest",
+                    edge_types: List[str] = Query(default=[]), max_depth: int = None, max_paths: int = 20,
+                    budget_seconds: float = traversal.QUERY_TIME_BUDGET_SECONDS):
+    """
+    Why does source depend on target: with mode=shortest, one shortest
+    directed path (path is null if there is none); with mode=all, simple paths
+    of at most max_depth edges (default 6), up to max_paths.
+    """
+    if mode == "shortest":
+        return await _graph_query(project_id, lambda dg: traversal.shortest_path(
+            dg, source, target, edge_types, max_depth or traversal.MAX_DEPTH, budget_seconds))
+    if mode == "all":
+        return await _graph_query(project_id, lambda dg: traversal.all_paths(
+            dg, source, target, edge_types, max_depth or 6, max_paths, budget_seconds))
+    raise HTTPException(status_code=400, detail="mode must be shortest or all")
+
+@app.get("/api/project/{project_id}/cycles")
+async def get_cycles(project_id: str, kind: str = "imports", include_dag: bool = False, limit: int = 100):
+    """
+    Import cycles (kind=imports, between files) or recursive call groups
+    (kind=calls, between functions): every strongly connected component with
+    more than one node (or a self-loop), largest first, each with an example
+    cycle. include_dag=true adds the condensed DAG with a layer per component
+    for layered visualization. Computed when the graph is built.
+    """
+    if kind not in CYCLE_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(CYCLE_KINDS)}")
+    dg = await _get_graph(project_id)
+    report = dg.cycles[kind]
+    result = {
+        "kind": kind,
+        "version": dg.version,
+        "nodes": report["nodes"],
+        "cycle_count": len(report["cycles"]),
+        "cycles": report["cycles"][:max(limit, 0)]
+    }
+    if include_dag:
+        result["dag"] = report["dag"]
+    return result
+
+@app.get("/api/project/{project_id}/centrality")
+async def get_centrality_ranking(project_id: str, metric: str = "hotspot", node_type: str = None, limit: int = 50,
+                                 ascending: bool = False, node_id: str = None):
+    """
+    Top-K nodes by a structural metric: fan_in, fan_out, pagerank,
+    dependents (transitive), betweenness (sampled) or hotspot (their combined
+    percentile rank: the riskiest nodes to change). Optionally only one node
+    type (file/function). With node_id, that node's metrics instead.
+    Computed once per graph build.
+    """
+    if metric not in centrality.METRICS:
+        raise HTTPException(status_code=400, detail=f"metric must be one of {', '.join(centrality.METRICS)}")
+
+    def query(dg):
+        metrics = centrality.get_centrality(dg)
+        if node_id is not None:
+            if node_id not in dg.adjacency().index:
+                raise traversal.QueryError(f"Node '{node_id}' not found")
+            return {"node": metrics.node(dg.adjacency().index[node_id])}
         return {
-            "node": node,
-            "callers": dg.get_callers(node_id),
-            "callees": dg.get_callees(node_id)
+            "metric": metric,
+            "dependents_exact": metrics.dependents_exact,
+            "nodes": metrics.top(metric, min(max(limit, 1), centrality.MAX_TOP_K), node_type, ascending)
         }
-    
-    # 3. Return Full Graph
-    return dg.toJson()
+
+    return await _graph_query(project_id, query)
+
+class ReachabilityRequest(BaseModel):
+    pairs: List[List[str]] = []
+    sources: List[str] = []
+    targets: List[str] = []
+    edge_types: List[str] = []
+
+@app.post("/api/project/{project_id}/reachability")
+async def check_reachability(project_id: str, request: ReachabilityRequest):
+    """
+    Batch "does A depend on B" checks against the graph's precomputed
+    reachability index: `pairs` gets one answer per [A, B] (null for unknown
+    nodes); `sources` x `targets` gets, per source, the targets it reaches.
+    Optionally only through edges of the given types.
+    """
+    return await _graph_query(project_id, lambda dg: reachability.query_batch(
+        dg, request.pairs, request.sources, request.targets, request.edge_types))
+
+MAX_USAGES_PAGE = 1000
+
+@app.get("/api/project/{project_id}/usages")
+async def get_usages(project_id: str, node_id: str = None, name: str = None, offset: int = 0, limit: int = 100):
+    """
+    Find usages: every call site (file, enclosing function, line) of a graph
+    node (node_id), or of calls that resolved to no node, by callee name
+    (name). Answered from the call-site index built with the graph.
+    """
+    if bool(node_id) == bool(name):
+        raise HTTPException(status_code=400, detail="Pass exactly one of node_id or name")
+    dg = await _get_graph(project_id)
+    if node_id:
+        if dg.get_node(node_id) is None:
+            raise HTTPException(status_code=404, detail=f"Node '{node_id}' not found")
+        sites = dg.get_usages(node_id)
+    else:
+        sites = dg.get_unresolved_usages(name)
+    offset = max(offset, 0)
+    page = sites[offset:offset + min(max(limit, 1), MAX_USAGES_PAGE)]
+    return {
+        "node_id": node_id,
+        "name": name,
+        "total": len(sites),
+        "offset": offset,
+        "usages": [
+            {"file": file, "caller": caller, "lineno": lineno, "args_count": args_count,
+             "resolution": "unresolved" if name else detail, "callee_name": detail if name else None}
+            for file, caller, lineno, args_count, detail in page
+        ]
+    }
 
 @app.post("/api/project/{project_id}/rebuild_graph")
-def rebuild_graph_endpoint(project_id: str):
-    """Force rebuild of the dependency graph."""
+async def rebuild_graph_endpoint(project_id: str, profile: bool = False, wait: bool = True):
+    """
+    Force rebuild of the dependency graph, in the worker process pool.
+    With wait=false, responds 202 with the job to poll at /api/jobs/{job_id}.
+    With profile=true, also stores a profile.
+    """
+    job = jobs.submit("graph_build", project_id, lambda: _graph_job(project_id, profile), _graph_summary,
+                      priority="incremental", profile=profile)
+    if not wait:
+        return JSONResponse(job.to_dict(), status_code=202)
     try:
-        GRAPH_CACHE[project_id] = build_graph(project_id)
-        return {"status": "ok", "message": "Graph rebuilt successfully"}
+        _, profile_id = await job.wait()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if profile_id:
+        return {"status": "ok", "message": "Graph rebuilt successfully", "profile_id": profile_id}
+    return {"status": "ok", "message": "Graph rebuilt successfully"}
+
+# --- Background jobs ---
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Status of a clone, parse or graph build job (queued, running, completed, failed, cancelled)."""
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/api/scheduler")
+async def get_scheduler_stats():
+    """Running and queued work per priority class."""
+    return scheduler.stats()
+
+@app.get("/api/project/{project_id}/jobs")
+async def get_project_jobs(project_id: str):
+    """The project's recent jobs, newest first."""
+    return {"jobs": jobs.list_jobs(project_id)}
+
+# --- Storage ---
+
+@app.get("/api/storage")
+def get_storage_usage():
+    """Disk usage per project (clone, metadata, graph), last access, pins and quotas."""
+    return storage.get_usage()
+
+@app.post("/api/storage/gc")
+def run_storage_gc():
+    """Runs a garbage collection pass now instead of waiting for the background one."""
+    return storage.collect()
+
+@app.put("/api/project/{project_id}/pin")
+def pin_project(project_id: str):
+    """Exempts the project from eviction."""
+    storage.set_pinned(project_id, True)
+    return {"project_id": project_id, "pinned": True}
+
+@app.delete("/api/project/{project_id}/pin")
+def unpin_project(project_id: str):
+    storage.set_pinned(project_id, False)
+    return {"project_id": project_id, "pinned": False}
+
+@app.delete("/api/project/{project_id}")
+def delete_project(project_id: str):
+    """Evicts the project now. 409 while it is pinned or has jobs in flight."""
+    if not storage.evict(project_id):
+        raise HTTPException(status_code=409, detail="Project is pinned or in use")
+    return {"project_id": project_id, "deleted": True}
+
+# --- Profiling artifacts ---
+
+from services.profiling import (
+    get_profile_artifact, list_profiles, profile_graph_build, profile_parse, run_profiled
+)
+
+@app.get("/api/project/{project_id}/profiles")
+def get_profiles(project_id: str):
+    """Lists stored profiles for a project, newest first."""
+    return {"profiles": list_profiles(project_id)}
+
+@app.get("/api/project/{project_id}/profiles/{profile_id}")
+def get_profile_report(project_id: str, profile_id: str):
+    """Top-N report for a profile: hottest functions plus slowest files / resolution steps."""
+    report = get_profile_artifact(project_id, profile_id, ".json")
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(report, media_type="application/json")
+
+@app.get("/api/project/{project_id}/profiles/{profile_id}/download")
+def download_profile(project_id: str, profile_id: str):
+    """Raw cProfile output (.pstats) for snakeviz, pstats or gprof2dot."""
+    stats = get_profile_artifact(project_id, profile_id, ".pstats")
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(stats, media_type="application/octet-stream", filename=stats.name)
 
@@ -1,86 +1,385 @@
 import os
 import json
 import shutil
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional, Tuple
+from services import catalog
+from services.cache import LRUCache
 from services.ingestion import get_project_path
-from services.parser import parse_file
+from services.metrics import BYTES, FILES, STAGE_SECONDS, record_cache, track
+from services.parser import parse_file, record_to_json
+from services.symbols import SymbolIndex, SymbolIndexBuilder, get_symbol_index
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 METADATA_BASE_PATH = BASE_DIR / "metadata"
 
+# Upper bound on records returned by one batch metadata request
+MAX_BATCH_FILES = 5000
+
+# --- Metadata generations ---
+# Each parse writes a complete snapshot to metadata/<id>/.generations/<generation>/
+# and then atomically repoints metadata/<id>/.current at it, so readers see
+# either the old snapshot or the new one, never a partial parse. Older
+# snapshots are removed after the switch, keeping KEEP_GENERATIONS for readers
+# still finishing on the previous one. Projects parsed before this layout keep
+# their records directly under metadata/<id>/ until their next parse.
+CURRENT_FILE = ".current"
+GENERATIONS_DIR = ".generations"
+KEEP_GENERATIONS = 2
+GENERATION_FILE = ".generation" # Legacy layout: token of the flat records
+LEGACY_GENERATION = "0"         # Metadata written before generations existed
+
+# --- Metadata read cache ---
+# Decoded records are cached per project, keyed by relative path. A project's
+# cache is dropped as soon as its generation moves on, so stale records are
+# never served.
+METADATA_CACHE_SIZE = 1024      # Records per project
+METADATA_CACHE_PROJECTS = 32    # Projects with a live record cache
+
+_generations: Dict[str, Tuple[str, Path]] = {} # project_id -> (generation, records directory)
+_record_caches = LRUCache(METADATA_CACHE_PROJECTS) # project_id -> (generation, LRUCache)
+
 def get_metadata_path(project_id: str) -> Path:
+    """Root of everything stored for the project (all generations)."""
     return METADATA_BASE_PATH / project_id
 
-def parse_project(project_id: str) -> Dict:
-    project_path = get_project_path(project_id)
+def _generations_path(project_id: str) -> Path:
+    return get_metadata_path(project_id) / GENERATIONS_DIR
+
+def get_current_generation(project_id: str, fresh: bool = False) -> Tuple[Optional[str], Path]:
+    """
+    (generation, directory of its records) for the project's current metadata.
+    The generation is None if the project was never parsed.
+    The answer is memoized per process and only this process's parses and
+    invalidate_project() move it on; pass fresh=True to re-read .current,
+    e.g. in a pool worker, where another process may have published since.
+    """
+    current = None if fresh else _generations.get(project_id)
+    if current is None:
+        metadata_path = get_metadata_path(project_id)
+        try:
+            generation = (metadata_path / CURRENT_FILE).read_text(encoding="utf-8").strip()
+            current = (generation, _generations_path(project_id) / generation)
+        except OSError:
+            # Legacy layout: records directly under metadata/<id>/
+            try:
+                generation = (metadata_path / GENERATION_FILE).read_text(encoding="utf-8").strip()
+            except OSError:
+                if not metadata_path.is_dir():
+                    return None, metadata_path
+                generation = LEGACY_GENERATION
+            current = (generation, metadata_path)
+        _generations[project_id] = current
+    return current
+
+def get_parse_generation(project_id: str) -> Optional[str]:
+    """Token identifying the project's current metadata; None if never parsed."""
+    return get_current_generation(project_id)[0]
+
+def get_generation_path(project_id: str) -> Path:
+    """Directory holding the project's current records."""
+    return get_current_generation(project_id)[1]
+
+def iter_record_files(root: Path) -> Iterator[Path]:
+    """
+    Every *.py.json under `root`. Snapshot directories are skipped: a legacy
+    project's flat records share metadata/<id>/ with its first new snapshot.
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        if GENERATIONS_DIR in dirnames:
+            dirnames.remove(GENERATIONS_DIR)
+        for name in filenames:
+            if name.endswith(".py.json"):
+                yield Path(dirpath) / name
+
+def _publish_generation(project_id: str, generation: str):
+    """Atomically makes `generation` current, then removes superseded snapshots."""
     metadata_path = get_metadata_path(project_id)
-    
-    # Clean previous metadata
-    if metadata_path.exists():
-        shutil.rmtree(metadata_path)
-    os.makedirs(metadata_path, exist_ok=True)
-    
-    parsed_count = 0
-    errors = []
-    
-    # Walk through the project
-    for root, _, files in os.walk(project_path):
-        for file in files:
-            if file.endswith(".py"):
-                full_path = Path(root) / file
-                relative_path = full_path.relative_to(project_path)
-                
-                # Parse
-                result = parse_file(str(full_path))
-                
-                # Inject relative path for frontend usage
-                result["relative_path"] = str(relative_path)
-                
-                # Save metadata
-                # Structure: metadata/project_id/path/to/file.py.json
-                # We flatten directory structure or replicate it? 
-                # Replicating is safer for collisions.
-                target_meta_file = metadata_path / relative_path.with_suffix(".py.json")
-                
-                # Ensure parent dirs exist
-                os.makedirs(target_meta_file.parent, exist_ok=True)
-                
-                with open(target_meta_file, "w", encoding="utf-8") as f:
-                    json.dump(result, f, indent=2)
-                
-                if "error" in result:
-                    errors.append(result)
-                else:
-                    parsed_count += 1
-
-    return {
-        "status": "completed",
-        "parsed_files": parsed_count,
-        "errors": len(errors),
-        "metadata_path": str(metadata_path)
-    }
+    pointer = metadata_path / f"{CURRENT_FILE}.{generation}.tmp"
+    pointer.write_text(generation, encoding="utf-8")
+    os.replace(pointer, metadata_path / CURRENT_FILE)
+    _generations[project_id] = (generation, _generations_path(project_id) / generation)
+    _collect_generations(project_id, generation)
 
-def get_file_metadata(project_id: str, path: str) -> Dict:
+def _collect_generations(project_id: str, current: str):
+    """
+    Removes snapshots older than the newest KEEP_GENERATIONS up to `current`,
+    including the legacy flat layout. Newer directories are parses still in
+    progress and are left alone.
+    """
     metadata_path = get_metadata_path(project_id)
-    project_root = get_project_path(project_id).resolve()
-    
+    generations = []
+    for entry in os.scandir(_generations_path(project_id)):
+        try:
+            generations.append((int(entry.name, 16), entry.path))
+        except ValueError:
+            continue
+    generations.sort()
+    published = [path for token, path in generations if token <= int(current, 16)]
+    for path in published[:-KEEP_GENERATIONS]:
+        shutil.rmtree(path, ignore_errors=True)
+
+    if len(published) >= KEEP_GENERATIONS:
+        for entry in os.scandir(metadata_path):
+            if entry.name in (CURRENT_FILE, GENERATIONS_DIR) or entry.name.startswith(f"{CURRENT_FILE}."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.unlink(entry.path)
+
+def invalidate_project(project_id: str):
+    """Drops the cached generation and records, e.g. after another process re-parsed the project."""
+    _generations.pop(project_id, None)
+    _record_caches.pop(project_id)
+
+def _record_cache(project_id: str, generation: str = None) -> LRUCache:
+    generation = generation or get_parse_generation(project_id)
+    entry = _record_caches.get(project_id)
+    if entry is None or entry[0] != generation:
+        entry = (generation, LRUCache(METADATA_CACHE_SIZE))
+        _record_caches.put(project_id, entry)
+    return entry[1]
+
+@lru_cache(maxsize=64)
+def _project_root(project_id: str) -> Path:
+    return get_project_path(project_id).resolve()
+
+@lru_cache(maxsize=8192)
+def normalize_source_path(project_id: str, path: str) -> str:
+    """Project-relative POSIX form of a source path sent by the frontend."""
     # Handle absolute paths from frontend
     path_obj = Path(path)
     if path_obj.is_absolute():
         try:
             # Try to make it relative to the real project root
             # We must be careful about resolving symlinks or case sensitivity on Windows
-            path_obj = path_obj.resolve().relative_to(project_root)
+            path_obj = path_obj.resolve().relative_to(_project_root(project_id))
         except ValueError:
             # Fallback: maybe the frontend sent a path that doesn't match our resolved root?
             # Try string manipulation if simple resolution fails (weird windows drive letter casing)
             pass
+    return path_obj.as_posix()
 
-    target_file = metadata_path / path_obj.with_suffix(".py.json")
+def _list_python_files(project_path: Path) -> List[Path]:
+    files = []
+    for root, _, names in os.walk(project_path):
+        for name in names:
+            if name.endswith(".py"):
+                files.append(Path(root) / name)
+    return files
+
+def iter_parse_project(project_id: str) -> Iterator[Dict]:
+    """
+    Parses a project file by file, yielding progress events as it goes:
+    one "start" event, one "file" event per file (status + timing, running
+    totals, ETA) and a final "complete" event carrying the summary that
+    parse_project returns.
+    """
+    catalog.record_parse_started(project_id)
+    try:
+        with track("parse", project_id):
+            for event in _parse_events(project_id):
+                if event["event"] == "start":
+                    total_files = event["total_files"]
+                elif event["event"] == "complete":
+                    catalog.record_parse_complete(project_id, event, total_files)
+                yield event
+    except BaseException as e:
+        # Includes a streaming client going away mid-parse (GeneratorExit)
+        catalog.record_parse_failed(project_id, str(e) or type(e).__name__)
+        raise
+
+def _parse_events(project_id: str) -> Iterator[Dict]:
+    # Records go to a fresh generation directory, published only once complete
+    generation = f"{time.time_ns():x}"
+    metadata_path = _generations_path(project_id) / generation
+    os.makedirs(metadata_path)
+    try:
+        yield from _write_generation(project_id, generation, metadata_path)
+    except BaseException:
+        # Failed or abandoned parse: readers stay on the previous generation
+        shutil.rmtree(metadata_path, ignore_errors=True)
+        raise
+
+def _write_generation(project_id: str, generation: str, metadata_path: Path) -> Iterator[Dict]:
+    project_path = get_project_path(project_id)
+    symbols = SymbolIndexBuilder()
+    parsed_count = 0
+    errors = []
+    guardrails = {"skipped": 0, "degraded": 0}
+
+    files = _list_python_files(project_path)
+    total = len(files)
+    started = time.perf_counter()
+    yield {"event": "start", "project_id": project_id, "total_files": total}
     
+    for done, full_path in enumerate(files, start=1):
+        file_started = time.perf_counter()
+        relative_path = full_path.relative_to(project_path)
+        
+        # Parse
+        result = parse_file(str(full_path))
+        STAGE_SECONDS.observe(time.perf_counter() - file_started, stage="parse_file", project=project_id)
+        BYTES.inc(full_path.stat().st_size, stage="parse", project=project_id)
+        
+        # Inject relative path for frontend usage
+        result["relative_path"] = str(relative_path)
+        symbols.add(str(relative_path), result)
+        
+        # Save metadata
+        # Structure: metadata/project_id/.generations/<generation>/path/to/file.py.json
+        # We flatten directory structure or replicate it? 
+        # Replicating is safer for collisions.
+        target_meta_file = metadata_path / relative_path.with_suffix(".py.json")
+        
+        # Ensure parent dirs exist
+        os.makedirs(target_meta_file.parent, exist_ok=True)
+        
+        write_started = time.perf_counter()
+        with open(target_meta_file, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, default=record_to_json)
+            written = f.tell()
+        STAGE_SECONDS.observe(time.perf_counter() - write_started, stage="metadata_write", project=project_id)
+        BYTES.inc(written, stage="metadata_write", project=project_id)
+        
+        guardrail = result.get("guardrail")
+        if "error" in result:
+            errors.append(result)
+            status = "errored"
+        elif guardrail and guardrail["status"] == "skipped":
+            # Refused by the budgets: an empty record, not a parse
+            status = "skipped"
+        else:
+            parsed_count += 1
+            status = guardrail["status"] if guardrail else "parsed"
+        if guardrail:
+            guardrails[guardrail["status"]] += 1
+        FILES.inc(stage="parse", project=project_id, status=status)
+
+        elapsed = time.perf_counter() - started
+        yield {
+            "event": "file",
+            "path": str(relative_path),
+            "status": status,
+            "error": result.get("error"),
+            "ms": round((time.perf_counter() - file_started) * 1000, 2),
+            "done": done,
+            "total": total,
+            "parsed": parsed_count,
+            "errors": len(errors),
+            "elapsed_ms": round(elapsed * 1000),
+            "eta_ms": round(elapsed / done * (total - done) * 1000)
+        }
+
+    symbols.write(metadata_path)
+    _publish_generation(project_id, generation)
+    yield {
+        "event": "complete",
+        "status": "completed",
+        "parsed_files": parsed_count,
+        "errors": len(errors),
+        "skipped_files": guardrails["skipped"],
+        "degraded_files": guardrails["degraded"],
+        "metadata_path": str(metadata_path),
+        "generation": generation,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000)
+    }
+
+def parse_project(project_id: str) -> Dict:
+    summary = {}
+    for event in iter_parse_project(project_id):
+        summary = event
+    summary.pop("event", None)
+    return summary
+
+def get_metadata_file(project_id: str, path: str, generation_path: Path = None) -> Path:
+    """Maps a source file path (absolute or project-relative) to its current metadata file."""
+    relative_path = normalize_source_path(project_id, path)
+    return (generation_path or get_generation_path(project_id)) / Path(relative_path).with_suffix(".py.json")
+
+def get_file_metadata(project_id: str, path: str) -> Dict:
+    # One generation for both the cache and the file, so a publish in between
+    # can't cache a new record under the old generation (or the reverse)
+    generation, metadata_path = get_current_generation(project_id)
+    relative_path = normalize_source_path(project_id, path)
+    cache = _record_cache(project_id, generation)
+    record = cache.get(relative_path)
+    record_cache("metadata", record is not None)
+    if record is not None:
+        return record
+
+    target_file = get_metadata_file(project_id, path, metadata_path)
     if not target_file.exists():
         return None
         
     with open(target_file, "r", encoding="utf-8") as f:
-        return json.load(f)
+        record = json.load(f)
+    cache.put(relative_path, record)
+    return record
+
+def get_project_symbols(project_id: str) -> Optional[SymbolIndex]:
+    """Symbol index of the current generation; None if the project was never parsed."""
+    generation, metadata_path = get_current_generation(project_id)
+    if generation is None:
+        return None
+    index = get_symbol_index(project_id, generation, metadata_path)
+    if index is None:
+        # Generations written before symbol indexes existed: build it once from the records
+        builder = SymbolIndexBuilder()
+        for meta_file in iter_record_files(metadata_path):
+            with open(meta_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            builder.add(data.get("relative_path", ""), data)
+        builder.write(metadata_path)
+        index = get_symbol_index(project_id, generation, metadata_path)
+    return index
+
+def iter_metadata_batch(project_id: str, paths: List[str] = (), prefix: str = None,
+                        limit: int = MAX_BATCH_FILES) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Yields (path, raw JSON record or None) for each path in `paths`, then for
+    every parsed file under the directory `prefix`. Records are passed through
+    undecoded so callers can splice them straight into a response. Stops after
+    `limit` records. Raises ValueError right away (not on iteration) if
+    `prefix` is outside the project.
+    """
+    # One generation for the whole batch, even if a re-parse publishes mid-way
+    generation, metadata_path = get_current_generation(project_id)
+    root = None
+    if prefix is not None:
+        root = (metadata_path / prefix.strip("/\\")).resolve()
+        base = metadata_path.resolve()
+        if root != base and base not in root.parents:
+            raise ValueError(f"Prefix '{prefix}' is outside the project")
+    return _iter_metadata_batch(project_id, generation, metadata_path, paths, root, limit)
+
+def _iter_metadata_batch(project_id: str, generation: str, metadata_path: Path, paths: List[str],
+                         root: Optional[Path], limit: int) -> Iterator[Tuple[str, Optional[str]]]:
+    count = 0
+    cache = _record_cache(project_id, generation)
+    for path in paths:
+        if count >= limit:
+            return
+        record = cache.get(normalize_source_path(project_id, path))
+        if record is not None:
+            yield path, json.dumps(record)
+        else:
+            target_file = get_metadata_file(project_id, path, metadata_path)
+            yield path, target_file.read_text(encoding="utf-8") if target_file.is_file() else None
+        count += 1
+
+    if root is None:
+        return
+    base = metadata_path.resolve()
+    if not root.is_dir() or GENERATIONS_DIR in root.relative_to(base).parts:
+        return
+    for meta_file in sorted(iter_record_files(root)):
+        if count >= limit:
+            return
+        # <generation dir>/pkg/mod.py.json -> pkg/mod.py
+        relative_path = meta_file.relative_to(base).as_posix()[:-len(".json")]
+        yield relative_path, meta_file.read_text(encoding="utf-8")
+        count += 1
@@ -0,0 +1,117 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CATALOG_PATH = BASE_DIR / "catalog.db"
+
+# Parse status values
+PENDING = "pending"
+PARSING = "parsing"
+PARSED = "parsed"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    project_id       TEXT PRIMARY KEY,
+    url              TEXT,
+    commit_sha       TEXT,
+    ingested_at      REAL NOT NULL,
+    parse_status     TEXT NOT NULL DEFAULT 'pending',
+    parse_generation TEXT,
+    parsed_at        REAL,
+    total_files      INTEGER,
+    parsed_files     INTEGER,
+    error_files      INTEGER,
+    skipped_files    INTEGER,
+    degraded_files   INTEGER,
+    parse_error      TEXT
+);
+CREATE INDEX IF NOT EXISTS projects_url ON projects (url);
+CREATE INDEX IF NOT EXISTS projects_commit ON projects (commit_sha);
+CREATE INDEX IF NOT EXISTS projects_status ON projects (parse_status);
+"""
+
+# One connection per thread (and per worker process)
+_local = threading.local()
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(CATALOG_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        # WAL lets the API read while a parse worker writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+def record_clone(project_id: str, url: str, commit_sha: Optional[str]):
+    _connect().execute(
+        "INSERT OR REPLACE INTO projects (project_id, url, commit_sha, ingested_at) VALUES (?, ?, ?, ?)",
+        (project_id, url, commit_sha, time.time())
+    )
+
+def backfill_project(project_id: str, url: Optional[str], commit_sha: Optional[str], ingested_at: float,
+                     parse_generation: Optional[str]):
+    """Catalogs a clone made before the catalog existed (counts unknown)."""
+    _connect().execute(
+        """INSERT OR IGNORE INTO projects (project_id, url, commit_sha, ingested_at, parse_status, parse_generation)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (project_id, url, commit_sha, ingested_at, PARSED if parse_generation else PENDING, parse_generation)
+    )
+
+def record_parse_started(project_id: str):
+    _connect().execute(
+        "UPDATE projects SET parse_status = ?, parse_error = NULL WHERE project_id = ?", (PARSING, project_id)
+    )
+
+def record_parse_complete(project_id: str, summary: Dict, total_files: int):
+    _connect().execute(
+        """UPDATE projects SET parse_status = ?, parse_generation = ?, parsed_at = ?, total_files = ?,
+           parsed_files = ?, error_files = ?, skipped_files = ?, degraded_files = ?, parse_error = NULL
+           WHERE project_id = ?""",
+        (PARSED, summary["generation"], time.time(), total_files, summary["parsed_files"], summary["errors"],
+         summary["skipped_files"], summary["degraded_files"], project_id)
+    )
+
+def record_parse_failed(project_id: str, error: str):
+    _connect().execute(
+        "UPDATE projects SET parse_status = ?, parse_error = ? WHERE project_id = ?", (FAILED, error, project_id)
+    )
+
+def remove_project(project_id: str):
+    _connect().execute("DELETE FROM projects WHERE project_id = ?", (project_id,))
+
+def get_project(project_id: str) -> Optional[Dict]:
+    row = _connect().execute("SELECT * FROM projects WHERE project_id = ?", (project_id,)).fetchone()
+    return dict(row) if row else None
+
+def find_project(url: str, commit_sha: str) -> Optional[Dict]:
+    """Most recent project cloned from `url` at `commit_sha`, preferring parsed ones."""
+    row = _connect().execute(
+        """SELECT * FROM projects WHERE url = ? AND commit_sha = ?
+           ORDER BY parse_status = 'parsed' DESC, ingested_at DESC LIMIT 1""",
+        (url, commit_sha)
+    ).fetchone()
+    return dict(row) if row else None
+
+def list_projects(url: str = None, commit_sha: str = None, status: str = None,
+                  limit: int = 100, offset: int = 0) -> List[Dict]:
+    """Projects matching the given filters, newest ingest first."""
+    clauses, params = [], []
+    for column, value in (("url", url), ("commit_sha", commit_sha), ("parse_status", status)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = _connect().execute(
+        f"SELECT * FROM projects {where} ORDER BY ingested_at DESC LIMIT ? OFFSET ?", (*params, limit, offset)
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+def project_ids() -> List[str]:
+    return [row[0] for row in _connect().execute("SELECT project_id FROM projects")]
@@ -0,0 +1,217 @@
+from typing import Dict, List, Optional
+import numpy as np
+from services.graph import EDGE_TYPES, DependencyGraph
+from services.reachability import condensation, strongly_connected_components
+
+# Dependency edges ("contains" only groups functions under their file)
+CENTRALITY_EDGE_TYPES = ("imports", "calls", "calls_ambiguous")
+
+METRICS = ("fan_in", "fan_out", "pagerank", "dependents", "betweenness", "hotspot")
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-8
+PAGERANK_MAX_ITERATIONS = 100
+
+# Betweenness is estimated from this many sampled BFS sources
+BETWEENNESS_SAMPLES = 64
+
+# Exact transitive dependent counts (one bitset per component) up to this
+# many components; an estimate beyond it
+EXACT_DEPENDENTS_MAX_COMPONENTS = 20000
+DEPENDENTS_SKETCHES = 32
+
+MAX_TOP_K = 1000
+
+class Centrality:
+    """
+    Structural metrics for every graph node, as arrays indexed like the
+    graph's Adjacency. Computed with vectorized sparse operations over the
+    edge list (a matrix-vector product is one np.bincount), not per-node loops.
+    """
+
+    def __init__(self, dg: DependencyGraph):
+        adj = dg.adjacency()
+        self.ids = adj.ids
+        self.types = np.array([dg.graph.nodes[node_id].get("type", "") for node_id in self.ids])
+        n = len(self.ids)
+
+        wanted = np.array([EDGE_TYPES.index(t) for t in CENTRALITY_EDGE_TYPES], dtype=np.int8)
+        types = np.frombuffer(adj.out_types, dtype=np.int8)
+        keep = np.isin(types, wanted)
+        sources = np.repeat(np.arange(n, dtype=np.int64), np.diff(np.frombuffer(adj.out_offsets, dtype=np.int32)))
+        self.sources = sources[keep]
+        self.targets = np.frombuffer(adj.out_targets, dtype=np.int32).astype(np.int64)[keep]
+        # Parallel edges of different types count once
+        if len(self.sources):
+            pairs = np.unique(self.sources * n + self.targets)
+            self.sources, self.targets = pairs // n, pairs % n
+
+        self.fan_in = np.bincount(self.targets, minlength=n)
+        self.fan_out = np.bincount(self.sources, minlength=n)
+        self.pagerank = self._pagerank(n)
+        self.betweenness = self._betweenness(n)
+        self.dependents, self.dependents_exact = self._dependents(adj, n)
+        self.hotspot = self._hotspot()
+
+    def _pagerank(self, n: int) -> np.ndarray:
+        """Power iteration; rank flows along dependency edges to what is depended on."""
+        if not n:
+            return np.zeros(0)
+        weights = 1.0 / np.maximum(self.fan_out, 1)[self.sources]
+        dangling = self.fan_out == 0
+        rank = np.full(n, 1.0 / n)
+        for _ in range(PAGERANK_MAX_ITERATIONS):
+            spread = np.bincount(self.targets, weights=rank[self.sources] * weights, minlength=n)
+            updated = (1 - PAGERANK_DAMPING) / n + PAGERANK_DAMPING * (spread + rank[dangling].sum() / n)
+            converged = np.abs(updated - rank).sum() < PAGERANK_TOLERANCE
+            rank = updated
+            if converged:
+                break
+        return rank
+
+    def _betweenness(self, n: int) -> np.ndarray:
+        """
+        Brandes' algorithm from a random sample of sources, scaled to all n.
+        Each BFS level is one vectorized step over the frontier's out-edges.
+        """
+        betweenness = np.zeros(n)
+        if not n or not len(self.sources):
+            return betweenness
+        order = np.argsort(self.sources, kind="stable")
+        targets = self.targets[order]
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(self.fan_out, out=offsets[1:])
+        samples = np.random.default_rng(0).choice(n, size=min(BETWEENNESS_SAMPLES, n), replace=False)
+
+        for source in samples:
+            distance = np.full(n, -1, dtype=np.int64)
+            sigma = np.zeros(n)
+            distance[source] = 0
+            sigma[source] = 1
+            frontier = np.array([source])
+            levels = []   # (edge sources, edge targets) on shortest paths, per level
+            depth = 0
+            while len(frontier):
+                counts = offsets[frontier + 1] - offsets[frontier]
+                edge_index = np.repeat(offsets[frontier] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+                edge_sources = np.repeat(frontier, counts)
+                edge_targets = targets[edge_index]
+                new = edge_targets[distance[edge_targets] == -1]
+                distance[new] = depth + 1
+                on_path = distance[edge_targets] == depth + 1
+                edge_sources, edge_targets = edge_sources[on_path], edge_targets[on_path]
+                np.add.at(sigma, edge_targets, sigma[edge_sources])
+                levels.append((edge_sources, edge_targets))
+                frontier = np.unique(new)
+                depth += 1
+
+            delta = np.zeros(n)
+            for edge_sources, edge_targets in reversed(levels):
+                np.add.at(delta, edge_sources, sigma[edge_sources] / sigma[edge_targets] * (1 + delta[edge_targets]))
+            delta[source] = 0
+            betweenness += delta
+        return betweenness * (n / len(samples))
+
+    def _dependents(self, adj, n: int):
+        """
+        Nodes that transitively depend on each node. Exact over the SCC
+        condensation with bitsets when it is small enough; otherwise a
+        min-hash size estimate (Cohen) propagated layer by layer.
+        """
+        if not n:
+            return np.zeros(0, dtype=np.int64), True
+        type_mask = 0
+        for edge_type in CENTRALITY_EDGE_TYPES:
+            type_mask |= 1 << EDGE_TYPES.index(edge_type)
+        node_component, count = strongly_connected_components(adj, type_mask)
+        successors = condensation(adj, node_component, count, type_mask)
+        component = np.frombuffer(node_component, dtype=np.int32).astype(np.int64)
+        sizes = np.bincount(component, minlength=count)
+
+        if count <= EXACT_DEPENDENTS_MAX_COMPONENTS:
+            # ancestors[c]: bit a set iff a reaches c. Predecessors have higher
+            # ids, so walking ids downwards completes them first.
+            ancestors = [0] * count
+            for c in range(count - 1, -1, -1):
+                ancestors[c] |= 1 << c
+                for successor in successors[c]:
+                    ancestors[successor] |= ancestors[c]
+            if (sizes == 1).all():
+                totals = np.array([bits.bit_count() for bits in ancestors], dtype=np.int64)
+                return totals[component] - 1, True
+            totals = np.zeros(count, dtype=np.int64)
+            for c in range(count):
+                bits = np.unpackbits(np.frombuffer(ancestors[c].to_bytes((count + 7) // 8, "little"), dtype=np.uint8),
+                                     bitorder="little")[:count]
+                totals[c] = sizes[bits.astype(bool)].sum()
+            # Members of a component depend on each other, not on themselves
+            return totals[component] - 1, True
+
+        # Every node draws DEPENDENTS_SKETCHES Exp(1) variables; the minimum over
+        # a component's members is Exp(size), and the minimum over everything
+        # reaching a component estimates how many nodes that is
+        rng = np.random.default_rng(0)
+        sketch = rng.exponential(1 / sizes[:, None], size=(count, DEPENDENTS_SKETCHES)).astype(np.float32)
+        edge_sources = np.repeat(np.arange(count), [len(s) for s in successors])
+        edge_targets = np.fromiter((t for s in successors for t in s), dtype=np.int64, count=len(edge_sources))
+        # Longest-path layers: every edge goes to a later layer
+        layers = [0] * count
+        for c in range(count - 1, -1, -1):
+            for successor in successors[c]:
+                if layers[successor] <= layers[c]:
+                    layers[successor] = layers[c] + 1
+        layer = np.array(layers, dtype=np.int64)
+        by_layer = np.argsort(layer[edge_sources], kind="stable")
+        edge_sources, edge_targets = edge_sources[by_layer], edge_targets[by_layer]
+        bounds = np.searchsorted(layer[edge_sources], np.arange(layer.max() + 2))
+        for i in range(len(bounds) - 1):
+            s, t = edge_sources[bounds[i]:bounds[i + 1]], edge_targets[bounds[i]:bounds[i + 1]]
+            np.minimum.at(sketch, t, sketch[s])
+        estimate = (DEPENDENTS_SKETCHES - 1) / sketch.sum(axis=1)
+        return np.maximum(np.rint(estimate[component]) - 1, 0).astype(np.int64), False
+
+    def _hotspot(self) -> np.ndarray:
+        """
+        Mean percentile rank over pagerank, dependents, betweenness and fan-in
+        (0..1). Tied values share the average of the ranks they span.
+        """
+        n = len(self.ids)
+        if n < 2:
+            return np.zeros(n)
+        score = np.zeros(n)
+        for values in (self.pagerank, self.dependents, self.betweenness, self.fan_in):
+            ordered = np.sort(values)
+            ranks = np.searchsorted(ordered, values, "left") + np.searchsorted(ordered, values, "right") - 1
+            score += ranks / (2 * (n - 1))
+        return score / 4
+
+    def node(self, i: int) -> Dict:
+        return {
+            "id": self.ids[i],
+            "type": str(self.types[i]),
+            "fan_in": int(self.fan_in[i]),
+            "fan_out": int(self.fan_out[i]),
+            "pagerank": float(self.pagerank[i]),
+            "dependents": int(self.dependents[i]),
+            "betweenness": float(self.betweenness[i]),
+            "hotspot": float(self.hotspot[i])
+        }
+
+    def top(self, metric: str, k: int = 50, node_type: Optional[str] = None, ascending: bool = False) -> List[Dict]:
+        """The k nodes ranked highest (or lowest) by metric, optionally only of one node type."""
+        values = getattr(self, metric).astype(float)
+        candidates = np.arange(len(self.ids)) if node_type is None else np.flatnonzero(self.types == node_type)
+        if not len(candidates):
+            return []
+        keys = values[candidates] if ascending else -values[candidates]
+        k = min(k, len(candidates))
+        best = candidates[np.argpartition(keys, k - 1)[:k]]
+        best = best[np.argsort(values[best] if ascending else -values[best], kind="stable")]
+        return [self.node(i) for i in best]
+
+def get_centrality(dg: DependencyGraph) -> Centrality:
+    """The graph's centrality metrics, computed on first use and kept with the graph."""
+    metrics = dg.indexes.get(("centrality",))
+    if metrics is None:
+        metrics = dg.indexes[("centrality",)] = Centrality(dg)
+    return metrics
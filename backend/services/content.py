@@ -0,0 +1,60 @@
+from pathlib import Path
+from typing import Tuple
+import numpy as np
+from services.cache import LRUCache
+from services.metrics import record_cache
+
+# Line indexes kept in memory: (project_id, relative path) -> LineIndex
+LINE_INDEX_CACHE_SIZE = 256
+# Largest slice one window request may return
+MAX_WINDOW_LINES = 5000
+# Bytes read at a time while indexing line starts
+LINE_SCAN_CHUNK_BYTES = 1024 * 1024
+
+_line_indexes = LRUCache(LINE_INDEX_CACHE_SIZE)
+
+class LineIndex:
+    """
+    Byte offset of every line start in a file, built with one pass over the file
+    in fixed-size chunks, so only the offsets stay in memory. Reading a window
+    afterwards seeks straight to it, so cost is O(slice).
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        starts = [np.zeros(1, dtype=np.int64)]
+        size = 0
+        with open(path, "rb") as f:
+            while chunk := f.read(LINE_SCAN_CHUNK_BYTES):
+                starts.append(np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == 10) + (size + 1))
+                size += len(chunk)
+        self.size = size
+        # offsets[i] is where line i+1 starts; offsets[line_count] is at or past the end of the file
+        self.offsets = np.concatenate(starts + [np.array([size + 1], dtype=np.int64)])
+        # A trailing newline does not start another line
+        self.line_count = len(self.offsets) - 1 - (1 if size and self.offsets[-2] == size else 0)
+
+    def clamp(self, start_line: int, end_line: int) -> Tuple[int, int]:
+        start_line = max(1, start_line)
+        end_line = min(max(start_line, end_line), self.line_count)
+        return start_line, end_line
+
+    def read(self, start_line: int, end_line: int) -> str:
+        """Returns lines start_line..end_line (1-based, inclusive)."""
+        start_line, end_line = self.clamp(start_line, end_line)
+        if start_line > self.line_count:
+            return ""
+        start = int(self.offsets[start_line - 1])
+        end = min(int(self.offsets[end_line]), self.size)
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            return f.read(end - start).decode("utf-8", errors="replace")
+
+def get_line_index(project_id: str, relative_path: str, path: Path) -> LineIndex:
+    """Cached LineIndex for a file in a project's clone (clones never change)."""
+    key = (project_id, relative_path)
+    index = _line_indexes.get(key)
+    record_cache("line_index", index is not None)
+    if index is None:
+        index = LineIndex(path)
+        _line_indexes.put(key, index)
+    return index
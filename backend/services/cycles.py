@@ -0,0 +1,102 @@
+from collections import deque
+from typing import Dict, List
+from services.graph import EDGE_TYPES, Adjacency, DependencyGraph
+from services.reachability import strongly_connected_components
+
+# Report kind -> (edge types followed, node type reported). Ambiguous calls are
+# left out: linking every same-named function would report spurious cycles.
+CYCLE_KINDS = {
+    "imports": (("imports",), "file"),
+    "calls": (("calls",), "function")
+}
+
+def _mask(edge_types) -> int:
+    mask = 0
+    for edge_type in edge_types:
+        mask |= 1 << EDGE_TYPES.index(edge_type)
+    return mask
+
+def _example_cycle(adj: Adjacency, members: List[int], component, component_id: int, type_mask: int) -> List[str]:
+    """A shortest cycle through the component's first member, staying inside the component."""
+    start = members[0]
+    parent = {start: None}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for neighbor, _ in adj.neighbors(node, type_mask=type_mask):
+            if component[neighbor] != component_id:
+                continue
+            if neighbor == start:
+                cycle = [node]
+                while parent[cycle[-1]] is not None:
+                    cycle.append(parent[cycle[-1]])
+                return [adj.ids[n] for n in reversed(cycle)] + [adj.ids[start]]
+            if neighbor not in parent:
+                parent[neighbor] = node
+                queue.append(neighbor)
+    return []
+
+def cycle_report(dg: DependencyGraph, kind: str) -> Dict:
+    """
+    Strongly connected components of one kind of edge (iterative Tarjan) and
+    the condensed DAG, with a longest-path layer per component for layered
+    drawing: layer 0 has no dependents, and every edge points to a higher layer.
+    Linear in the graph's size, so it is recomputed with every graph build.
+    """
+    edge_types, node_type = CYCLE_KINDS[kind]
+    adj = dg.adjacency()
+    type_mask = _mask(edge_types)
+    component, count = strongly_connected_components(adj, type_mask)
+    members: List[List[int]] = [[] for _ in range(count)]
+    for node in range(len(adj.ids)):
+        if dg.graph.nodes[adj.ids[node]].get("type") == node_type:
+            members[component[node]].append(node)
+
+    successors: List[set] = [set() for _ in range(count)]
+    self_loops = set()
+    for node in range(len(adj.ids)):
+        for neighbor, _ in adj.neighbors(node, type_mask=type_mask):
+            if component[neighbor] != component[node]:
+                successors[component[node]].add(component[neighbor])
+            elif neighbor == node:
+                self_loops.add(component[node])
+
+    # Ids are reverse topological (edges go high -> low), so walking down from
+    # the highest id sees every component after all of its predecessors
+    layer = [0] * count
+    for c in range(count - 1, -1, -1):
+        for successor in successors[c]:
+            if layer[successor] < layer[c] + 1:
+                layer[successor] = layer[c] + 1
+
+    # Condensed DAG over the reported node type, renumbered densely
+    kept = [c for c in range(count) if members[c]]
+    dense = {c: i for i, c in enumerate(kept)}
+    cycles = []
+    for c in kept:
+        if len(members[c]) > 1 or c in self_loops:
+            cycles.append({
+                "component": dense[c],
+                "size": len(members[c]),
+                "nodes": sorted(adj.ids[node] for node in members[c]),
+                "example": _example_cycle(adj, members[c], component, c, type_mask)
+            })
+    cycles.sort(key=lambda cycle: cycle["size"], reverse=True)
+
+    return {
+        "kind": kind,
+        "nodes": sum(len(m) for m in members),
+        "cycles": cycles,
+        "dag": {
+            "components": [{"id": dense[c], "size": len(members[c]), "layer": layer[c],
+                            "nodes": [adj.ids[node] for node in members[c]]} for c in kept],
+            "edges": [[dense[c], dense[successor]] for c in kept for successor in sorted(successors[c])
+                      if successor in dense],
+            "layers": max((layer[c] for c in kept), default=-1) + 1
+        }
+    }
+
+def build_cycle_reports(dg: DependencyGraph):
+    """Fills dg.cycles with every kind's report."""
+    for kind in CYCLE_KINDS:
+        dg.cycles[kind] = cycle_report(dg, kind)
@@ -1,8 +1,22 @@
 import json
+import os
+import time
+from itertools import chain
 import networkx as nx
+from array import array
 from pathlib import Path
-from typing import Dict, List, Optional, Union, Tuple
-from services.analysis import get_metadata_path, get_project_path
+from typing import Dict, Iterator, List, Optional, Union, Tuple
+from services.analysis import get_current_generation, get_parse_generation, get_project_path, iter_record_files
+from services.metrics import track
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+GRAPHS_BASE_PATH = BASE_DIR / "graphs"
+
+# Bumped when the persisted layout changes, so older files are rebuilt
+GRAPH_FORMAT = 3
+
+# Edge types, in the order of their codes in Adjacency
+EDGE_TYPES = ("contains", "imports", "calls", "calls_ambiguous")
 
 # --- Node Definitions ---
 
@@ -35,17 +49,77 @@ class FunctionNode(Node):
 
 # --- Graph Engine ---
 
+class Adjacency:
+    """
+    Compact CSR view of a graph for traversals: nodes are ints, and each
+    node's out- (and in-) neighbours are a slice of one flat array, with a
+    parallel array of edge type codes (indexes into EDGE_TYPES).
+    """
+
+    def __init__(self, graph: nx.DiGraph):
+        self.ids: List[str] = list(graph.nodes)
+        self.index: Dict[str, int] = {node_id: i for i, node_id in enumerate(self.ids)}
+        type_codes = {edge_type: code for code, edge_type in enumerate(EDGE_TYPES)}
+        edges = [(self.index[u], self.index[v], type_codes.get(t, len(EDGE_TYPES)))
+                 for u, v, t in graph.edges(data="type")]
+        self.out_offsets, self.out_targets, self.out_types = self._csr(edges, 0, 1)
+        self.in_offsets, self.in_targets, self.in_types = self._csr(edges, 1, 0)
+
+    def _csr(self, edges: List[Tuple[int, int, int]], key: int, other: int) -> Tuple[array, array, array]:
+        counts = [0] * (len(self.ids) + 1)
+        for edge in edges:
+            counts[edge[key] + 1] += 1
+        for i in range(len(self.ids)):
+            counts[i + 1] += counts[i]
+        offsets = array("i", counts)
+        targets = array("i", bytes(4 * len(edges)))
+        types = array("b", bytes(len(edges)))
+        cursor = list(counts[:-1])
+        for edge in edges:
+            slot = cursor[edge[key]]
+            targets[slot] = edge[other]
+            types[slot] = edge[2]
+            cursor[edge[key]] += 1
+        return offsets, targets, types
+
+    def neighbors(self, node: int, reverse: bool = False, type_mask: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        """(neighbour, edge type code) pairs; type_mask is a bitmask over EDGE_TYPES codes."""
+        if reverse:
+            offsets, targets, types = self.in_offsets, self.in_targets, self.in_types
+        else:
+            offsets, targets, types = self.out_offsets, self.out_targets, self.out_types
+        for slot in range(offsets[node], offsets[node + 1]):
+            if type_mask is None or type_mask >> types[slot] & 1:
+                yield targets[slot], types[slot]
+
 class DependencyGraph:
-    def __init__(self):
+    def __init__(self, version: str = "empty"):
         self.graph = nx.DiGraph()
+        # Identifies the metadata generation this graph was built from
+        self.version = version
+        # Where build time went: per-phase seconds and per-file resolution cost
+        self.build_stats = {"phases": {}, "files": []}
+        self._adjacency: Optional[Adjacency] = None
+        # Structures derived from the graph (reachability, ...), keyed by
+        # kind and parameters; dropped whenever the graph changes
+        self.indexes: Dict[tuple, object] = {}
+        # Find-usages index: call sites [file, caller_id, lineno, args_count, resolution]
+        # by resolved callee node id, and by last name segment for calls that
+        # resolved to nothing (library or dynamic calls)
+        self.call_sites: Dict[str, List[List]] = {}
+        self.unresolved_calls: Dict[str, List[List]] = {}
+        # Cycle/SCC reports by kind (see services.cycles), persisted with the graph
+        self.cycles: Dict[str, Dict] = {}
 
     def add_file(self, path: str):
         node = FileNode(path)
         self.graph.add_node(node.id, **node.to_dict())
+        self._changed()
 
     def add_function(self, qualified_name: str, file_path: str, lineno: int):
         node = FunctionNode(qualified_name, file_path, lineno)
         self.graph.add_node(node.id, **node.to_dict())
+        self._changed()
 
     def add_dependency(self, source_id: str, target_id: str, type: str):
         """
@@ -53,6 +127,17 @@ class DependencyGraph:
         Types: 'imports', 'calls', 'contains'
         """
         self.graph.add_edge(source_id, target_id, type=type)
+        self._changed()
+
+    def _changed(self):
+        self._adjacency = None
+        self.indexes = {}
+
+    def adjacency(self) -> Adjacency:
+        """The graph's compact adjacency, built on first use."""
+        if self._adjacency is None:
+            self._adjacency = Adjacency(self.graph)
+        return self._adjacency
 
     def get_node(self, node_id: str):
         if self.graph.has_node(node_id):
@@ -67,6 +152,28 @@ class DependencyGraph:
         predecessors = self.graph.predecessors(node_id)
         return [self.graph.nodes[p] for p in predecessors]
 
+    def add_call_site(self, callee_id: Optional[str], callee_name: str, file_path: str, caller_id: str,
+                      lineno: int, args_count: int, resolution: str):
+        if callee_id is None:
+            site = [file_path, caller_id, lineno, args_count, callee_name]
+            self.unresolved_calls.setdefault(callee_name.rsplit(".", 1)[-1], []).append(site)
+        else:
+            self.call_sites.setdefault(callee_id, []).append([file_path, caller_id, lineno, args_count, resolution])
+
+    def get_usages(self, node_id: str) -> List[List]:
+        """Call sites resolved to node_id, in file/line order."""
+        return self.call_sites.get(node_id, [])
+
+    def get_unresolved_usages(self, name: str) -> List[List]:
+        """
+        Unresolved call sites by callee name: "join" matches any call ending in
+        .join, "os.path.join" only calls written that way.
+        """
+        sites = self.unresolved_calls.get(name.rsplit(".", 1)[-1], [])
+        if "." not in name:
+            return sites
+        return [site for site in sites if site[4] == name]
+
     def get_callees(self, node_id: str) -> List[Dict]:
         """Returns list of nodes that this node calls/imports."""
         if not self.graph.has_node(node_id):
@@ -78,24 +185,79 @@ class DependencyGraph:
     def toJson(self):
         return nx.node_link_data(self.graph)
 
+# --- Persistence ---
+
+def get_graph_path(project_id: str) -> Path:
+    return GRAPHS_BASE_PATH / f"{project_id}.json"
+
+def save_graph(project_id: str, dg: DependencyGraph):
+    """Writes the graph to graphs/<project_id>.json (atomically, via a temp file)."""
+    os.makedirs(GRAPHS_BASE_PATH, exist_ok=True)
+    target = get_graph_path(project_id)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "format": GRAPH_FORMAT,
+            "version": dg.version,
+            "graph": nx.node_link_data(dg.graph),
+            "call_sites": dg.call_sites,
+            "unresolved_calls": dg.unresolved_calls,
+            "cycles": dg.cycles
+        }, f)
+    os.replace(tmp, target)
+
+def load_graph(project_id: str) -> Optional[DependencyGraph]:
+    """The persisted graph, or None if missing or built from an older parse."""
+    try:
+        with open(get_graph_path(project_id), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("format") != GRAPH_FORMAT or data.get("version") != get_parse_generation(project_id):
+        return None
+    dg = DependencyGraph(version=data["version"])
+    dg.graph = nx.node_link_graph(data["graph"], directed=True)
+    dg.call_sites = data["call_sites"]
+    dg.unresolved_calls = data["unresolved_calls"]
+    dg.cycles = data["cycles"]
+    return dg
+
 # --- Builder Logic ---
 
 def build_graph(project_id: str) -> DependencyGraph:
     """
-    Constructs the dependency graph from computed metadata.
+    Constructs the dependency graph from computed metadata and persists it.
     """
-    metadata_path = get_metadata_path(project_id)
-    dg = DependencyGraph()
+    # Derived structures are built here, in the worker, so the first query
+    # doesn't wait on them
+    from services.centrality import get_centrality
+    from services.cycles import build_cycle_reports
+    from services.reachability import get_reachability
+    with track("graph_build", project_id):
+        dg = _build_graph(project_id)
+        build_cycle_reports(dg)
+    save_graph(project_id, dg)
+    get_reachability(dg)
+    get_centrality(dg)
+    return dg
+
+def _build_graph(project_id: str) -> DependencyGraph:
+    # Read the generation and its directory together, so a re-parse publishing
+    # mid-build can't mix two snapshots. Fresh from disk: in a pool worker the
+    # memo is whatever this process saw last, possibly a collected snapshot.
+    generation, metadata_path = get_current_generation(project_id, fresh=True)
+    dg = DependencyGraph(version=generation or "empty")
 
-    if not metadata_path.exists():
+    if generation is None:
         return dg
 
     # 1. First Pass: Create all Nodes (Files & Functions)
     # We need to know all available functions to resolve calls later.
     discovered_functions = set() # Store qualified names
+    phase_started = time.perf_counter()
     
     # We'll traverse the metadata directory structure
-    for meta_file in metadata_path.rglob("*.py.json"):
+    for meta_file in iter_record_files(metadata_path):
         with open(meta_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
@@ -128,12 +290,16 @@ def build_graph(project_id: str) -> DependencyGraph:
             # This helps resolve local calls
             # (In a real engine, we'd need a symbol table scope, but this is MVP)
 
+    dg.build_stats["phases"]["nodes"] = time.perf_counter() - phase_started
+
     # 2. Second Pass: Create Edges (Imports & Calls)
-    for meta_file in metadata_path.rglob("*.py.json"):
+    phase_started = time.perf_counter()
+    for meta_file in iter_record_files(metadata_path):
         with open(meta_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
         file_path = data.get("relative_path", "").replace("\\", "/")
+        imports_started = time.perf_counter()
         
         # --- Handle Imports ---
         for imp in data.get("imports", []):
@@ -157,18 +323,23 @@ def build_graph(project_id: str) -> DependencyGraph:
                     break
 
         # --- Handle Calls ---
+        calls_started = time.perf_counter()
+        call_count = 0
         for func in data.get("functions", []):
             caller_name = func.get("full_name", func.get("name"))
             caller_id = f"{file_path}::{caller_name}"
             
             for call in func.get("calls", []):
+                call_count += 1
                 callee_name = call.get("name")
+                site = (file_path, caller_id, call.get("lineno", 0), call.get("args_count", 0))
                 
                 # Resolution Strategy:
                 # 1. Check local file (is it defined in this file?)
                 local_callee_id = f"{file_path}::{callee_name}"
                 if local_callee_id in discovered_functions:
                     dg.add_dependency(caller_id, local_callee_id, "calls")
+                    dg.add_call_site(local_callee_id, callee_name, *site, "local")
                     continue
                 
                 # 2. Check imported files
@@ -193,11 +364,26 @@ def build_graph(project_id: str) -> DependencyGraph:
                 if len(potential_matches) == 1:
                     # High confidence match
                     dg.add_dependency(caller_id, potential_matches[0], "calls")
+                    dg.add_call_site(potential_matches[0], callee_name, *site, "global")
                 elif len(potential_matches) > 1:
                     # Ambiguous. Link all? Or link none? 
                     # For "Impact Analysis", false positives (linking all) is safer than false negatives.
                     # Warning: This makes the graph "noisy".
                     for match in potential_matches:
                         dg.add_dependency(caller_id, match, "calls_ambiguous")
+                        dg.add_call_site(match, callee_name, *site, "ambiguous")
+                else:
+                    dg.add_call_site(None, callee_name, *site, "unresolved")
+
+        dg.build_stats["files"].append({
+            "path": file_path,
+            "imports_seconds": calls_started - imports_started,
+            "calls_seconds": time.perf_counter() - calls_started,
+            "calls": call_count
+        })
+
+    for sites in chain(dg.call_sites.values(), dg.unresolved_calls.values()):
+        sites.sort(key=lambda site: (site[0], site[2]))
 
+    dg.build_stats["phases"]["edges"] = time.perf_counter() - phase_started
     return dg
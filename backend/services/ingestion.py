@@ -1,60 +1,139 @@
+import asyncio
+import logging
 import os
 import shutil
+import subprocess
 import uuid
 import git
 import stat
+import hashlib
 from pathlib import Path
+from typing import Dict, Optional, Tuple
+from services import catalog
+from services.cache import LRUCache
+from services.metrics import record_cache, track
+
+logger = logging.getLogger(__name__)
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 BASE_STORAGE_PATH = BASE_DIR / "storage"
 
+# project_id -> {relative posix path: blob sha} read from the clone's git index
+_blob_indexes = LRUCache(16)
+
 def remove_readonly(func, path, excinfo):
     """Helper to remove read-only attribute and retry deletion (Windows fix)."""
     os.chmod(path, stat.S_IWRITE)
     func(path)
 
-def clone_repository(repo_url: str) -> str:
+def _clone_env() -> Dict[str, str]:
+    # Configure env to prevent prompts (GIT_TERMINAL_PROMPT=0)
+    env = os.environ.copy()
+    env['GIT_TERMINAL_PROMPT'] = '0'
+    return env
+
+def _cleanup_failed_clone(target_dir: Path):
+    if target_dir.exists():
+        try:
+            shutil.rmtree(target_dir, onerror=remove_readonly)
+        except Exception as cleanup_error:
+            logger.warning("Failed to clean up %s: %s", target_dir, cleanup_error)
+
+async def _run_git(*args) -> Tuple[int, bytes, bytes]:
+    """
+    Runs git to completion: (return code, stdout, stderr). Awaited as an
+    asyncio subprocess where the event loop supports them; the
+    SelectorEventLoop (uvicorn --reload on Windows) doesn't, so there git is
+    waited on from a thread instead. Either way, cancelling kills git.
+    """
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "git", *args,
+            env=_clone_env(),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        communicate = process.communicate
+    except NotImplementedError:
+        process = subprocess.Popen(
+            ["git", *args],
+            env=_clone_env(),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        communicate = lambda: asyncio.to_thread(process.communicate)
+    try:
+        stdout, stderr = await communicate()
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+        raise
+    return process.returncode, stdout, stderr
+
+async def _git_output(*args) -> Optional[str]:
+    """stdout of a git command, or None if it fails."""
+    returncode, stdout, _ = await _run_git(*args)
+    return stdout.decode("utf-8", "replace").strip() if returncode == 0 else None
+
+async def remote_head_async(repo_url: str) -> Optional[str]:
+    """Commit the remote's HEAD points at (via `git ls-remote`), or None if unreachable."""
+    output = await _git_output("ls-remote", "--", repo_url, "HEAD")
+    return output.split()[0] if output else None
+
+async def clone_repository_async(repo_url: str, project_id: Optional[str] = None) -> str:
     """
-    Clones a git repository into a unique temporary directory.
-    Returns the project_id (folder name).
+    Shallow-clones a git repository into storage/<project_id> (a new id unless
+    one is given) and returns the project id. git runs as a subprocess
+    awaited on the event loop, so a slow remote holds no worker thread.
     """
-    project_id = str(uuid.uuid4())
+    project_id = project_id or str(uuid.uuid4())
     target_dir = BASE_STORAGE_PATH / project_id
-    
-    # Ensure storage exists
     os.makedirs(BASE_STORAGE_PATH, exist_ok=True)
-    
+
+    logger.info("Cloning %s into %s", repo_url, target_dir)
     try:
-        print(f"DEBUG: Starting clone for {repo_url}", flush=True)
-        # Verify git is available
-        print(f"DEBUG: Git version check", flush=True)
-        
-        # Configure env to prevent prompts (GIT_TERMINAL_PROMPT=0)
-        env = os.environ.copy()
-        env['GIT_TERMINAL_PROMPT'] = '0'
-        
-        print(f"Cloning {repo_url} into {target_dir}...", flush=True)
-        # Enable longpaths for Windows
-        git.Repo.clone_from(
-            repo_url, 
-            target_dir, 
-            depth=1, 
-            env=env, 
-            multi_options=['-c core.longpaths=true'],
-            allow_unsafe_options=True
-        )
-        print("DEBUG: Clone complete", flush=True)
+        with track("clone", project_id):
+            returncode, _, stderr = await _run_git(
+                "clone", "-c", "core.longpaths=true", "--depth", "1", "--", repo_url, str(target_dir))
+            if returncode != 0:
+                raise RuntimeError(stderr.decode("utf-8", "replace").strip() or f"git exited with {returncode}")
+        commit_sha = await _git_output("-C", str(target_dir), "rev-parse", "HEAD")
+        await asyncio.to_thread(catalog.record_clone, project_id, repo_url, commit_sha)
         return project_id
-    except Exception as e:
-        # Cleanup if failed
-        if target_dir.exists():
-            try:
-                shutil.rmtree(target_dir, onerror=remove_readonly)
-            except Exception as cleanup_error:
-                print(f"DEBUG: Failed to cleanup {target_dir}: {cleanup_error}", flush=True)
-                
-        # Re-raise the original error so we know why it failed
+    except BaseException as e:
+        # Also covers cancellation (git is already killed): drop the partial clone
+        _cleanup_failed_clone(target_dir)
+        if not isinstance(e, Exception):
+            raise
         raise Exception(f"Failed to clone repository: {str(e)}")
 
 def get_project_path(project_id: str) -> Path:
     return BASE_STORAGE_PATH / project_id
+
+def _load_blob_index(project_id: str) -> Dict[str, str]:
+    index = _blob_indexes.get(project_id)
+    record_cache("blob_index", index is not None)
+    if index is None:
+        try:
+            repo = git.Repo(get_project_path(project_id))
+            index = {path: entry.hexsha for (path, _stage), entry in repo.index.entries.items()}
+        except Exception:
+            index = {}
+        _blob_indexes.put(project_id, index)
+    return index
+
+def invalidate_blob_index(project_id: str):
+    _blob_indexes.pop(project_id)
+
+def get_blob_sha(project_id: str, relative_path: str) -> str:
+    """
+    Git blob SHA of a file in the clone. Comes from the git index when the file
+    is tracked (no file read); otherwise hashed the way `git hash-object` does.
+    """
+    sha = _load_blob_index(project_id).get(relative_path)
+    if sha is None:
+        data = (get_project_path(project_id) / relative_path).read_bytes()
+        sha = hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+    return sha
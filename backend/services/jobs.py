@@ -0,0 +1,304 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+from services.metrics import Gauge, merge_worker_metrics, take_worker_metrics
+from services.scheduler import Ticket, scheduler
+from services.storage import lease
+
+# Worker processes for CPU-bound work (parsing, graph builds). Spawned rather
+# than forked: the server process has threads and locks a fork would copy.
+CPU_WORKERS = os.cpu_count() or 2
+
+# Finished jobs kept for status queries
+MAX_FINISHED_JOBS = 1000
+
+# Progress events a worker batches up before sending them to the server
+# process, and how long it holds a batch at most
+PROGRESS_BATCH_SECONDS = 0.05
+
+# Events a slow progress subscriber can fall behind by; older ones are dropped
+MAX_PENDING_EVENTS = 256
+
+JOBS = Gauge("codeintel_jobs", "Jobs by kind and status.", labels=("kind", "status"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_manager = None  # multiprocessing Manager serving progress queues, started on first use
+
+def _cpu_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=CPU_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def _measured(fn: Callable, *args):
+    """Pool side of run_cpu: (fn's result, its exception, the metrics it recorded in this worker)."""
+    try:
+        result = fn(*args)
+    except Exception as e:
+        return None, e, take_worker_metrics()
+    return result, None, take_worker_metrics()
+
+async def run_cpu(fn: Callable, *args) -> Any:
+    """
+    Runs fn(*args) in the worker process pool. fn and args must be picklable.
+    Metrics fn records in the worker are merged into this process's registry.
+    """
+    global _pool
+    pool = _cpu_pool()
+    try:
+        result, error, observed = await asyncio.get_running_loop().run_in_executor(pool, _measured, fn, *args)
+    except BrokenProcessPool:
+        # A worker died (OOM kill, segfault): start a fresh pool for the next job
+        if _pool is pool:
+            _pool = None
+        raise
+    merge_worker_metrics(observed)
+    if error is not None:
+        raise error
+    return result
+
+def _send_progress(progress, fn: Callable[..., Iterator], *args):
+    """Pool side of run_cpu_iter: iterates fn(*args), sending items in batches; None marks the end."""
+    batch = []
+    sent = None  # The first item goes out at once, so subscribers see the start
+    try:
+        for item in fn(*args):
+            batch.append(item)
+            now = time.perf_counter()
+            if sent is None or now - sent >= PROGRESS_BATCH_SECONDS:
+                progress.put(batch)
+                batch = []
+                sent = now
+    finally:
+        batch.append(None)
+        progress.put(batch)
+
+def _receive_progress(progress) -> List:
+    """Blocks briefly for the next batch from a worker; [] if none arrived."""
+    try:
+        return progress.get(timeout=0.25)
+    except queue.Empty:
+        return []
+
+async def run_cpu_iter(fn: Callable[..., Iterator], *args, on_item: Callable[[Any], None]) -> Any:
+    """
+    Runs the generator function fn(*args) in the worker process pool, calling
+    on_item(item) on the event loop for every item it yields, and returns the
+    last item. Items travel through a Manager queue in small batches (see
+    PROGRESS_BATCH_SECONDS). fn, args and the items must be picklable, and
+    items must not be None.
+    """
+    global _manager
+    if _manager is None:
+        _manager = multiprocessing.get_context("spawn").Manager()
+    progress = _manager.Queue()
+    worker = asyncio.ensure_future(run_cpu(_send_progress, progress, fn, *args))
+    last = None
+    try:
+        while True:
+            batch = await asyncio.to_thread(_receive_progress, progress)
+            if not batch and worker.done():
+                # The worker died without sending its end marker
+                break
+            for item in batch:
+                if item is None:
+                    await worker
+                    return last
+                last = item
+                on_item(item)
+        await worker
+        return last
+    finally:
+        worker.cancel()
+
+def shutdown():
+    global _pool, _manager
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
+
+class Job:
+    """One unit of background work (clone, parse, graph build) and its outcome."""
+
+    def __init__(self, kind: str, project_id: str, profile: bool = False):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.project_id = project_id
+        self.profile = profile
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.summary = None
+        self.error = None
+        self.task: Optional[asyncio.Task] = None
+        # Progress events: the first and latest are replayed to late subscribers
+        self.first_event: Optional[Dict] = None
+        self.last_event: Optional[Dict] = None
+        self._subscribers: List[tuple] = []  # (pending events, wake-up event)
+
+    async def wait(self) -> Any:
+        """The job's result; re-raises its exception if it failed."""
+        return await asyncio.shield(self.task)
+
+    def publish(self, event: Dict):
+        """Passes a progress event to the job's subscribers. Call from the event loop."""
+        if self.first_event is None:
+            self.first_event = event
+        self.last_event = event
+        for pending, wake in self._subscribers:
+            pending.append(event)
+            wake.set()
+
+    def _wake_subscribers(self):
+        for _, wake in self._subscribers:
+            wake.set()
+
+    async def progress(self) -> AsyncIterator[Dict]:
+        """
+        The job's progress events, starting with the first and latest ones
+        published so far; ends when the job finishes (check status/error
+        then). A subscriber that falls MAX_PENDING_EVENTS behind skips the
+        oldest events instead of buffering without bound.
+        """
+        pending = deque(maxlen=MAX_PENDING_EVENTS)
+        if self.first_event is not None:
+            pending.append(self.first_event)
+            if self.last_event is not self.first_event:
+                pending.append(self.last_event)
+        wake = asyncio.Event()
+        subscriber = (pending, wake)
+        self._subscribers.append(subscriber)
+        try:
+            while True:
+                while pending:
+                    yield pending.popleft()
+                if self.finished_at is not None:
+                    return
+                wake.clear()
+                await wake.wait()
+        finally:
+            self._subscribers.remove(subscriber)
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "project_id": self.project_id,
+            "profile": self.profile,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.summary,
+            "error": self.error
+        }
+
+_jobs: "OrderedDict[str, Job]" = OrderedDict()
+_active: Dict[tuple, Job] = {}  # (kind, project_id, profile) -> running job
+_current: ContextVar[Optional[Job]] = ContextVar("current_job", default=None)
+
+def current() -> Optional[Job]:
+    """The job whose work() is running in this task, if any (e.g. to publish progress)."""
+    return _current.get()
+
+def _set_status(job: Job, status: str):
+    JOBS.dec(kind=job.kind, status=job.status)
+    job.status = status
+    JOBS.inc(kind=job.kind, status=status)
+
+def _forget_finished():
+    finished = [job_id for job_id, job in _jobs.items() if job.finished_at is not None]
+    for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job_id]
+
+async def _run(job: Job, work: Callable[[], Awaitable[Any]], summarize: Optional[Callable[[Any], Dict]],
+               ticket: Optional[Ticket]):
+    _current.set(job)
+    try:
+        # The lease keeps storage GC away from the project, queued or running;
+        # the job stays "queued" until the scheduler grants a slot.
+        with lease(job.project_id):
+            async with ticket or nullcontext():
+                _set_status(job, "running")
+                job.started_at = time.time()
+                result = await work()
+        job.summary = summarize(result) if summarize else result
+        _set_status(job, "completed")
+        return result
+    except asyncio.CancelledError:
+        _set_status(job, "cancelled")
+        raise
+    except Exception as e:
+        job.error = str(e) or type(e).__name__
+        _set_status(job, "failed")
+        raise
+    finally:
+        job.finished_at = time.time()
+        job._wake_subscribers()
+        key = (job.kind, job.project_id, job.profile)
+        if _active.get(key) is job:
+            del _active[key]
+        _forget_finished()
+
+def submit(kind: str, project_id: str, work: Callable[[], Awaitable[Any]],
+           summarize: Optional[Callable[[Any], Dict]] = None, priority: Optional[str] = None,
+           profile: bool = False) -> Job:
+    """
+    Starts work() as a job on the running event loop. While a job of the same
+    kind runs for the project, that job is returned instead of starting a
+    second one, so concurrent parse requests share a single parse. Profiled
+    and unprofiled jobs are told apart, so asking for a profile never joins a
+    run that isn't producing one.
+    summarize(result) is what job status queries report as the result.
+    With a priority class, the job waits for a scheduler slot; if that class
+    is saturated, scheduler.Saturated is raised and nothing is started.
+    Must be called from the event loop.
+    """
+    running = _active.get((kind, project_id, profile))
+    if running is not None:
+        return running
+
+    ticket = scheduler.admit(priority, project_id) if priority else None
+    job = Job(kind, project_id, profile)
+    JOBS.inc(kind=kind, status=job.status)
+    _jobs[job.id] = job
+    _active[(kind, project_id, profile)] = job
+    job.task = asyncio.get_running_loop().create_task(_run(job, work, summarize, ticket))
+    # Fire-and-forget jobs report failures through their status
+    job.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    return job
+
+def get_job(job_id: str) -> Optional[Job]:
+    return _jobs.get(job_id)
+
+def active_job(kind: str, project_id: str, profile: bool = False) -> Optional[Job]:
+    return _active.get((kind, project_id, profile))
+
+def latest_job(kind: str, project_id: str) -> Optional[Job]:
+    """
+    The project's running job of that kind (the unprofiled one if both run),
+    else its most recent one still remembered.
+    """
+    running = _active.get((kind, project_id, False)) or _active.get((kind, project_id, True))
+    if running is not None:
+        return running
+    return next((job for job in reversed(_jobs.values()) if job.kind == kind and job.project_id == project_id),
+                None)
+
+def list_jobs(project_id: Optional[str] = None) -> List[Dict]:
+    """Jobs (optionally for one project), newest first."""
+    jobs = [job for job in _jobs.values() if project_id is None or job.project_id == project_id]
+    return [job.to_dict() for job in reversed(jobs)]
@@ -0,0 +1,212 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+# Latency buckets (seconds) wide enough for a single query and a full clone
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def take(self) -> Dict[Tuple, Any]:
+        """This process's values, reset to zero (see take_worker_metrics)."""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[Tuple, Any]):
+        """Adds values another process took from its copy of this metric."""
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self) -> Iterator[Tuple[str, Tuple, float]]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, key, value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, value in self.samples():
+            lines.append(f"{name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    # A gauge describes its own process (what runs there now), so it is
+    # neither shipped nor merged
+    def take(self) -> Dict[Tuple, Any]:
+        return {}
+
+    def merge(self, values: Dict[Tuple, Any]):
+        pass
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts..., sum, count]
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def merge(self, values: Dict[Tuple, List]):
+        with self._lock:
+            for key, other in values.items():
+                state = self._values.get(key)
+                if state is None:
+                    self._values[key] = list(other)
+                else:
+                    self._values[key] = [a + b for a, b in zip(state, other)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, (('le', '+Inf'),))} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {state[-1]}")
+        return lines
+
+REGISTRY: List[Metric] = []
+
+# --- Pipeline metrics ---
+
+STAGE_SECONDS = Histogram(
+    "codeintel_stage_duration_seconds",
+    "Latency of pipeline stages (clone, scan, parse, parse_file, metadata_write, graph_build, query).",
+    labels=("stage", "project"),
+)
+STAGE_ERRORS = Counter(
+    "codeintel_stage_errors_total", "Pipeline stage runs that raised.", labels=("stage", "project"),
+)
+FILES = Counter(
+    "codeintel_files_total", "Files processed by a stage, by outcome.", labels=("stage", "project", "status"),
+)
+BYTES = Counter(
+    "codeintel_bytes_total", "Bytes read or written by a stage.", labels=("stage", "project"),
+)
+IN_FLIGHT = Gauge(
+    "codeintel_in_flight", "Pipeline stages currently running.", labels=("stage",),
+)
+CACHE_LOOKUPS = Counter(
+    "codeintel_cache_lookups_total", "Cache lookups by cache and result (hit/miss).", labels=("cache", "result"),
+)
+
+@contextmanager
+def track(stage: str, project_id: str = ""):
+    """Times a stage into STAGE_SECONDS and counts it as in flight while it runs."""
+    IN_FLIGHT.inc(stage=stage)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage, project=project_id)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, project=project_id)
+        IN_FLIGHT.dec(stage=stage)
+
+def record_cache(cache: str, hit: bool):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+# --- Worker processes ---
+# A pool worker has its own copy of every metric. It takes what a task
+# recorded and sends that back with the task's result; the server merges it
+# into the registry /metrics renders.
+
+def take_worker_metrics() -> Dict[str, Dict[Tuple, Any]]:
+    """Counter and histogram values recorded in this process since the last call, by metric name."""
+    return {metric.name: values for metric in REGISTRY if (values := metric.take())}
+
+def merge_worker_metrics(taken: Dict[str, Dict[Tuple, Any]]):
+    by_name = {metric.name: metric for metric in REGISTRY}
+    for name, values in taken.items():
+        metric = by_name.get(name)
+        if metric is not None:
+            metric.merge(values)
+
+def _render_hit_ratios() -> List[str]:
+    totals: Dict[str, List[float]] = {}
+    for _, (cache, result), value in CACHE_LOOKUPS.samples():
+        totals.setdefault(cache, [0, 0])[0 if result == "hit" else 1] += value
+    lines = [
+        "# HELP codeintel_cache_hit_ratio Share of cache lookups served from memory.",
+        "# TYPE codeintel_cache_hit_ratio gauge",
+    ]
+    for cache, (hits, misses) in sorted(totals.items()):
+        lines.append(f'codeintel_cache_hit_ratio{{cache="{cache}"}} {hits / (hits + misses):.4f}')
+    return lines
+
+# Extra render-time collectors (each returns exposition lines)
+COLLECTORS: List[Callable[[], List[str]]] = [_render_hit_ratios]
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for collector in COLLECTORS:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
@@ -1,58 +1,284 @@
 import ast
+import time
 from pathlib import Path
-from typing import Dict, List, Optional, Union, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+# --- Guardrails ---
+# Per-file budgets so one pathological file cannot stall a whole-project parse.
+MAX_FILE_BYTES = 2 * 1024 * 1024     # Larger files are skipped without being read
+MAX_AST_DEPTH = 200                 # Deeper subtrees are not descended into
+MAX_PARSE_SECONDS = 5.0             # Wall-clock budget for the AST walk
+GENERATED_HEADER_LINES = 10         # Leading lines searched for a generator comment
+GENERATED_MARKERS = ("@generated", "do not edit", "auto-generated", "autogenerated", "generated by")
+MINIFIED_AVG_LINE_LENGTH = 300      # Average line length above which a file counts as minified
+MINIFIED_MIN_CHARS = 8192           # ...but only for files big enough for it to matter
+
+class BudgetExceeded(Exception):
+    """Raised inside the AST walk when a file runs past its time budget."""
+
+def detect_generated(content: str) -> Optional[str]:
+    """Returns why `content` looks generated or minified, or None."""
+    # Generators announce themselves in a comment at the top of the file
+    for line in content[:4096].splitlines()[:GENERATED_HEADER_LINES]:
+        line = line.strip().lower()
+        if line.startswith("#"):
+            for marker in GENERATED_MARKERS:
+                if marker in line:
+                    return f"generated ({marker})"
+    if len(content) > MINIFIED_MIN_CHARS and len(content) / (content.count("\n") + 1) > MINIFIED_AVG_LINE_LENGTH:
+        return "minified"
+    return None
+
+def guardrail_record(file_path: str, status: str, reason: str, detail: str = None) -> Dict:
+    """Empty metadata record for a file the guardrails refused to parse."""
+    return {
+        "file_path": file_path,
+        "imports": [],
+        "classes": [],
+        "functions": [],
+        "guardrail": {"status": status, "reason": reason, "detail": detail}
+    }
+
+# --- Parser Records ---
+# CodeParser emits these slotted records instead of one dict per import, call,
+# class and function. `record_to_json` (json.dump's `default=`) turns them back
+# into the same JSON shape the metadata files have always had.
+
+class Record:
+    __slots__ = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+class ImportRecord(Record):
+    __slots__ = ("module", "alias", "lineno", "from_module")
+
+    def __init__(self, module: str, alias: Optional[str], lineno: int, from_module: Optional[str] = None):
+        self.module = module
+        self.alias = alias
+        self.lineno = lineno
+        self.from_module = from_module
+
+    def to_dict(self):
+        data = {"module": self.module, "alias": self.alias, "lineno": self.lineno}
+        # Plain `import x` statements have never carried a from_module key
+        if self.from_module is not None:
+            data["from_module"] = self.from_module
+        return data
+
+class CallRecord(Record):
+    __slots__ = ("name", "lineno", "args_count")
+
+    def __init__(self, name: str, lineno: int, args_count: int):
+        self.name = name
+        self.lineno = lineno
+        self.args_count = args_count
+
+class ClassRecord(Record):
+    __slots__ = ("name", "lineno", "end_lineno", "methods", "bases")
+
+    def __init__(self, name: str, lineno: int, end_lineno: int, bases: List[str]):
+        self.name = name
+        self.lineno = lineno
+        self.end_lineno = end_lineno
+        self.methods = []
+        self.bases = bases
+
+class FunctionRecord(Record):
+    __slots__ = ("name", "full_name", "lineno", "end_lineno", "args", "calls", "is_async", "parent")
+
+    def __init__(self, name: str, full_name: str, lineno: int, end_lineno: int,
+                 args: List[str], is_async: bool, parent: Optional[str]):
+        self.name = name
+        self.full_name = full_name
+        self.lineno = lineno
+        self.end_lineno = end_lineno
+        self.args = args
+        self.calls = []
+        self.is_async = is_async
+        self.parent = parent
+
+def record_to_json(obj: Any) -> Dict[str, Any]:
+    """`default=` hook for json.dump/json.dumps over CodeParser output."""
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+# --- Analyzer Pipeline ---
+
+class Analyzer:
+    """
+    Base class for extra analyses that piggyback on CodeParser's single AST walk.
+
+    Subclasses declare `node_types` and override `handle(node, parser)`; the
+    parser calls it for every matching node within the depth guardrail before
+    descending into it, so the parser's context (current_class,
+    function_stack) reflects the enclosing scope. Whatever `result()` returns
+    is merged into the per-file record.
+    """
+    node_types: Tuple[type, ...] = ()
+
+    def handle(self, node: ast.AST, parser: "CodeParser"):
+        pass
+
+    def result(self) -> Dict[str, Any]:
+        return {}
+
+class DocstringAnalyzer(Analyzer):
+    """Collects module, class and function docstrings."""
+    node_types = (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+
+    def __init__(self):
+        self.module_docstring = None
+        self.docstrings = {}
+
+    def handle(self, node, parser):
+        doc = ast.get_docstring(node)
+        if doc is None:
+            return
+        if isinstance(node, ast.Module):
+            self.module_docstring = doc
+        else:
+            self.docstrings[parser.qualified_name(node.name)] = doc
+
+    def result(self):
+        return {"module_docstring": self.module_docstring, "docstrings": self.docstrings}
+
+class DecoratorAnalyzer(Analyzer):
+    """Collects decorator names for classes and functions."""
+    node_types = (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+
+    def __init__(self):
+        self.decorators = {}
+
+    def handle(self, node, parser):
+        if node.decorator_list:
+            self.decorators[parser.qualified_name(node.name)] = [
+                parser._get_name(d.func if isinstance(d, ast.Call) else d)
+                for d in node.decorator_list
+            ]
+
+    def result(self):
+        return {"decorators": self.decorators}
+
+# Analyzers instantiated for every parse unless the caller passes its own list.
+DEFAULT_ANALYZERS: List[type] = [DocstringAnalyzer, DecoratorAnalyzer]
 
 class CodeParser(ast.NodeVisitor):
-    def __init__(self, file_content: str, file_path: str):
+    def __init__(self, file_content: str, file_path: str, analyzers: Optional[List[Analyzer]] = None,
+                 structure_only: bool = False, max_depth: int = MAX_AST_DEPTH,
+                 max_seconds: float = MAX_PARSE_SECONDS):
         self.file_path = file_path
-        self.lines = file_content.splitlines()
+        self.content = file_content
+        # Degraded mode: record imports/classes/function signatures, skip function bodies
+        self.structure_only = structure_only
         self.imports = []
         self.classes = []
         self.functions = []
         
         # Context tracking
         self.current_class = None
-        self.current_function = None
         self.function_stack = [] # Stack of (name, start_line)
 
+        # Budget tracking
+        self.max_depth = max_depth
+        self.max_seconds = max_seconds
+        self.depth = 0
+        self.node_count = 0
+        self.deadline = None
+        self.degraded = None # (reason, detail) once a budget trips
+
+        # Analyzer dispatch table: node type -> handlers, built once per parser
+        if analyzers is None:
+            analyzers = [cls() for cls in DEFAULT_ANALYZERS]
+        self.analyzers = analyzers
+        self._handlers: Dict[type, List[Callable]] = {}
+        self._visitors: Dict[type, Callable] = {}
+        for analyzer in analyzers:
+            for node_type in analyzer.node_types:
+                self._handlers.setdefault(node_type, []).append(analyzer.handle)
+
     def parse(self):
-        tree = ast.parse("\n".join(self.lines))
-        self.visit(tree)
-        return {
+        start = time.perf_counter()
+        self.deadline = start + self.max_seconds
+        tree = ast.parse(self.content)
+        try:
+            self.visit(tree)
+        except BudgetExceeded:
+            # Keep whatever was collected before the budget ran out
+            self.degraded = ("time_budget", f"walk stopped after {self.max_seconds}s")
+        record = {
             "file_path": self.file_path,
             "imports": self.imports,
             "classes": self.classes,
             "functions": self.functions
         }
+        for analyzer in self.analyzers:
+            record.update(analyzer.result())
+        if self.degraded:
+            reason, detail = self.degraded
+            record["guardrail"] = {"status": "degraded", "reason": reason, "detail": detail}
+        return record
+
+    def visit(self, node):
+        """Runs registered analyzer handlers, then the regular visit_* dispatch."""
+        # Budgets: bound recursion depth, and check the clock every 1024 nodes.
+        # A node past the depth limit is skipped entirely, analyzers included.
+        self.node_count += 1
+        if not self.node_count & 1023 and time.perf_counter() > self.deadline:
+            raise BudgetExceeded()
+        if self.depth >= self.max_depth:
+            if not self.degraded:
+                self.degraded = ("ast_depth", f"subtree at line {getattr(node, 'lineno', '?')} deeper than {self.max_depth}")
+            return None
+
+        node_type = type(node)
+        handlers = self._handlers.get(node_type)
+        if handlers:
+            for handler in handlers:
+                handler(node, self)
+        # Resolve visit_<Type> once per node type instead of a string concat + getattr per node
+        visitor = self._visitors.get(node_type)
+        if visitor is None:
+            visitor = getattr(self, "visit_" + node_type.__name__, self.generic_visit)
+            self._visitors[node_type] = visitor
+
+        self.depth += 1
+        result = visitor(node)
+        self.depth -= 1
+        return result
+
+    def qualified_name(self, name: str) -> str:
+        """Name of `name` qualified by the enclosing class or function."""
+        if self.current_class:
+            return f"{self.current_class.name}.{name}"
+        if self.function_stack:
+            return f"{self.function_stack[-1].name}.{name}"
+        return name
 
     def visit_Import(self, node):
         for alias in node.names:
-            self.imports.append({
-                "module": alias.name,
-                "alias": alias.asname,
-                "lineno": node.lineno
-            })
+            self.imports.append(ImportRecord(alias.name, alias.asname, node.lineno))
         self.generic_visit(node)
 
     def visit_ImportFrom(self, node):
         module = node.module or ""
         for alias in node.names:
-            self.imports.append({
-                "module": f"{module}.{alias.name}" if module else alias.name,
-                "alias": alias.asname,
-                "lineno": node.lineno,
-                "from_module": module
-            })
+            self.imports.append(ImportRecord(
+                f"{module}.{alias.name}" if module else alias.name,
+                alias.asname,
+                node.lineno,
+                module
+            ))
         self.generic_visit(node)
 
     def visit_ClassDef(self, node):
-        class_info = {
-            "name": node.name,
-            "lineno": node.lineno,
-            "end_lineno": node.end_lineno,
-            "methods": [],
-            "bases": [self._get_name(b) for b in node.bases]
-        }
+        class_info = ClassRecord(
+            node.name,
+            node.lineno,
+            node.end_lineno,
+            [self._get_name(b) for b in node.bases]
+        )
         
         self.classes.append(class_info)
         
@@ -77,22 +303,21 @@ class CodeParser(ast.NodeVisitor):
         # Determine strict parent name (Class.Method or Function.LocalFunction)
         parent_name = None
         if self.current_class:
-            parent_name = self.current_class["name"]
+            parent_name = self.current_class.name
         elif self.function_stack:
-            parent_name = self.function_stack[-1]["name"]
-
-        full_name = f"{parent_name}.{func_name}" if parent_name else func_name
-
-        func_info = {
-            "name": func_name,
-            "full_name": full_name,
-            "lineno": node.lineno,
-            "end_lineno": node.end_lineno,
-            "args": [arg.arg for arg in node.args.args],
-            "calls": [],
-            "is_async": is_async,
-            "parent": parent_name
-        }
+            parent_name = self.function_stack[-1].name
+
+        full_name = self.qualified_name(func_name)
+
+        func_info = FunctionRecord(
+            func_name,
+            full_name,
+            node.lineno,
+            node.end_lineno,
+            [arg.arg for arg in node.args.args],
+            is_async,
+            parent_name
+        )
 
         # If we are inside a class, add to class methods, otherwise global functions
         # Note: We also add methods to the global functions list for easy searching, 
@@ -101,7 +326,10 @@ class CodeParser(ast.NodeVisitor):
         
         self.functions.append(func_info)
         if self.current_class:
-            self.current_class["methods"].append(func_info)
+            self.current_class.methods.append(func_info)
+
+        if self.structure_only:
+            return
 
         # Push context
         self.function_stack.append(func_info)
@@ -114,6 +342,8 @@ class CodeParser(ast.NodeVisitor):
     def visit_Call(self, node):
         # We only care about calls inside functions
         if not self.function_stack:
+            # Still descend so analyzers see nodes nested in module-level calls
+            self.generic_visit(node)
             return
 
         current_func = self.function_stack[-1]
@@ -121,41 +351,60 @@ class CodeParser(ast.NodeVisitor):
         # Extract callee name
         callee_name = self._get_name(node.func)
         
-        call_info = {
-            "name": callee_name,
-            "lineno": node.lineno,
-            "args_count": len(node.args)
-        }
-        
-        current_func["calls"].append(call_info)
+        current_func.calls.append(CallRecord(callee_name, node.lineno, len(node.args)))
         
         self.generic_visit(node)
 
     def _get_name(self, node) -> str:
         """Helper to get string representation of a node (Name, Attribute, etc.)"""
+        # Iterative so long attribute chains (a.b.c...) cannot hit the recursion limit
+        suffix = []
+        while True:
+            if isinstance(node, ast.Attribute):
+                suffix.append(f".{node.attr}")
+                node = node.value
+            elif isinstance(node, ast.Subscript):
+                suffix.append("[]")
+                node = node.value
+            else:
+                break
+
         if isinstance(node, ast.Name):
-            return node.id
-        elif isinstance(node, ast.Attribute):
-            return f"{self._get_name(node.value)}.{node.attr}"
+            base = node.id
         elif isinstance(node, ast.Call):
-            return "Call(...)" # Dynamic call
-        elif isinstance(node, ast.Subscript):
-            return f"{self._get_name(node.value)}[]"
+            base = "Call(...)" # Dynamic call
         elif isinstance(node, str):
-            return node
-        return "unknown"
+            base = node
+        else:
+            base = "unknown"
+        return base + "".join(reversed(suffix))
 
-def parse_file(file_path: str, content: str = None) -> Dict:
+def parse_file(file_path: str, content: str = None, max_bytes: int = MAX_FILE_BYTES) -> Dict:
     path_obj = Path(file_path)
     if content is None:
         try:
-             content = path_obj.read_text(encoding='utf-8', errors='replace')
+            size = path_obj.stat().st_size
+            if size > max_bytes:
+                return guardrail_record(file_path, "skipped", "file_size", f"{size} bytes > {max_bytes}")
+            content = path_obj.read_text(encoding='utf-8', errors='replace')
         except Exception as e:
             return {"error": str(e), "file_path": file_path}
+    elif len(content) > max_bytes:
+        return guardrail_record(file_path, "skipped", "file_size", f"{len(content)} chars > {max_bytes}")
 
-    parser = CodeParser(content, file_path)
+    # Generated/minified code: keep the structure, skip function bodies and analyzers
+    generated = detect_generated(content)
+    if generated:
+        parser = CodeParser(content, file_path, analyzers=[], structure_only=True)
+    else:
+        parser = CodeParser(content, file_path)
     try:
-        return parser.parse()
+        result = parser.parse()
+        if generated and "guardrail" not in result:
+            result["guardrail"] = {"status": "degraded", "reason": "generated", "detail": generated}
+        return result
+    except RecursionError:
+        return guardrail_record(file_path, "skipped", "ast_depth", "nesting too deep for ast.parse")
     except Exception as e:
         return {
             "file_path": file_path,
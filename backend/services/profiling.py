@@ -0,0 +1,122 @@
+import cProfile
+import json
+import pstats
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from services.analysis import iter_parse_project
+from services.graph import DependencyGraph, build_graph
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PROFILES_BASE_PATH = BASE_DIR / "profiles"
+
+# Rows kept in each top-N section of a report
+PROFILE_TOP_N = 25
+
+_PROFILE_ID = re.compile(r"^[\w-]+$")
+
+def get_profiles_path(project_id: str) -> Path:
+    return PROFILES_BASE_PATH / project_id
+
+def _top_functions(stats: pstats.Stats, limit: int) -> List[Dict]:
+    rows = []
+    for (filename, lineno, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{filename}:{lineno}({name})",
+            "ncalls": ncalls,
+            "tottime": round(tottime, 6),
+            "cumtime": round(cumtime, 6)
+        })
+    rows.sort(key=lambda row: row["cumtime"], reverse=True)
+    return rows[:limit]
+
+def run_profiled(kind: str, project_id: str, fn: Callable[[], Any],
+                 details: Optional[Callable[[Any], Dict]] = None) -> Tuple[Any, str]:
+    """
+    Runs fn() under cProfile and stores two artifacts in profiles/<project_id>/:
+    <profile_id>.pstats (load with pstats/snakeviz) and <profile_id>.json, a
+    report of the top-N functions plus whatever details(result) adds.
+    Returns (fn's result, profile_id).
+    """
+    profile_id = f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    profile_dir = get_profiles_path(project_id)
+    profile_dir.mkdir(parents=True, exist_ok=True)
+
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        result = fn()
+    finally:
+        profiler.disable()
+        wall_seconds = time.perf_counter() - started
+
+    profiler.dump_stats(str(profile_dir / f"{profile_id}.pstats"))
+    report = {
+        "profile_id": profile_id,
+        "kind": kind,
+        "project_id": project_id,
+        "created_at": time.time(),
+        "wall_seconds": round(wall_seconds, 6),
+        "top_functions": _top_functions(pstats.Stats(profiler), PROFILE_TOP_N)
+    }
+    if details:
+        report.update(details(result))
+    with open(profile_dir / f"{profile_id}.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return result, profile_id
+
+def profile_parse(project_id: str) -> Tuple[Dict, str]:
+    """parse_project under the profiler; the report lists the slowest files to parse."""
+    def parse():
+        files = []
+        summary = {}
+        for event in iter_parse_project(project_id):
+            if event["event"] == "file":
+                files.append({"path": event["path"], "ms": event["ms"], "status": event["status"]})
+            summary = event
+        summary.pop("event", None)
+        return summary, files
+
+    def details(result):
+        _, files = result
+        return {"slowest_files": sorted(files, key=lambda f: f["ms"], reverse=True)[:PROFILE_TOP_N]}
+
+    (summary, _), profile_id = run_profiled("parse", project_id, parse, details)
+    return summary, profile_id
+
+def profile_graph_build(project_id: str) -> Tuple[DependencyGraph, str]:
+    """build_graph under the profiler; the report lists the costliest resolution steps."""
+    def details(dg: DependencyGraph):
+        steps = []
+        for entry in dg.build_stats["files"]:
+            steps.append({"path": entry["path"], "step": "imports", "ms": round(entry["imports_seconds"] * 1000, 3)})
+            steps.append({"path": entry["path"], "step": "calls", "ms": round(entry["calls_seconds"] * 1000, 3),
+                          "calls": entry["calls"]})
+        steps.sort(key=lambda step: step["ms"], reverse=True)
+        return {
+            "phases_ms": {phase: round(seconds * 1000, 3) for phase, seconds in dg.build_stats["phases"].items()},
+            "slowest_resolution_steps": steps[:PROFILE_TOP_N]
+        }
+
+    return run_profiled("graph_build", project_id, lambda: build_graph(project_id), details)
+
+def list_profiles(project_id: str) -> List[Dict]:
+    profile_dir = get_profiles_path(project_id)
+    if not profile_dir.exists():
+        return []
+    profiles = []
+    for report_file in profile_dir.glob("*.json"):
+        with open(report_file, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        profiles.append({key: report[key] for key in ("profile_id", "kind", "created_at", "wall_seconds")})
+    return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+def get_profile_artifact(project_id: str, profile_id: str, suffix: str) -> Optional[Path]:
+    """Path of a stored artifact (".json" report or ".pstats"), or None."""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    artifact = get_profiles_path(project_id) / f"{profile_id}{suffix}"
+    return artifact if artifact.is_file() else None
@@ -0,0 +1,213 @@
+import random
+from array import array
+from itertools import chain
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from services.graph import Adjacency, DependencyGraph
+from services.traversal import QueryError, edge_type_mask
+
+# Up to this many strongly connected components the index is a full
+# transitive closure (one bitset per component, ~C^2/16 bytes); beyond it,
+# interval labels plus a pruned search
+BITSET_MAX_COMPONENTS = 20000
+
+# Independent interval labellings in interval mode (more = fewer searches)
+INTERVAL_LABELS = 3
+
+MAX_REACHABILITY_QUERIES = 1000000
+
+def strongly_connected_components(adj: Adjacency, type_mask: Optional[int] = None) -> Tuple[array, int]:
+    """
+    Tarjan's algorithm, iterative (an explicit stack of neighbour iterators
+    instead of recursion, so deep graphs can't hit the recursion limit).
+    Returns (component id per node, component count). Components are numbered
+    in completion order, which is reverse topological: every edge between
+    components goes from a higher id to a lower one.
+    """
+    n = len(adj.ids)
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack: List[int] = []
+    component = array("i", [-1]) * n
+    counter = 0
+    count = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, adj.neighbors(root, type_mask=type_mask))]
+        while work:
+            node, neighbors = work[-1]
+            for neighbor, _ in neighbors:
+                if index[neighbor] == -1:
+                    index[neighbor] = low[neighbor] = counter
+                    counter += 1
+                    stack.append(neighbor)
+                    on_stack[neighbor] = True
+                    work.append((neighbor, adj.neighbors(neighbor, type_mask=type_mask)))
+                    break
+                if on_stack[neighbor] and index[neighbor] < low[node]:
+                    low[node] = index[neighbor]
+            else:
+                # All neighbours done
+                work.pop()
+                if work and low[node] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[node]
+                if low[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component[member] = count
+                        if member == node:
+                            break
+                    count += 1
+    return component, count
+
+def condensation(adj: Adjacency, component: array, count: int, type_mask: Optional[int] = None) -> List[List[int]]:
+    """Successor components of each component (the condensed DAG), without duplicates."""
+    successors: List[Set[int]] = [set() for _ in range(count)]
+    for node in range(len(adj.ids)):
+        source = component[node]
+        for neighbor, _ in adj.neighbors(node, type_mask=type_mask):
+            target = component[neighbor]
+            if target != source:
+                successors[source].add(target)
+    return [sorted(targets, reverse=True) for targets in successors]
+
+class ReachabilityIndex:
+    """
+    Answers "is there a directed path from node u to node v" without a graph
+    search in the common case. Nodes are collapsed into strongly connected
+    components (all members reach each other); over the resulting DAG:
+    - "bitset": reach[c] is an int with bit d set iff c reaches d, so a query is
+      one shift and mask;
+    - "interval": GRAIL-style labels. Each labelling is a random DFS post-order
+      rank[c] and low[c] = the smallest rank c reaches, so c reaching d implies
+      low[c] <= low[d] and rank[d] <= rank[c]. Any labelling that fails this
+      proves "no"; otherwise a DFS pruned by the same test decides.
+    """
+
+    def __init__(self, adj: Adjacency, type_mask: Optional[int] = None):
+        self.component, self.count = strongly_connected_components(adj, type_mask)
+        self.successors = condensation(adj, self.component, self.count, type_mask)
+        if self.count <= BITSET_MAX_COMPONENTS:
+            self.method = "bitset"
+            # Successors have lower ids, so they are complete when needed
+            self.reach = [0] * self.count
+            for c in range(self.count):
+                bits = 1 << c
+                for successor in self.successors[c]:
+                    bits |= self.reach[successor]
+                self.reach[c] = bits
+        else:
+            self.method = "interval"
+            rng = random.Random(0)
+            self.labels = [self._interval_labels(rng) for _ in range(INTERVAL_LABELS)]
+
+    def _interval_labels(self, rng: random.Random) -> Tuple[array, array]:
+        rank = array("i", [-1]) * self.count
+        order = list(range(self.count))
+        rng.shuffle(order)
+        counter = 0
+        for root in order:
+            if rank[root] != -1:
+                continue
+            # Iterative DFS, children in random order; rank assigned on finish
+            rank[root] = -2
+            work = [(root, iter(rng.sample(self.successors[root], len(self.successors[root]))))]
+            while work:
+                c, children = work[-1]
+                for child in children:
+                    if rank[child] == -1:
+                        rank[child] = -2
+                        work.append((child, iter(rng.sample(self.successors[child], len(self.successors[child])))))
+                        break
+                else:
+                    work.pop()
+                    rank[c] = counter
+                    counter += 1
+        low = array("i", rank)
+        for c in range(self.count):
+            for successor in self.successors[c]:
+                if low[successor] < low[c]:
+                    low[c] = low[successor]
+        return rank, low
+
+    def _may_reach(self, source: int, target: int) -> bool:
+        for rank, low in self.labels:
+            if not (low[source] <= low[target] and rank[target] <= rank[source]):
+                return False
+        return True
+
+    def component_reaches(self, source: int, target: int) -> bool:
+        if source == target:
+            return True
+        # Edges only go to lower ids
+        if target > source:
+            return False
+        if self.method == "bitset":
+            return bool(self.reach[source] >> target & 1)
+        if not self._may_reach(source, target):
+            return False
+        seen = {source}
+        stack = [source]
+        while stack:
+            for successor in self.successors[stack.pop()]:
+                if successor == target:
+                    return True
+                if successor < target or successor in seen or not self._may_reach(successor, target):
+                    continue
+                seen.add(successor)
+                stack.append(successor)
+        return False
+
+    def reaches(self, source: int, target: int) -> bool:
+        """Whether node `source` reaches node `target` (adjacency node ids)."""
+        return self.component_reaches(self.component[source], self.component[target])
+
+def get_reachability(dg: DependencyGraph, edge_types: Optional[Sequence[str]] = None) -> ReachabilityIndex:
+    """The graph's reachability index over edge_types (default all), built on first use."""
+    type_mask = edge_type_mask(edge_types)
+    index = dg.indexes.get(("reachability", type_mask))
+    if index is None:
+        index = dg.indexes[("reachability", type_mask)] = ReachabilityIndex(dg.adjacency(), type_mask)
+    return index
+
+def query_batch(dg: DependencyGraph, pairs: Sequence[Sequence[str]] = (), sources: Sequence[str] = (),
+                targets: Sequence[str] = (), edge_types: Optional[Sequence[str]] = None) -> Dict:
+    """
+    Batch "does A depend on B" (is there a path A -> B):
+    - pairs: one answer per [A, B], null when either node is unknown;
+    - sources x targets: for each source, the targets it reaches.
+    """
+    if len(pairs) + len(sources) * len(targets) > MAX_REACHABILITY_QUERIES:
+        raise QueryError(f"At most {MAX_REACHABILITY_QUERIES} reachability queries per request")
+    index = get_reachability(dg, edge_types)
+    node_index = dg.adjacency().index
+
+    answers = []
+    for pair in pairs:
+        if len(pair) != 2:
+            raise QueryError("Each pair must be [source, target]")
+        source, target = node_index.get(pair[0]), node_index.get(pair[1])
+        answers.append(None if source is None or target is None else index.reaches(source, target))
+
+    known_targets = [(node_id, node_index[node_id]) for node_id in targets if node_id in node_index]
+    reaches = {}
+    for source_id in sources:
+        source = node_index.get(source_id)
+        reaches[source_id] = None if source is None else \
+            [node_id for node_id, target in known_targets if index.reaches(source, target)]
+
+    return {
+        "method": index.method,
+        "components": index.count,
+        "pairs": answers,
+        "reaches": reaches,
+        "unknown_nodes": sorted({node_id for pair in pairs for node_id in pair if node_id not in node_index}
+                                | {node_id for node_id in chain(sources, targets) if node_id not in node_index})
+    }
@@ -0,0 +1,187 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict
+from services.metrics import Counter, Gauge, Histogram
+
+class PriorityClass:
+    def __init__(self, name: str, rank: int, max_running: int, max_queued: int, bulk: bool = True):
+        self.name = name
+        self.rank = rank                # Lower ranks get free slots first
+        self.max_running = max_running
+        self.max_queued = max_queued    # Beyond this, new work is rejected (429)
+        self.bulk = bulk                # Bulk classes share BULK_SLOTS
+
+# Interactive queries are cheap and run on the threadpool, so they only have
+# their own cap. The bulk classes share BULK_SLOTS, kept below the CPU count so
+# parses and builds never take every core from interactive queries.
+# "incremental" covers graph (re)builds from existing metadata.
+CLASSES: Dict[str, PriorityClass] = {c.name: c for c in (
+    PriorityClass("interactive", 0, max_running=32, max_queued=256, bulk=False),
+    PriorityClass("incremental", 1, max_running=4, max_queued=64),
+    PriorityClass("full_parse", 2, max_running=2, max_queued=32),
+    PriorityClass("full_clone", 3, max_running=4, max_queued=32),
+)}
+BULK_SLOTS = max(1, (os.cpu_count() or 2) - 1)
+
+# Retry-After bounds (seconds) for rejected requests
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 300
+
+QUEUED = Gauge("codeintel_scheduler_queued", "Work waiting for a slot, by priority class.", labels=("class",))
+RUNNING = Gauge("codeintel_scheduler_running", "Work holding a slot, by priority class.", labels=("class",))
+REJECTED = Counter("codeintel_scheduler_rejected_total", "Work rejected with 429, by priority class.",
+                   labels=("class",))
+WAIT_SECONDS = Histogram("codeintel_scheduler_wait_seconds", "Time spent queued for a slot, by priority class.",
+                         labels=("class",))
+
+class Saturated(Exception):
+    """The class's queue is full; retry after `retry_after` seconds."""
+
+    def __init__(self, priority: str, retry_after: int):
+        super().__init__(f"Too many queued '{priority}' requests, retry in {retry_after}s")
+        self.priority = priority
+        self.retry_after = retry_after
+
+class Ticket:
+    """
+    A place in a class queue, handed out by Scheduler.admit. Use as
+    `async with ticket:` — entering waits for the slot, leaving frees it.
+    """
+
+    def __init__(self, scheduler: "Scheduler", priority: PriorityClass, project_id: str):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.project_id = project_id
+        self.queued_at = time.perf_counter()
+        self.started_at = None
+        self.granted = asyncio.get_running_loop().create_future()
+
+    async def __aenter__(self):
+        try:
+            await asyncio.shield(self.granted)
+        except asyncio.CancelledError:
+            self.scheduler._abandon(self)
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        self.scheduler._release(self)
+
+    def release(self):
+        """
+        Gives up the ticket whether or not it was ever entered: frees its slot
+        if granted, otherwise leaves the queue. Safe to call more than once.
+        """
+        self.scheduler._abandon(self)
+
+class Scheduler:
+    """
+    Admission control and ordering for work on the event loop. Free slots go
+    to the lowest-ranked class with waiting work; within a class, projects
+    take turns so one project's burst cannot starve the others.
+    Not thread-safe: call from the event loop only.
+    """
+
+    def __init__(self, classes: Dict[str, PriorityClass], bulk_slots: int):
+        self.classes = sorted(classes.values(), key=lambda c: c.rank)
+        self.by_name = classes
+        self.bulk_slots = bulk_slots
+        self.bulk_running = 0
+        self.running = {name: 0 for name in classes}
+        self.queued = {name: 0 for name in classes}
+        # class -> project_id -> tickets; the first project is served next
+        self.queues: Dict[str, "OrderedDict[str, Deque[Ticket]]"] = {name: OrderedDict() for name in classes}
+        # Moving average of slot hold time per class, for Retry-After
+        self.service_seconds = {name: 1.0 for name in classes}
+
+    def admit(self, priority: str, project_id: str) -> Ticket:
+        """Queues new work, or raises Saturated when the class queue is full."""
+        cls = self.by_name[priority]
+        if self.queued[priority] >= cls.max_queued:
+            REJECTED.inc(**{"class": priority})
+            raise Saturated(priority, self.retry_after(priority))
+        ticket = Ticket(self, cls, project_id)
+        self.queues[priority].setdefault(project_id, deque()).append(ticket)
+        self._set_queued(priority, 1)
+        self._dispatch()
+        return ticket
+
+    def retry_after(self, priority: str) -> int:
+        """Rough wait (seconds) until the class queue drains enough to admit more work."""
+        cls = self.by_name[priority]
+        estimate = self.service_seconds[priority] * (self.queued[priority] + 1) / cls.max_running
+        return min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, math.ceil(estimate)))
+
+    def stats(self) -> Dict:
+        return {
+            "bulk_slots": self.bulk_slots,
+            "bulk_running": self.bulk_running,
+            "classes": {
+                c.name: {"running": self.running[c.name], "queued": self.queued[c.name],
+                         "max_running": c.max_running, "max_queued": c.max_queued}
+                for c in self.classes
+            }
+        }
+
+    def _set_queued(self, priority: str, delta: int):
+        self.queued[priority] += delta
+        QUEUED.inc(delta, **{"class": priority})
+
+    def _can_start(self, cls: PriorityClass) -> bool:
+        if self.running[cls.name] >= cls.max_running:
+            return False
+        return not cls.bulk or self.bulk_running < self.bulk_slots
+
+    def _dispatch(self):
+        for cls in self.classes:
+            projects = self.queues[cls.name]
+            while projects and self._can_start(cls):
+                project_id, tickets = next(iter(projects.items()))
+                ticket = tickets.popleft()
+                if tickets:
+                    projects.move_to_end(project_id)
+                else:
+                    del projects[project_id]
+                self._set_queued(cls.name, -1)
+                self._start(ticket)
+
+    def _start(self, ticket: Ticket):
+        name = ticket.priority.name
+        self.running[name] += 1
+        if ticket.priority.bulk:
+            self.bulk_running += 1
+        RUNNING.inc(**{"class": name})
+        ticket.started_at = time.perf_counter()
+        WAIT_SECONDS.observe(ticket.started_at - ticket.queued_at, **{"class": name})
+        ticket.granted.set_result(None)
+
+    def _release(self, ticket: Ticket):
+        if ticket.started_at is None:
+            return
+        name = ticket.priority.name
+        self.running[name] -= 1
+        if ticket.priority.bulk:
+            self.bulk_running -= 1
+        RUNNING.dec(**{"class": name})
+        held = time.perf_counter() - ticket.started_at
+        self.service_seconds[name] = 0.8 * self.service_seconds[name] + 0.2 * held
+        ticket.started_at = None
+        self._dispatch()
+
+    def _abandon(self, ticket: Ticket):
+        """Cancelled or dropped before, as or after its slot was granted."""
+        if ticket.granted.done():
+            self._release(ticket)
+            return
+        tickets = self.queues[ticket.priority.name].get(ticket.project_id)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del self.queues[ticket.priority.name][ticket.project_id]
+            self._set_queued(ticket.priority.name, -1)
+        ticket.granted.cancel()
+
+scheduler = Scheduler(CLASSES, BULK_SLOTS)
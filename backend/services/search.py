@@ -0,0 +1,385 @@
+import asyncio
+import fnmatch
+import json
+import mmap
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+import numpy as np
+from services import jobs
+from services.cache import LRUCache
+from services.ingestion import get_project_path
+from services.metrics import record_cache, track
+from services.scanner import scan_directory
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# Trigram index, written inside the clone (hidden, so the scanner skips it);
+# evicting the clone removes it too
+SEARCH_INDEX_DIR = ".codeintel-search"
+SEARCH_INDEX_CACHE_SIZE = 8
+
+# Larger files are not indexed (always scanned); binaries are skipped like grep does
+MAX_INDEX_FILE_BYTES = 4 * 1024 * 1024
+BINARY_SNIFF_BYTES = 8192
+
+# File statuses in the index
+INDEXED = "indexed"
+UNINDEXED = "unindexed"
+BINARY = "binary"
+
+# Work units sent to the process pool
+SEARCH_CHUNK_FILES = 256
+SEARCH_CHUNK_BYTES = 16 * 1024 * 1024
+
+MAX_SEARCH_MATCHES = 10000
+MAX_MATCHES_PER_FILE = 100
+MAX_CONTEXT_LINES = 10
+MAX_LINE_BYTES = 1000
+
+_indexes = LRUCache(SEARCH_INDEX_CACHE_SIZE)
+
+# ASCII lowercasing table: the index is case-folded so it can prefilter case-insensitive searches too
+_LOWER = np.arange(256, dtype=np.uint32)
+_LOWER[ord("A"):ord("Z") + 1] += 32
+
+def _trigrams(data: bytes) -> np.ndarray:
+    """Sorted unique case-folded byte trigrams of `data`, packed into 24-bit ints."""
+    if len(data) < 3:
+        return np.empty(0, dtype=np.uint32)
+    b = _LOWER[np.frombuffer(data, dtype=np.uint8)]
+    return np.unique((b[:-2] << 16) | (b[1:-1] << 8) | b[2:])
+
+def list_files(project_id: str) -> List[str]:
+    """Relative POSIX paths of the files the scanner shows for the clone."""
+    root = get_project_path(project_id)
+    files = []
+    stack = scan_directory(root)
+    while stack:
+        node = stack.pop()
+        if node["type"] == "folder":
+            stack.extend(node["children"])
+        else:
+            files.append(os.path.relpath(node["path"], root).replace(os.sep, "/"))
+    files.sort()
+    return files
+
+# --- Index ---
+
+def build_index(project_id: str) -> Dict:
+    """
+    Builds the project's trigram index: for every trigram, the sorted ids of
+    the files containing it (CSR layout, memory-mapped on load).
+    """
+    root = get_project_path(project_id)
+    with track("search_index", project_id):
+        files = list_files(project_id)
+        statuses = []
+        grams, owners = [], []
+        for file_id, relative_path in enumerate(files):
+            try:
+                if os.path.getsize(root / relative_path) > MAX_INDEX_FILE_BYTES:
+                    statuses.append(UNINDEXED)
+                    continue
+                data = (root / relative_path).read_bytes()
+            except OSError:
+                statuses.append(UNINDEXED)
+                continue
+            if b"\0" in data[:BINARY_SNIFF_BYTES]:
+                statuses.append(BINARY)
+                continue
+            statuses.append(INDEXED)
+            file_grams = _trigrams(data)
+            grams.append(file_grams)
+            owners.append(np.full(len(file_grams), file_id, dtype=np.uint32))
+
+        all_grams = np.concatenate(grams) if grams else np.empty(0, dtype=np.uint32)
+        # Stable, so file ids stay ascending within each posting list
+        order = np.argsort(all_grams, kind="stable")
+        keys, starts = np.unique(all_grams[order], return_index=True)
+        postings = np.concatenate(owners)[order] if owners else np.empty(0, dtype=np.uint32)
+
+        # Written aside, then swapped in
+        target = root / SEARCH_INDEX_DIR
+        tmp = root / f"{SEARCH_INDEX_DIR}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        np.save(tmp / "keys.npy", keys.astype(np.uint32))
+        np.save(tmp / "offsets.npy", np.append(starts, len(postings)).astype(np.int64))
+        np.save(tmp / "postings.npy", postings)
+        with open(tmp / "files.json", "w", encoding="utf-8") as f:
+            json.dump({"files": files, "status": statuses}, f)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp, target)
+
+    return {
+        "files": len(files),
+        "indexed_files": statuses.count(INDEXED),
+        "trigrams": len(keys),
+        "postings": len(postings)
+    }
+
+class SearchIndex:
+    """A loaded trigram index; the arrays are memory-mapped, not read."""
+
+    def __init__(self, path: Path):
+        with open(path / "files.json", "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.files: List[str] = data["files"]
+        self.status: List[str] = data["status"]
+        self.keys = np.load(path / "keys.npy", mmap_mode="r")
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        self.postings = np.load(path / "postings.npy", mmap_mode="r")
+
+    def close(self):
+        """
+        Drops the memory maps (freed with the last reference), so the index
+        files can be deleted: Windows refuses to delete a mapped file.
+        """
+        self.keys = self.offsets = self.postings = None
+
+    def _posting(self, gram: int) -> np.ndarray:
+        i = int(np.searchsorted(self.keys, gram))
+        if i == len(self.keys) or self.keys[i] != gram:
+            return np.empty(0, dtype=np.uint32)
+        return self.postings[self.offsets[i]:self.offsets[i + 1]]
+
+    def candidates(self, literals: Sequence[bytes]) -> Optional[np.ndarray]:
+        """
+        Ids of indexed files containing every trigram of every literal, or None
+        if the literals are too short to filter on.
+        """
+        grams = np.unique(np.concatenate([_trigrams(literal) for literal in literals] or [np.empty(0, np.uint32)]))
+        if not len(grams):
+            return None
+        # Rarest first, so the running intersection shrinks fastest
+        postings = sorted((self._posting(int(gram)) for gram in grams), key=len)
+        result = np.asarray(postings[0])
+        for posting in postings[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, posting, assume_unique=True)
+        return result
+
+def get_index(project_id: str) -> Optional[SearchIndex]:
+    """The project's trigram index, or None if it has not been built."""
+    index = _indexes.get(project_id)
+    record_cache("search_index", index is not None)
+    if index is None:
+        path = get_project_path(project_id) / SEARCH_INDEX_DIR
+        if not (path / "files.json").is_file():
+            return None
+        index = SearchIndex(path)
+        _indexes.put(project_id, index)
+    return index
+
+def invalidate_index(project_id: str):
+    """Forgets the loaded index and unmaps its files (runs before eviction removes them)."""
+    index = _indexes.pop(project_id)
+    if index is not None:
+        index.close()
+
+# --- Query planning ---
+
+def _required_literals(pattern: bytes, flags: int) -> List[bytes]:
+    """
+    Byte strings every match of the regex must contain: runs of literals in
+    the pattern's mandatory top-level sequence (groups included, anchors
+    ignored). Alternations, classes and repeats end a run.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except (re.error, OverflowError):
+        return []
+    runs = []
+    run = bytearray()
+
+    def walk(items):
+        nonlocal run
+        for op, value in items:
+            if op is sre_parse.LITERAL:
+                run.append(value)
+            elif op is sre_parse.SUBPATTERN:
+                walk(value[-1])
+            elif op is not sre_parse.AT:
+                if run:
+                    runs.append(bytes(run))
+                run = bytearray()
+
+    walk(parsed)
+    if run:
+        runs.append(bytes(run))
+    return runs
+
+def compile_query(query: str, regex: bool, case_sensitive: bool) -> re.Pattern:
+    """
+    The bytes pattern for a query. Files are searched whole, so ^ and $ are
+    made to anchor at line boundaries. Raises ValueError for an invalid regex.
+    """
+    pattern = query.encode("utf-8")
+    flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+    try:
+        return re.compile(pattern if regex else re.escape(pattern), flags)
+    except re.error as e:
+        raise ValueError(f"Invalid regex: {e}")
+
+def _path_matches(path: str, include: Sequence[str], exclude: Sequence[str]) -> bool:
+    if include and not any(fnmatch.fnmatchcase(path, glob) for glob in include):
+        return False
+    return not any(fnmatch.fnmatchcase(path, glob) for glob in exclude)
+
+def plan_search(project_id: str, pattern: re.Pattern, include: Sequence[str] = (),
+                exclude: Sequence[str] = ()) -> Dict:
+    """The files a search has to scan: path globs first, then the trigram prefilter."""
+    index = get_index(project_id)
+    if index is None:
+        files = [path for path in list_files(project_id) if _path_matches(path, include, exclude)]
+        return {"files": files, "indexed": False, "pruned_files": 0}
+
+    selected = [file_id for file_id, path in enumerate(index.files)
+                if index.status[file_id] != BINARY and _path_matches(path, include, exclude)]
+    literals = _required_literals(pattern.pattern, pattern.flags)
+    candidates = index.candidates(literals)
+    if candidates is not None:
+        keep = set(candidates.tolist())
+        # Unindexed files can't be ruled out
+        files = [index.files[i] for i in selected if i in keep or index.status[i] == UNINDEXED]
+    else:
+        files = [index.files[i] for i in selected]
+    return {"files": files, "indexed": True, "pruned_files": len(selected) - len(files)}
+
+# --- Scanning (runs in the worker process pool) ---
+
+def _line_text(mm: mmap.mmap, start: int, end: int) -> str:
+    return mm[start:min(end, start + MAX_LINE_BYTES)].decode("utf-8", errors="replace")
+
+def _search_file(path: str, relative_path: str, regex: re.Pattern, context: int) -> List[Dict]:
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm.find(b"\0", 0, BINARY_SNIFF_BYTES) != -1:
+                return []
+            matches = []
+            line, counted, pos = 1, 0, 0
+            # One match per line, like grep
+            while pos <= size and len(matches) < MAX_MATCHES_PER_FILE:
+                m = regex.search(mm, pos)
+                if m is None:
+                    break
+                start = mm.rfind(b"\n", 0, m.start()) + 1
+                end = mm.find(b"\n", m.start())
+                if end == -1:
+                    end = size
+                line += mm[counted:start].count(b"\n")
+                counted = start
+
+                before = []
+                cursor = start
+                while len(before) < context and cursor > 0:
+                    previous = mm.rfind(b"\n", 0, cursor - 1) + 1
+                    before.append(_line_text(mm, previous, cursor - 1))
+                    cursor = previous
+                after = []
+                cursor = end + 1
+                while len(after) < context and cursor < size:
+                    next_end = mm.find(b"\n", cursor)
+                    if next_end == -1:
+                        next_end = size
+                    after.append(_line_text(mm, cursor, next_end))
+                    cursor = next_end + 1
+
+                matches.append({
+                    "path": relative_path,
+                    "line": line,
+                    "column": m.start() - start + 1,
+                    "match_length": min(m.end(), end) - m.start(),
+                    "text": _line_text(mm, start, end),
+                    "before": before[::-1],
+                    "after": after
+                })
+                pos = end + 1
+            return matches
+
+def search_files(root: str, paths: List[str], pattern: bytes, flags: int, context: int, limit: int) -> List[Dict]:
+    """Matches in `paths` (relative to `root`), at most `limit`. Process-pool entry point."""
+    regex = re.compile(pattern, flags | re.MULTILINE)
+    matches = []
+    for relative_path in paths:
+        try:
+            matches.extend(_search_file(os.path.join(root, relative_path), relative_path, regex, context))
+        except (OSError, ValueError):
+            continue
+        if len(matches) >= limit:
+            break
+    return matches[:limit]
+
+def _chunks(root: Path, files: List[str]) -> List[List[str]]:
+    chunks, chunk, chunk_bytes = [], [], 0
+    for relative_path in files:
+        try:
+            size = os.path.getsize(root / relative_path)
+        except OSError:
+            continue
+        chunk.append(relative_path)
+        chunk_bytes += size
+        if len(chunk) >= SEARCH_CHUNK_FILES or chunk_bytes >= SEARCH_CHUNK_BYTES:
+            chunks.append(chunk)
+            chunk, chunk_bytes = [], 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+async def iter_search(project_id: str, pattern: re.Pattern, include: Sequence[str] = (),
+                      exclude: Sequence[str] = (), context: int = 2,
+                      max_matches: int = 1000) -> AsyncIterator[Dict]:
+    """
+    Streams matches ({"path", "line", "column", "text", "before", "after", ...})
+    as worker chunks finish, so the order is by completion, not by path. Ends
+    with a summary ({"done": true, ...}).
+    """
+    started = time.perf_counter()
+    plan = await asyncio.to_thread(plan_search, project_id, pattern, include, exclude)
+    root = get_project_path(project_id)
+    chunks = await asyncio.to_thread(_chunks, root, plan["files"])
+
+    found = 0
+    truncated = False
+    pending = set()
+    try:
+        while (chunks or pending) and found < max_matches:
+            # A few chunks in flight per worker, so hitting the limit stops the scan early
+            while chunks and len(pending) < jobs.CPU_WORKERS * 2:
+                pending.add(asyncio.ensure_future(jobs.run_cpu(
+                    search_files, str(root), chunks.pop(0), pattern.pattern, pattern.flags, context,
+                    max_matches - found
+                )))
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                for match in task.result():
+                    if found == max_matches:
+                        truncated = True
+                        break
+                    found += 1
+                    yield match
+        truncated = truncated or (found == max_matches and bool(chunks or pending))
+    finally:
+        for task in pending:
+            task.cancel()
+
+    yield {
+        "done": True,
+        "matches": found,
+        "truncated": truncated,
+        "files_searched": len(plan["files"]),
+        "files_pruned": plan["pruned_files"],
+        "indexed": plan["indexed"],
+        "seconds": time.perf_counter() - started
+    }
@@ -0,0 +1,304 @@
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+import git
+from services import catalog
+from services.analysis import (
+    GENERATIONS_DIR, METADATA_BASE_PATH, get_current_generation, get_metadata_path, get_parse_generation,
+    invalidate_project
+)
+from services.graph import GRAPHS_BASE_PATH, get_graph_path
+from services.ingestion import BASE_STORAGE_PATH, get_project_path, invalidate_blob_index, remove_readonly
+from services.metrics import Counter, Gauge
+from services.profiling import PROFILES_BASE_PATH, get_profiles_path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PINS_FILE = BASE_DIR / "pins.json"
+
+# --- Quotas ---
+# Garbage collection evicts least recently used projects until both hold.
+STORAGE_QUOTA_BYTES = int(os.environ.get("CODEINTEL_STORAGE_QUOTA_BYTES", 20 * 1024 ** 3))
+MAX_PROJECTS = int(os.environ.get("CODEINTEL_MAX_PROJECTS", 500))
+GC_INTERVAL_SECONDS = 300
+
+# Last access is persisted as the clone directory's mtime, refreshed at most
+# this often per project so hot projects don't cost a syscall per request.
+ACCESS_RESOLUTION_SECONDS = 60
+
+STORAGE_BYTES = Gauge("codeintel_storage_bytes", "Disk used by projects, by kind.", labels=("kind",))
+EVICTIONS = Counter("codeintel_storage_evictions_total", "Projects evicted, by reason.", labels=("reason",))
+
+class ProjectUnavailable(Exception):
+    """The project is being evicted."""
+
+_lock = threading.Lock()
+_leases: Dict[str, int] = {}        # project_id -> in-flight jobs/streams using it
+_evicting: Set[str] = set()
+_last_touch: Dict[str, float] = {}
+# project_id -> {directory: bytes} for trees that never change once written:
+# the clone's checkout, published metadata generations, legacy flat records
+_tree_sizes: Dict[str, Dict[str, int]] = {}
+_evict_callbacks: List[Callable[[str], None]] = [invalidate_project, invalidate_blob_index, catalog.remove_project]
+_before_evict_callbacks: List[Callable[[str], None]] = []
+
+def on_evict(callback: Callable[[str], None]):
+    """Registers callback(project_id), called after a project's files are removed (drop caches here)."""
+    _evict_callbacks.append(callback)
+
+def before_evict(callback: Callable[[str], None]):
+    """
+    Registers callback(project_id), called just before a project's files are
+    removed: close open files and memory maps here, which Windows won't delete.
+    """
+    _before_evict_callbacks.append(callback)
+
+def acquire_lease(project_id: str):
+    """Marks the project in use until release_lease(); GC never evicts a leased project."""
+    with _lock:
+        if project_id in _evicting:
+            raise ProjectUnavailable(f"Project '{project_id}' is being evicted")
+        _leases[project_id] = _leases.get(project_id, 0) + 1
+
+def release_lease(project_id: str):
+    with _lock:
+        _leases[project_id] -= 1
+        if not _leases[project_id]:
+            del _leases[project_id]
+
+@contextmanager
+def lease(project_id: str):
+    """Marks the project in use for the duration; GC never evicts a leased project."""
+    acquire_lease(project_id)
+    try:
+        yield
+    finally:
+        release_lease(project_id)
+
+def touch(project_id: str):
+    """Records an access to the project (for LRU eviction)."""
+    now = time.time()
+    if now - _last_touch.get(project_id, 0) < ACCESS_RESOLUTION_SECONDS:
+        return
+    _last_touch[project_id] = now
+    try:
+        os.utime(get_project_path(project_id), (now, now))
+    except OSError:
+        pass
+
+# --- Pins ---
+
+def get_pins() -> Set[str]:
+    try:
+        with open(PINS_FILE, "r", encoding="utf-8") as f:
+            return set(json.load(f))
+    except (OSError, ValueError):
+        return set()
+
+def set_pinned(project_id: str, pinned: bool):
+    with _lock:
+        pins = get_pins()
+        if pinned:
+            pins.add(project_id)
+        else:
+            pins.discard(project_id)
+        tmp = PINS_FILE.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(sorted(pins), f)
+        os.replace(tmp, PINS_FILE)
+
+# --- Usage ---
+
+def _tree_size(path: Path) -> int:
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+def _cached_tree_size(path: str, sizes: Dict[str, int], seen: Dict[str, int]) -> int:
+    size = sizes.get(path)
+    if size is None:
+        size = _tree_size(Path(path))
+    seen[path] = size
+    return size
+
+def _clone_size(project_id: str, sizes: Dict[str, int], seen: Dict[str, int]) -> int:
+    """The checkout never changes after the clone; only the search index next to it is re-measured."""
+    from services.search import SEARCH_INDEX_DIR
+    total = 0
+    try:
+        entries = list(os.scandir(get_project_path(project_id)))
+    except OSError:
+        return 0
+    for entry in entries:
+        if entry.name.startswith(SEARCH_INDEX_DIR):
+            total += _tree_size(Path(entry.path))
+        elif entry.is_dir(follow_symlinks=False):
+            total += _cached_tree_size(entry.path, sizes, seen)
+        else:
+            total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+def _metadata_size(project_id: str, sizes: Dict[str, int], seen: Dict[str, int]) -> int:
+    """Published generations never change; only ones being written (newer than current) are re-measured."""
+    metadata_path = get_metadata_path(project_id)
+    try:
+        entries = list(os.scandir(metadata_path))
+    except OSError:
+        return 0
+    generation = get_current_generation(project_id, fresh=True)[0]
+    current = int(generation, 16) if generation else -1
+    total = 0
+    for entry in entries:
+        if entry.name == GENERATIONS_DIR:
+            for snapshot in os.scandir(entry.path):
+                try:
+                    published = int(snapshot.name, 16) <= current
+                except ValueError:
+                    published = False
+                total += _cached_tree_size(snapshot.path, sizes, seen) if published else _tree_size(Path(snapshot.path))
+        elif entry.is_dir(follow_symlinks=False):
+            # Legacy flat records: no longer written, only removed
+            total += _cached_tree_size(entry.path, sizes, seen)
+        else:
+            total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+def _project_ids() -> Set[str]:
+    ids = set()
+    for base in (BASE_STORAGE_PATH, METADATA_BASE_PATH, PROFILES_BASE_PATH):
+        if base.is_dir():
+            ids.update(entry.name for entry in os.scandir(base) if entry.is_dir())
+    if GRAPHS_BASE_PATH.is_dir():
+        ids.update(entry.name[:-len(".json")] for entry in os.scandir(GRAPHS_BASE_PATH)
+                   if entry.name.endswith(".json"))
+    return ids
+
+def _last_access(project_id: str) -> float:
+    latest = 0.0
+    for path in (get_project_path(project_id), get_metadata_path(project_id), get_graph_path(project_id),
+                 get_profiles_path(project_id)):
+        try:
+            latest = max(latest, path.stat().st_mtime)
+        except OSError:
+            pass
+    return max(latest, _last_touch.get(project_id, 0))
+
+def project_usage(project_id: str, pins: Optional[Set[str]] = None) -> Dict:
+    graph_path = get_graph_path(project_id)
+    # Sizes of unchanging trees are reused from the last pass; ones gone since are dropped
+    sizes, seen = _tree_sizes.get(project_id, {}), {}
+    usage = {
+        "project_id": project_id,
+        "clone_bytes": _clone_size(project_id, sizes, seen),
+        "metadata_bytes": _metadata_size(project_id, sizes, seen),
+        "graph_bytes": graph_path.stat().st_size if graph_path.exists() else 0,
+        "profile_bytes": _tree_size(get_profiles_path(project_id)),
+        "last_access": _last_access(project_id),
+        "pinned": project_id in (get_pins() if pins is None else pins),
+        "in_use": project_id in _leases,
+        "orphaned": not get_project_path(project_id).is_dir()
+    }
+    _tree_sizes[project_id] = seen
+    usage["total_bytes"] = usage["clone_bytes"] + usage["metadata_bytes"] + usage["graph_bytes"] + \
+        usage["profile_bytes"]
+    return usage
+
+def get_usage() -> Dict:
+    """Per-project disk usage (most recently used first) plus totals and quotas."""
+    pins = get_pins()
+    projects = sorted((project_usage(p, pins) for p in _project_ids()),
+                      key=lambda u: u["last_access"], reverse=True)
+    totals = {kind: sum(u[f"{kind}_bytes"] for u in projects) for kind in ("clone", "metadata", "graph", "profile")}
+    for kind, value in totals.items():
+        STORAGE_BYTES.set(value, kind=kind)
+    return {
+        "total_bytes": sum(totals.values()),
+        "by_kind": totals,
+        "project_count": len(projects),
+        "quota_bytes": STORAGE_QUOTA_BYTES,
+        "max_projects": MAX_PROJECTS,
+        "projects": projects
+    }
+
+def sync_catalog() -> Dict:
+    """
+    Reconciles the catalog with the clones on disk: catalogs clones made before
+    it existed (URL and commit read from the clone) and drops rows whose clone
+    is gone.
+    """
+    cataloged = set(catalog.project_ids())
+    on_disk = {entry.name for entry in os.scandir(BASE_STORAGE_PATH) if entry.is_dir()} \
+        if BASE_STORAGE_PATH.is_dir() else set()
+
+    for project_id in on_disk - cataloged:
+        project_path = get_project_path(project_id)
+        try:
+            repo = git.Repo(project_path)
+            url = repo.remotes.origin.url if repo.remotes else None
+            commit_sha = repo.head.commit.hexsha
+        except Exception:
+            url, commit_sha = None, None
+        catalog.backfill_project(project_id, url, commit_sha, project_path.stat().st_ctime,
+                                 get_parse_generation(project_id))
+    for project_id in cataloged - on_disk:
+        catalog.remove_project(project_id)
+    return {"added": len(on_disk - cataloged), "removed": len(cataloged - on_disk)}
+
+# --- Eviction ---
+
+def evict(project_id: str, reason: str = "manual") -> bool:
+    """
+    Removes the project's clone, metadata, graph and profiles. Returns False
+    (and removes nothing) if the project is pinned or in use.
+    """
+    with _lock:
+        if project_id in _leases or project_id in _evicting or project_id in get_pins():
+            return False
+        _evicting.add(project_id)
+    try:
+        for callback in _before_evict_callbacks:
+            callback(project_id)
+        for path in (get_project_path(project_id), get_metadata_path(project_id), get_profiles_path(project_id)):
+            if path.exists():
+                shutil.rmtree(path, onerror=remove_readonly)
+        get_graph_path(project_id).unlink(missing_ok=True)
+        _last_touch.pop(project_id, None)
+        _tree_sizes.pop(project_id, None)
+        for callback in _evict_callbacks:
+            callback(project_id)
+        EVICTIONS.inc(reason=reason)
+        return True
+    finally:
+        with _lock:
+            _evicting.discard(project_id)
+
+def collect() -> Dict:
+    """
+    One GC pass: evicts least recently used projects (including orphaned
+    metadata/graphs whose clone is gone) until the byte and project-count
+    quotas hold. Pinned and in-use projects are skipped.
+    """
+    usage = get_usage()
+    total_bytes = usage["total_bytes"]
+    count = usage["project_count"]
+    evicted = []
+
+    # Least recently used first
+    for project in reversed(usage["projects"]):
+        if total_bytes <= STORAGE_QUOTA_BYTES and count <= MAX_PROJECTS:
+            break
+        if evict(project["project_id"], reason="orphaned" if project["orphaned"] else "quota"):
+            evicted.append(project["project_id"])
+            total_bytes -= project["total_bytes"]
+            count -= 1
+
+    return {"evicted": evicted, "total_bytes": total_bytes, "project_count": count}
@@ -0,0 +1,234 @@
+import heapq
+import json
+import os
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from services.cache import LRUCache
+from services.metrics import record_cache
+
+# Written next to the records of each metadata generation
+SYMBOLS_FILE = ".symbols.json"
+
+# Loaded indexes kept in memory, keyed by (project_id, generation)
+SYMBOL_INDEX_CACHE_SIZE = 8
+
+MAX_SEARCH_RESULTS = 200
+
+# Fuzzy matches must share this share of the query's trigrams
+FUZZY_MIN_OVERLAP = 0.5
+
+# Prefix ranges wider than this are served by walking the global fan-in order
+# instead of ranking the whole range (short typeahead prefixes match a lot)
+PREFIX_RANGE_SCAN = 5000
+
+_indexes = LRUCache(SYMBOL_INDEX_CACHE_SIZE)
+
+def _field(record, name: str):
+    # Records are parser objects during a parse, dicts once read back from JSON
+    return record[name] if isinstance(record, dict) else getattr(record, name)
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class SymbolIndexBuilder:
+    """
+    Collects functions, classes and files while a project is parsed. Fan-in is
+    estimated by name (call sites and imports naming the symbol), since call
+    resolution only happens later, in build_graph.
+    """
+
+    def __init__(self):
+        self.symbols: List[List] = []   # [name, kind, path, lineno, node_id], + fan_in on write
+        self.call_names = Counter()     # last dotted segment of each call
+        self.import_names = Counter()   # imported module, and each dotted suffix of it
+
+    def add(self, relative_path: str, result: Dict):
+        path = relative_path.replace("\\", "/")
+        self.symbols.append([path, "file", path, 0, path])
+        for cls in result.get("classes", []):
+            self.symbols.append([_field(cls, "name"), "class", path, _field(cls, "lineno"), None])
+        for func in result.get("functions", []):
+            full_name = _field(func, "full_name") or _field(func, "name")
+            self.symbols.append([full_name, "function", path, _field(func, "lineno"), f"{path}::{full_name}"])
+            for call in _field(func, "calls"):
+                self.call_names[_field(call, "name").rsplit(".", 1)[-1]] += 1
+        for imp in result.get("imports", []):
+            parts = (_field(imp, "module") or "").split(".")
+            for i in range(len(parts)):
+                self.import_names[".".join(parts[i:])] += 1
+
+    def _fan_in(self, name: str, kind: str, path: str) -> int:
+        if kind == "file":
+            module = path[:-len(".py")] if path.endswith(".py") else path
+            if module.endswith("/__init__"):
+                module = module[:-len("/__init__")]
+            return self.import_names.get(module.replace("/", "."), 0)
+        return self.call_names.get(name.rsplit(".", 1)[-1], 0)
+
+    def write(self, generation_path: Path):
+        for symbol in self.symbols:
+            symbol.append(self._fan_in(symbol[0], symbol[1], symbol[2]))
+        with open(generation_path / SYMBOLS_FILE, "w", encoding="utf-8") as f:
+            json.dump(self.symbols, f)
+
+class SymbolIndex:
+    """
+    In-memory search structures over one generation's symbols:
+    - sorted (lowercased key, symbol id) pairs for prefix lookups, keyed by the
+      full name and by its last segment (so "par" finds "CodeParser.parse"),
+      over all symbols and again per kind, so a kind filter narrows the prefix
+      range instead of filtering a walk over every key;
+    - trigram postings over "full name + path" for substring and fuzzy matches.
+    """
+
+    def __init__(self, symbols: List[List]):
+        self.symbols = symbols
+        self.texts = [f"{name} {path}".lower() for name, _, path, _, _, _ in symbols]
+        keys = []
+        for symbol_id, (name, kind, _, _, _, _) in enumerate(symbols):
+            lowered = name.lower()
+            keys.append((lowered, symbol_id))
+            short = lowered.rsplit("/" if kind == "file" else ".", 1)[-1]
+            if short != lowered:
+                keys.append((short, symbol_id))
+        keys.sort()
+        self.keys = [key for key, _ in keys]
+        self.key_ids = array("i", (symbol_id for _, symbol_id in keys))
+        # Key positions, best ranked first
+        self.by_rank = array("i", sorted(range(len(keys)), key=lambda pos: self._rank(self.key_ids[pos])))
+
+        # kind -> (keys, key_ids, by_rank) over that kind's keys only. Each is a
+        # subsequence of the tables above, so no further sorting is needed.
+        kinds: Dict[str, Tuple[List[str], array, array]] = {}
+        local = array("i", [0]) * len(keys)  # Position within its kind's table
+        for pos, (key, symbol_id) in enumerate(zip(self.keys, self.key_ids)):
+            table = kinds.setdefault(symbols[symbol_id][1], ([], array("i"), array("i")))
+            local[pos] = len(table[0])
+            table[0].append(key)
+            table[1].append(symbol_id)
+        for pos in self.by_rank:
+            kinds[symbols[self.key_ids[pos]][1]][2].append(local[pos])
+        self.kind_tables = kinds
+
+        postings: Dict[str, array] = {}
+        for symbol_id, text in enumerate(self.texts):
+            for gram in _trigrams(text):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("i")
+                posting.append(symbol_id)
+        self.postings = postings
+
+    def _fan_in(self, symbol_id: int) -> int:
+        return self.symbols[symbol_id][5]
+
+    def _rank(self, symbol_id: int) -> Tuple[int, int]:
+        # Most called first, then shortest name
+        return -self.symbols[symbol_id][5], len(self.symbols[symbol_id][0])
+
+    def _exact_ids(self, query: str) -> Iterator[int]:
+        for i in range(bisect_left(self.keys, query), len(self.keys)):
+            if self.keys[i] != query:
+                break
+            yield self.key_ids[i]
+
+    def _prefix_ids(self, query: str, kind: Optional[str] = None) -> Tuple[Iterator[int], bool]:
+        """Symbols (of `kind`) with a key starting with `query`, and whether they come already ranked."""
+        if kind is None:
+            keys, key_ids, by_rank = self.keys, self.key_ids, self.by_rank
+        elif kind in self.kind_tables:
+            keys, key_ids, by_rank = self.kind_tables[kind]
+        else:
+            return iter(()), False
+        lo = bisect_left(keys, query)
+        hi = bisect_left(keys, query + "\U0010ffff", lo)
+        if hi - lo <= PREFIX_RANGE_SCAN:
+            return iter(key_ids[lo:hi]), False
+        # At least PREFIX_RANGE_SCAN of the walked keys are in range, so a page
+        # is found after about len(keys) / PREFIX_RANGE_SCAN steps per result
+        return (key_ids[pos] for pos in by_rank if lo <= pos < hi), True
+
+    def _substring_ids(self, query: str) -> Iterator[int]:
+        grams = _trigrams(query)
+        if not grams:
+            return iter(())
+        # Verify against the rarest trigram's posting list only
+        rarest = min((self.postings.get(gram, ()) for gram in grams), key=len)
+        return (symbol_id for symbol_id in rarest if query in self.texts[symbol_id])
+
+    def _fuzzy_ids(self, query: str) -> List[Tuple[int, int]]:
+        grams = _trigrams(query)
+        overlap = Counter()
+        for gram in grams:
+            overlap.update(self.postings.get(gram, ()))
+        needed = max(1, int(len(grams) * FUZZY_MIN_OVERLAP))
+        return [(symbol_id, shared) for symbol_id, shared in overlap.items() if shared >= needed]
+
+    def search(self, query: str, kind: Optional[str] = None, offset: int = 0,
+               limit: int = 20) -> Tuple[List[Dict], bool]:
+        """
+        Ranked matches for `query`: exact names, then prefix matches, then
+        substrings, then fuzzy (trigram overlap) matches; by fan-in within each
+        tier. Returns (page of results, whether more results exist).
+        """
+        query = query.strip().lower()
+        wanted = offset + limit + 1
+        seen = set()
+        ranked: List[Tuple[int, str]] = []
+
+        def accept(candidates):
+            return (i for i in candidates if i not in seen and (kind is None or self.symbols[i][1] == kind))
+
+        def add(symbol_id: int, tier: str):
+            seen.add(symbol_id)
+            ranked.append((symbol_id, tier))
+
+        def take(candidates, tier: str, score=None):
+            # A symbol can match through both its full and its short key
+            fresh = dict.fromkeys(accept(candidates))
+            for symbol_id in heapq.nsmallest(wanted - len(ranked), fresh, key=score or self._rank):
+                add(symbol_id, tier)
+
+        def take_ranked(candidates, tier: str):
+            for symbol_id in accept(candidates):
+                if len(ranked) >= wanted:
+                    break
+                if symbol_id not in seen:
+                    add(symbol_id, tier)
+
+        if query:
+            take(self._exact_ids(query), "exact")
+            if len(ranked) < wanted:
+                candidates, already_ranked = self._prefix_ids(query, kind)
+                (take_ranked if already_ranked else take)(candidates, "prefix")
+            if len(ranked) < wanted and len(query) >= 3:
+                take(self._substring_ids(query), "substring")
+            if len(ranked) < wanted and len(query) >= 3:
+                fuzzy = dict(self._fuzzy_ids(query))
+                take(fuzzy, "fuzzy", score=lambda i: (-fuzzy[i], *self._rank(i)))
+
+        results = []
+        for symbol_id, tier in ranked[offset:offset + limit]:
+            name, symbol_kind, path, lineno, node_id, fan_in = self.symbols[symbol_id]
+            results.append({
+                "name": name, "kind": symbol_kind, "path": path, "lineno": lineno,
+                "node_id": node_id, "fan_in": fan_in, "match": tier
+            })
+        return results, len(ranked) > offset + limit
+
+def get_symbol_index(project_id: str, generation: str, generation_path: Path) -> Optional[SymbolIndex]:
+    """The generation's symbol index (built on first use), or None if it has none."""
+    key = (project_id, generation)
+    index = _indexes.get(key)
+    record_cache("symbols", index is not None)
+    if index is None:
+        symbols_file = generation_path / SYMBOLS_FILE
+        if not os.path.isfile(symbols_file):
+            return None
+        with open(symbols_file, "r", encoding="utf-8") as f:
+            index = SymbolIndex(json.load(f))
+        _indexes.put(key, index)
+    return index
@@ -0,0 +1,217 @@
+import io
+import keyword
+import re
+import tokenize
+from typing import Dict, List, Optional
+from services.cache import LRUCache
+from services.metrics import record_cache
+
+# Token spans per blob SHA: each distinct file version is tokenized once,
+# whichever project or user asks for it.
+TOKEN_CACHE_SIZE = 512
+
+# A span is [start_col, end_col, type]; a file is a list of spans per line.
+Spans = List[List]
+
+_token_cache = LRUCache(TOKEN_CACHE_SIZE)
+
+def _line_count(text: str) -> int:
+    """Lines in `text` as LineIndex counts them: a trailing newline does not start another line."""
+    return text.count("\n") + (0 if text.endswith("\n") else 1)
+
+# --- Python (stdlib tokenize) ---
+
+_PY_BUILTINS = {"self", "cls", "True", "False", "None"}
+
+def _python_token_type(tok: tokenize.TokenInfo, prev: Optional[tokenize.TokenInfo]) -> Optional[str]:
+    if tok.type == tokenize.NAME:
+        if keyword.iskeyword(tok.string):
+            return "keyword"
+        if tok.string in _PY_BUILTINS:
+            return "builtin"
+        if prev is not None and prev.string in ("def", "class"):
+            return "definition"
+        return None
+    if tok.type == tokenize.STRING:
+        return "string"
+    if tok.type == tokenize.NUMBER:
+        return "number"
+    if tok.type == tokenize.COMMENT:
+        return "comment"
+    if tok.type == tokenize.OP:
+        return "decorator" if tok.string == "@" else "operator"
+    return None
+
+def tokenize_python(text: str) -> List[Spans]:
+    lines: List[Spans] = [[] for _ in range(_line_count(text))]
+    prev = None
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(text).readline):
+            token_type = _python_token_type(tok, prev)
+            if tok.type not in (tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT):
+                prev = tok
+            if token_type is None:
+                continue
+            (start_row, start_col), (end_row, end_col) = tok.start, tok.end
+            if start_row == end_row:
+                lines[start_row - 1].append([start_col, end_col, token_type])
+                continue
+            # Multi-line strings: one span per physical line
+            source_lines = tok.string.split("\n")
+            for offset, part in enumerate(source_lines):
+                row = start_row + offset
+                first = start_col if offset == 0 else 0
+                last = first + len(part) if offset < len(source_lines) - 1 else end_col
+                lines[row - 1].append([first, last, token_type])
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        # Unterminated constructs: keep the spans produced so far
+        pass
+    return lines
+
+# --- Other languages (small regex lexer) ---
+
+_C_KEYWORDS = {
+    "auto", "break", "case", "char", "const", "continue", "default", "do", "double", "else", "enum",
+    "extern", "float", "for", "goto", "if", "inline", "int", "long", "register", "return", "short",
+    "signed", "sizeof", "static", "struct", "switch", "typedef", "union", "unsigned", "void",
+    "volatile", "while",
+}
+_JS_KEYWORDS = {
+    "async", "await", "break", "case", "catch", "class", "const", "continue", "debugger", "default",
+    "delete", "do", "else", "export", "extends", "false", "finally", "for", "from", "function", "if",
+    "import", "in", "instanceof", "let", "new", "null", "of", "return", "static", "super", "switch",
+    "this", "throw", "true", "try", "typeof", "undefined", "var", "void", "while", "with", "yield",
+}
+_LANGUAGE_KEYWORDS: Dict[str, set] = {
+    "javascript": _JS_KEYWORDS,
+    "typescript": _JS_KEYWORDS | {
+        "abstract", "any", "as", "boolean", "declare", "enum", "implements", "interface", "keyof",
+        "namespace", "never", "number", "private", "protected", "public", "readonly", "string", "type",
+        "unknown",
+    },
+    "java": {
+        "abstract", "boolean", "break", "byte", "case", "catch", "char", "class", "continue", "default",
+        "do", "double", "else", "enum", "extends", "final", "finally", "float", "for", "if",
+        "implements", "import", "instanceof", "int", "interface", "long", "new", "null", "package",
+        "private", "protected", "public", "return", "short", "static", "super", "switch",
+        "synchronized", "this", "throw", "throws", "try", "void", "volatile", "while", "true", "false",
+    },
+    "c": _C_KEYWORDS,
+    "cpp": _C_KEYWORDS | {
+        "bool", "catch", "class", "constexpr", "delete", "false", "friend", "namespace", "new",
+        "nullptr", "operator", "private", "protected", "public", "template", "this", "throw", "true",
+        "try", "typename", "using", "virtual",
+    },
+    "json": {"true", "false", "null"},
+    "css": set(),
+}
+
+# Per-language token patterns, tried in order. "block_open" starts a comment
+# that may continue on later lines until the language's block terminator.
+_STRING = r"\"(?:[^\"\\\n]|\\.)*\"?|'(?:[^'\\\n]|\\.)*'?"
+_NUMBER = r"\b(?:0[xX][0-9a-fA-F]+|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)\b"
+_C_STYLE = [
+    ("comment", r"//.*"),
+    ("block_open", r"/\*"),
+    ("string", _STRING + r"|`(?:[^`\\]|\\.)*`?"),
+    ("number", _NUMBER),
+    ("word", r"[A-Za-z_$][\w$]*"),
+    ("operator", r"[-+*/%=<>!&|^~?:]+"),
+]
+_LEXERS = {
+    "javascript": (_C_STYLE, "*/"),
+    "typescript": (_C_STYLE, "*/"),
+    "java": (_C_STYLE, "*/"),
+    "c": (_C_STYLE + [("preprocessor", r"^\s*#\s*\w+")], "*/"),
+    "cpp": (_C_STYLE + [("preprocessor", r"^\s*#\s*\w+")], "*/"),
+    "css": ([
+        ("block_open", r"/\*"),
+        ("string", _STRING),
+        ("number", r"-?\d+(?:\.\d+)?(?:px|em|rem|%|vh|vw|s|ms)?"),
+        ("keyword", r"@[\w-]+"),
+        ("word", r"[\w-]+(?=\s*:)"),
+    ], "*/"),
+    "json": ([
+        ("string", _STRING),
+        ("number", r"-?" + _NUMBER),
+        ("word", r"[A-Za-z_]\w*"),
+    ], None),
+    "html": ([
+        ("block_open", r"<!--"),
+        ("tag", r"</?[A-Za-z][\w:-]*|/?>"),
+        ("attribute", r"\b[\w:-]+(?==)"),
+        ("string", _STRING),
+    ], "-->"),
+    "markdown": ([
+        ("keyword", r"^#{1,6}\s.*"),
+        ("string", r"`[^`]*`"),
+        ("operator", r"^\s*(?:[-*+]|\d+\.)\s"),
+    ], None),
+}
+_COMPILED = {
+    language: (re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in rules)), block_close)
+    for language, (rules, block_close) in _LEXERS.items()
+}
+
+def tokenize_generic(text: str, language: str) -> List[Spans]:
+    source_lines = text.split("\n")[:_line_count(text)]
+    lexer = _COMPILED.get(language)
+    if lexer is None:
+        return [[] for _ in source_lines]
+
+    pattern, block_close = lexer
+    keywords = _LANGUAGE_KEYWORDS.get(language, set())
+    lines: List[Spans] = []
+    in_block = False
+    for line in source_lines:
+        spans: Spans = []
+        pos = 0
+        if in_block:
+            end = line.find(block_close)
+            if end < 0:
+                lines.append([[0, len(line), "comment"]] if line else [])
+                continue
+            pos = end + len(block_close)
+            spans.append([0, pos, "comment"])
+            in_block = False
+        for match in pattern.finditer(line, pos):
+            if match.start() < pos:
+                continue
+            kind = match.lastgroup
+            if kind == "block_open":
+                end = line.find(block_close, match.end())
+                if end < 0:
+                    spans.append([match.start(), len(line), "comment"])
+                    in_block = True
+                    break
+                pos = end + len(block_close)
+                spans.append([match.start(), pos, "comment"])
+                continue
+            if kind == "word":
+                if match.group() in keywords:
+                    kind = "keyword"
+                elif language in ("css", "json"):
+                    kind = "property"
+                else:
+                    continue
+            spans.append([match.start(), match.end(), kind])
+        lines.append(spans)
+    return lines
+
+# --- Public API ---
+
+def tokenize_source(text: str, language: str) -> List[Spans]:
+    """Token spans for every line of `text` in `language` (as get_language_from_ext names it)."""
+    if language == "python":
+        return tokenize_python(text)
+    return tokenize_generic(text, language)
+
+def get_tokens(blob_sha: str, language: str, read_text) -> List[Spans]:
+    """Spans for one file version, tokenizing it via read_text() only on a cache miss."""
+    key = (blob_sha, language)
+    lines = _token_cache.get(key)
+    record_cache("tokens", lines is not None)
+    if lines is None:
+        lines = tokenize_source(read_text(), language)
+        _token_cache.put(key, lines)
+    return lines
@@ -0,0 +1,227 @@
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+from services.graph import EDGE_TYPES, Adjacency, DependencyGraph
+
+# Per-query wall-clock budget: a query that runs out returns what it found so
+# far, marked truncated, instead of holding a worker thread
+QUERY_TIME_BUDGET_SECONDS = 1.0
+MAX_QUERY_TIME_BUDGET_SECONDS = 5.0
+
+MAX_DEPTH = 50
+MAX_NEIGHBORHOOD_NODES = 10000
+MAX_PATHS = 1000
+
+# Expansions between clock checks
+_BUDGET_CHECK_INTERVAL = 1024
+
+class QueryError(ValueError):
+    """Bad query arguments (unknown node or edge type)."""
+
+class _Budget:
+    def __init__(self, seconds: float):
+        self.deadline = time.perf_counter() + min(seconds, MAX_QUERY_TIME_BUDGET_SECONDS)
+        self.steps = 0
+        self.exhausted = False
+
+    def spent(self) -> bool:
+        self.steps += 1
+        if self.steps % _BUDGET_CHECK_INTERVAL == 0 and time.perf_counter() > self.deadline:
+            self.exhausted = True
+        return self.exhausted
+
+def edge_type_mask(edge_types: Optional[Sequence[str]]) -> Optional[int]:
+    if not edge_types:
+        return None
+    mask = 0
+    for edge_type in edge_types:
+        if edge_type not in EDGE_TYPES:
+            raise QueryError(f"Unknown edge type '{edge_type}' (expected one of {', '.join(EDGE_TYPES)})")
+        mask |= 1 << EDGE_TYPES.index(edge_type)
+    return mask
+
+def _node(adj: Adjacency, node_id: str) -> int:
+    try:
+        return adj.index[node_id]
+    except KeyError:
+        raise QueryError(f"Node '{node_id}' not found")
+
+def neighborhood(dg: DependencyGraph, node_id: str, direction: str = "downstream", depth: int = 2,
+                 edge_types: Optional[Sequence[str]] = None, max_nodes: int = 500,
+                 budget_seconds: float = QUERY_TIME_BUDGET_SECONDS) -> Dict:
+    """
+    Nodes within `depth` hops of node_id: downstream follows edges forward
+    (what it depends on), upstream backward (what depends on it), both either
+    way. Returns the nodes with their hop distance and the edges walked.
+    """
+    if direction not in ("downstream", "upstream", "both"):
+        raise QueryError("direction must be downstream, upstream or both")
+    adj = dg.adjacency()
+    start = _node(adj, node_id)
+    mask = edge_type_mask(edge_types)
+    walks = {"downstream": (False,), "upstream": (True,), "both": (False, True)}[direction]
+    depth = min(max(depth, 0), MAX_DEPTH)
+    budget = _Budget(budget_seconds)
+
+    distance = {start: 0}
+    edges = []
+    queue = deque([start])
+    truncated = None
+    while queue and truncated is None:
+        node = queue.popleft()
+        if distance[node] == depth:
+            continue
+        for reverse in walks:
+            for neighbor, code in adj.neighbors(node, reverse, mask):
+                edges.append((neighbor, node, code) if reverse else (node, neighbor, code))
+                if neighbor in distance:
+                    continue
+                if len(distance) >= max_nodes:
+                    truncated = "max_nodes"
+                    break
+                distance[neighbor] = distance[node] + 1
+                queue.append(neighbor)
+            if truncated:
+                break
+        if budget.spent():
+            truncated = "time_budget"
+
+    # Only edges between returned nodes
+    edges = [(u, v, code) for u, v, code in edges if u in distance and v in distance]
+    return {
+        "node_id": node_id,
+        "direction": direction,
+        "depth": depth,
+        "nodes": [{**dg.graph.nodes[adj.ids[node]], "distance": hops} for node, hops in distance.items()],
+        "edges": [{"source": adj.ids[u], "target": adj.ids[v], "type": EDGE_TYPES[code]}
+                  for u, v, code in dict.fromkeys(edges)],
+        "truncated": truncated is not None,
+        "truncated_reason": truncated
+    }
+
+def _path_result(adj: Adjacency, path: List[int], codes: List[int]) -> Dict:
+    return {"nodes": [adj.ids[node] for node in path], "edge_types": [EDGE_TYPES[code] for code in codes]}
+
+def shortest_path(dg: DependencyGraph, source_id: str, target_id: str, edge_types: Optional[Sequence[str]] = None,
+                  max_depth: int = MAX_DEPTH, budget_seconds: float = QUERY_TIME_BUDGET_SECONDS) -> Dict:
+    """
+    A shortest directed path from source to target, by bidirectional BFS:
+    forward from the source and backward from the target, always growing the
+    smaller frontier, until they meet.
+    """
+    adj = dg.adjacency()
+    source, target = _node(adj, source_id), _node(adj, target_id)
+    mask = edge_type_mask(edge_types)
+    max_depth = min(max(max_depth, 0), MAX_DEPTH)
+    budget = _Budget(budget_seconds)
+
+    # node -> (previous node, edge code) on each side
+    parents = [{source: None}, {target: None}]
+    frontiers = [[source], [target]]
+    meeting = source if source == target else None
+    hops = 0
+    while meeting is None and frontiers[0] and frontiers[1] and hops < max_depth and not budget.exhausted:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        seen, other = parents[side], parents[1 - side]
+        next_frontier = []
+        for node in frontiers[side]:
+            for neighbor, code in adj.neighbors(node, reverse=bool(side), type_mask=mask):
+                if neighbor in seen:
+                    continue
+                seen[neighbor] = (node, code)
+                if neighbor in other:
+                    meeting = neighbor
+                    break
+                next_frontier.append(neighbor)
+            if meeting is not None or budget.spent():
+                break
+        frontiers[side] = next_frontier
+        hops += 1
+
+    result = {"source": source_id, "target": target_id, "path": None,
+              "truncated": meeting is None and budget.exhausted,
+              "truncated_reason": "time_budget" if meeting is None and budget.exhausted else None}
+    if meeting is None:
+        return result
+
+    # Source ... meeting, then meeting ... target
+    path, codes = [meeting], []
+    node = meeting
+    while parents[0][node] is not None:
+        node, code = parents[0][node]
+        path.insert(0, node)
+        codes.insert(0, code)
+    node = meeting
+    while parents[1][node] is not None:
+        node, code = parents[1][node]
+        path.append(node)
+        codes.append(code)
+    result["path"] = _path_result(adj, path, codes)
+    return result
+
+def _distances_to(adj: Adjacency, target: int, mask: Optional[int], max_depth: int, budget: _Budget) -> Dict[int, int]:
+    """Hops from every node within max_depth to target (reverse BFS)."""
+    distance = {target: 0}
+    queue = deque([target])
+    while queue and not budget.spent():
+        node = queue.popleft()
+        if distance[node] == max_depth:
+            continue
+        for neighbor, _ in adj.neighbors(node, reverse=True, type_mask=mask):
+            if neighbor not in distance:
+                distance[neighbor] = distance[node] + 1
+                queue.append(neighbor)
+    return distance
+
+def all_paths(dg: DependencyGraph, source_id: str, target_id: str, edge_types: Optional[Sequence[str]] = None,
+              max_depth: int = 6, max_paths: int = 20,
+              budget_seconds: float = QUERY_TIME_BUDGET_SECONDS) -> Dict:
+    """
+    Simple paths from source to target of at most max_depth edges, shortest
+    first within each branch, up to max_paths. A reverse BFS from the target
+    first bounds the search: the DFS only steps to nodes that can still reach
+    the target in the hops left.
+    """
+    adj = dg.adjacency()
+    source, target = _node(adj, source_id), _node(adj, target_id)
+    mask = edge_type_mask(edge_types)
+    max_depth = min(max(max_depth, 1), MAX_DEPTH)
+    max_paths = min(max(max_paths, 1), MAX_PATHS)
+    budget = _Budget(budget_seconds)
+
+    to_target = _distances_to(adj, target, mask, max_depth, budget)
+    paths = []
+    if source in to_target and not budget.exhausted:
+        path, codes = [source], []
+        on_path = {source}
+        # Iterative DFS: one neighbour iterator per path node
+        stack = [iter(sorted(adj.neighbors(source, type_mask=mask), key=lambda n: to_target.get(n[0], max_depth)))]
+        while stack and len(paths) < max_paths and not budget.spent():
+            step = next(stack[-1], None)
+            if step is None:
+                stack.pop()
+                on_path.discard(path.pop())
+                if codes:
+                    codes.pop()
+                continue
+            neighbor, code = step
+            if neighbor in on_path or to_target.get(neighbor, max_depth + 1) > max_depth - len(path):
+                continue
+            if neighbor == target:
+                paths.append(_path_result(adj, path + [neighbor], codes + [code]))
+                continue
+            path.append(neighbor)
+            codes.append(code)
+            on_path.add(neighbor)
+            stack.append(iter(sorted(adj.neighbors(neighbor, type_mask=mask),
+                                     key=lambda n: to_target.get(n[0], max_depth))))
+
+    truncated = "max_paths" if len(paths) >= max_paths else "time_budget" if budget.exhausted else None
+    return {
+        "source": source_id,
+        "target": target_id,
+        "max_depth": max_depth,
+        "paths": paths,
+        "truncated": truncated is not None,
+        "truncated_reason": truncated
+    }
@@ -0,0 +1,23 @@
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from services import storage
+from services.ingestion import get_project_path
+
+@pytest.fixture
+def project():
+    """A small uncloned project in storage: pkg/m.py and main.py, which imports and calls it."""
+    project_id = str(uuid.uuid4())
+    root = get_project_path(project_id)
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "m.py").write_text("import os\n\ndef a():\n    return os.getcwd()\n\ndef b():\n    return a()\n")
+    (root / "main.py").write_text("from pkg.m import a\n\ndef run():\n    return a()\n")
+    yield project_id
+    storage.evict(project_id)
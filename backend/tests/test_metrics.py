@@ -0,0 +1,24 @@
+from fastapi.testclient import TestClient
+
+import main
+
+def _series(text: str, name: str, **labels) -> float:
+    """Value of the series `name{labels}` in a Prometheus exposition, labels in declaration order."""
+    prefix = name + "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "} "
+    values = [line[len(prefix):] for line in text.splitlines() if line.startswith(prefix)]
+    assert values, f"no series {prefix.strip()}"
+    return float(values[0])
+
+def test_worker_parse_and_graph_metrics_reach_metrics_endpoint(project):
+    # Parsing and graph builds run in the worker pool; what they record there
+    # has to show up on the server's /metrics
+    with TestClient(main.app) as client:
+        assert client.post(f"/api/project/{project}/parse").status_code == 200
+        assert client.post(f"/api/project/{project}/rebuild_graph").status_code == 200
+        text = client.get("/metrics").text
+
+    assert _series(text, "codeintel_files_total", stage="parse", project=project, status="parsed") == 2
+    assert _series(text, "codeintel_bytes_total", stage="parse", project=project) > 0
+    assert _series(text, "codeintel_bytes_total", stage="metadata_write", project=project) > 0
+    for stage, runs in (("parse_file", 2), ("metadata_write", 2), ("parse", 1), ("graph_build", 1)):
+        assert _series(text, "codeintel_stage_duration_seconds_count", stage=stage, project=project) == runs
@@ -0,0 +1,18 @@
+from services.search import compile_query, search_files
+
+SOURCE = "import os\ndef a():\n    pass\n  def b(): pass\nx = 1  # def\ndef c(): return 0\n"
+
+def _lines(root, query: str, flags=None):
+    pattern = compile_query(query, regex=True, case_sensitive=True)
+    matches = search_files(str(root), ["m.py"], pattern.pattern, pattern.flags if flags is None else flags, 0, 100)
+    return [match["line"] for match in matches]
+
+def test_anchored_regex_matches_at_line_boundaries(tmp_path):
+    (tmp_path / "m.py").write_text(SOURCE)
+    assert _lines(tmp_path, "^def") == [2, 6]
+    assert _lines(tmp_path, "pass$") == [3, 4]
+    assert _lines(tmp_path, r"^\s+def") == [4]
+
+def test_search_files_anchors_lines_whatever_flags_it_is_given(tmp_path):
+    (tmp_path / "m.py").write_text(SOURCE)
+    assert _lines(tmp_path, "^def", flags=0) == [2, 6]
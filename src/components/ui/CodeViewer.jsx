@@ -3,19 +3,66 @@ import Editor from '@monaco-editor/react';
 import { FileCode, Loader } from 'lucide-react';
 import { api } from '../../lib/api';
 
+// Above this many lines Monaco's own tokenizer is switched off and only the
+// visible lines are highlighted, using tokens computed by the backend.
+const LARGE_FILE_LINES = 3000;
+
 export default function CodeViewer({ file, projectId, scrollToLine }) {
     const [content, setContent] = useState('');
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState(null);
+    const [editorReady, setEditorReady] = useState(false);
     const editorRef = useRef(null);
     const monacoRef = useRef(null);
     const decorationsRef = useRef([]);
 
+    const isLargeFile = content.split('\n', LARGE_FILE_LINES + 1).length > LARGE_FILE_LINES;
+
     function handleEditorDidMount(editor, monaco) {
         editorRef.current = editor;
         monacoRef.current = monaco;
+        setEditorReady(true);
     }
 
+    // Large files: fetch server tokens for the visible lines as the user scrolls
+    useEffect(() => {
+        if (!isLargeFile || !editorReady || !file?.path) return;
+
+        const editor = editorRef.current;
+        const monaco = monacoRef.current;
+        let tokenDecorations = [];
+        let timer = null;
+        let cancelled = false;
+
+        const highlightVisible = async () => {
+            const ranges = editor.getVisibleRanges();
+            if (!ranges.length) return;
+            const start = ranges[0].startLineNumber;
+            const end = ranges[ranges.length - 1].endLineNumber;
+            const data = await api.getTokens(projectId, file.path, start, end);
+            if (!data || cancelled) return;
+            tokenDecorations = editor.deltaDecorations(tokenDecorations, data.lines.flatMap((spans, i) =>
+                spans.map(([startCol, endCol, type]) => ({
+                    range: new monaco.Range(data.start_line + i, startCol + 1, data.start_line + i, endCol + 1),
+                    options: { inlineClassName: `tok-${type}` }
+                }))
+            ));
+        };
+
+        highlightVisible();
+        const subscription = editor.onDidScrollChange(() => {
+            clearTimeout(timer);
+            timer = setTimeout(highlightVisible, 100);
+        });
+
+        return () => {
+            cancelled = true;
+            clearTimeout(timer);
+            subscription.dispose();
+            editor.deltaDecorations(tokenDecorations, []);
+        };
+    }, [isLargeFile, editorReady, content, file, projectId]);
+
     // Handle scrolling when scrollToLine prop changes
     useEffect(() => {
         if (scrollToLine && editorRef.current && monacoRef.current) {
@@ -92,7 +139,7 @@ export default function CodeViewer({ file, projectId, scrollToLine }) {
                 <Editor
                     height="100%"
                     path={file.path} // Unique path to reset editor state
-                    defaultLanguage={file.language || 'javascript'}
+                    language={isLargeFile ? 'plaintext' : (file.language || 'javascript')}
                     value={content}
                     theme="vs-dark"
                     onMount={handleEditorDidMount}
@@ -22,18 +22,73 @@ export const api = {
         return response.json();
     },
 
+    // A slice of a file: { path, startLine, endLine } or { nodeId } for a function's lines.
+    getFileWindow: async (projectId, { path, startLine, endLine, nodeId } = {}) => {
+        const params = new URLSearchParams();
+        if (nodeId) params.set('node_id', nodeId);
+        if (path) params.set('path', path);
+        if (startLine) params.set('start_line', startLine);
+        if (endLine) params.set('end_line', endLine);
+        const response = await fetch(`${API_BASE_URL}/api/project/${projectId}/file/window?${params}`);
+        if (!response.ok) {
+            throw new Error('Failed to fetch file window');
+        }
+        return response.json();
+    },
+
+    // Server-side syntax tokens for a line window: { lines: [[startCol, endCol, type], ...] per line }.
+    getTokens: async (projectId, path, startLine, endLine) => {
+        const params = new URLSearchParams({ path, start_line: startLine, end_line: endLine });
+        const response = await fetch(`${API_BASE_URL}/api/project/${projectId}/tokens?${params}`);
+        if (!response.ok) return null;
+        return response.json();
+    },
+
     parseProject: async (projectId) => {
         const response = await fetch(`${API_BASE_URL}/api/project/${projectId}/parse`, { method: 'POST' });
         if (!response.ok) throw new Error('Failed to parse project');
         return response.json();
     },
 
+    // Starts a parse (or joins the running one) and follows its per-file progress
+    // (Server-Sent Events); resolves with the final summary.
+    parseProjectStream: async (projectId, onProgress) => {
+        const response = await fetch(`${API_BASE_URL}/api/project/${projectId}/parse?wait=false`, { method: 'POST' });
+        if (!response.ok) throw new Error('Failed to parse project');
+        return api.followParse(projectId, onProgress);
+    },
+
+    // Follows the project's current (or last) parse; resolves with its summary.
+    followParse: (projectId, onProgress) => new Promise((resolve, reject) => {
+        const source = new EventSource(`${API_BASE_URL}/api/project/${projectId}/parse/stream`);
+        source.addEventListener('file', (e) => onProgress?.(JSON.parse(e.data)));
+        source.addEventListener('complete', (e) => {
+            source.close();
+            resolve(JSON.parse(e.data));
+        });
+        source.addEventListener('error', (e) => {
+            source.close();
+            reject(new Error(e.data ? JSON.parse(e.data).detail : 'Parse stream failed'));
+        });
+    }),
+
     getMetadata: async (projectId, path) => {
         const response = await fetch(`${API_BASE_URL}/api/project/${projectId}/metadata?path=${encodeURIComponent(path)}`);
         if (!response.ok) return null; // Graceful fallback
         return response.json();
     },
 
+    // Metadata for many files in one round-trip: explicit paths and/or everything under a directory prefix.
+    getMetadataBatch: async (projectId, paths = [], prefix = null) => {
+        const response = await fetch(`${API_BASE_URL}/api/project/${projectId}/metadata/batch`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ paths, prefix }),
+        });
+        if (!response.ok) return null;
+        return response.json();
+    },
+
     getDependencies: async (projectId, nodeId) => {
         const url = nodeId
             ? `${API_BASE_URL}/api/project/${projectId}/dependencies?node_id=${encodeURIComponent(nodeId)}`
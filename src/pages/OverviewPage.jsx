@@ -12,6 +12,7 @@ export default function OverviewPage() {
     const [selectedFile, setSelectedFile] = useState(null);
     const [metadata, setMetadata] = useState(null);
     const [isParsing, setIsParsing] = useState(false);
+    const [parseProgress, setParseProgress] = useState(null);
     const [editorLine, setEditorLine] = useState(null); // To control scrolling
 
     // Redirect if no state (direct access protection)
@@ -30,12 +31,13 @@ export default function OverviewPage() {
         const parse = async () => {
             setIsParsing(true);
             try {
-                await api.parseProject(projectId);
+                await api.parseProjectStream(projectId, setParseProgress);
                 console.log("Project parsed successfully");
             } catch (e) {
                 console.error("Parsing failed", e);
             } finally {
                 setIsParsing(false);
+                setParseProgress(null);
             }
         };
         parse();
@@ -90,6 +92,11 @@ export default function OverviewPage() {
                 {isParsing && (
                     <div className="bg-indigo-500/10 text-indigo-400 text-xs px-4 py-3 flex items-center gap-2 border-b border-indigo-500/10 font-bold tracking-wide">
                         <Loader2 className="animate-spin w-3 h-3" /> Indexing...
+                        {parseProgress && (
+                            <span className="ml-auto font-mono font-normal">
+                                {parseProgress.done}/{parseProgress.total}
+                            </span>
+                        )}
                     </div>
                 )}
                 <FileTree files={fileTree} onSelectFile={setSelectedFile} />